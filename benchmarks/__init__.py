@@ -0,0 +1,64 @@
+"""
+Бенчмарки бота. Запускать из корня репозитория: `python -m benchmarks.<имя>`
+
+Каждый бенчмарк работает во временной папке (см. `sandbox`) со своей базой данных и config.ini,
+так что рабочая база `database/olymp.db` не затрагивается
+"""
+import os
+import sys
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+TEST_TOKEN = "123456:BENCHMARK_TOKEN"
+OWNER_TG_ID = 1
+
+
+@contextmanager
+def sandbox(owner_id: int = OWNER_TG_ID, **settings):
+    """
+    Временная рабочая папка с config.ini, SQL-скриптами и статическими файлами бота.
+    Модули бота нужно импортировать уже внутри неё: `data` читает config.ini при импорте
+
+    :param settings: Дополнительные параметры config.ini
+    """
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="olymp_bench_") as tmp:
+        with open(os.path.join(tmp, "config.ini"), "w", encoding="utf8") as f:
+            f.write(f"[data]\ntoken = {TEST_TOKEN}\nowner_id = {owner_id}\nowner_handle = @owner\n")
+            for key, value in settings.items():
+                f.write(f"{key} = {value}\n")
+        shutil.copytree(
+            os.path.join(ROOT, "database"), os.path.join(tmp, "database"),
+            ignore=shutil.ignore_patterns("*.db", "*.db-*", "version.txt")
+        )
+        for dir in ("help", "predefined_files"):
+            shutil.copytree(os.path.join(ROOT, dir), os.path.join(tmp, dir))
+        os.chdir(tmp)
+        try:
+            yield tmp
+        finally:
+            os.chdir(old_cwd)
+
+
+def stub_telegram_api(calls: list[str] | None = None):
+    """
+    Подменить запросы к Telegram API: ничего не отправляется, на всё возвращается
+    правдоподобный ответ. Если передан `calls`, в него дописываются названия вызванных методов
+    """
+    from telebot import apihelper
+    def fake_request(token, method_name, method='get', params=None, files=None):
+        if calls is not None:
+            calls.append(method_name)
+        if method_name in ("deleteMessage", "answerCallbackQuery", "setMyCommands", "editMessageReplyMarkup"):
+            return True
+        if method_name == "getFile":
+            return {"file_id": "file", "file_unique_id": "file", "file_path": "documents/file"}
+        chat_id = (params or {}).get("chat_id")
+        chat_id = chat_id if isinstance(chat_id, int) else OWNER_TG_ID
+        return {"message_id": 1, "date": 0, "chat": {"id": chat_id, "type": "private"}}
+    apihelper._make_request = fake_request
@@ -0,0 +1,137 @@
+"""
+Конкуренция за блокировку SQLite во время имитации олимпиады: потоки участников и принимающих
+проводят записи очереди через основную базу, а параллельно идёт поток часто меняющихся данных
+(состояния telebot, логи доставки, метрики). Сравниваются две раскладки:
+всё в `olymp.db` и часто меняющиеся данные в отдельном `churn.db`.
+
+    python -m benchmarks.churn_db [--queue-workers N] [--transitions N] [--churn-workers N]
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+from benchmarks import sandbox
+
+CHURN_SCHEMA = """
+CREATE TABLE IF NOT EXISTS telebot_states (
+    chat_id INTEGER NOT NULL, user_id INTEGER NOT NULL, business_connection_id TEXT,
+    message_thread_id INTEGER, bot_id INTEGER, state TEXT
+);
+CREATE TABLE IF NOT EXISTS delivery_log (chat_id INTEGER NOT NULL, method TEXT NOT NULL, sent_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS metrics_samples (name TEXT NOT NULL, value REAL NOT NULL, taken_at REAL NOT NULL);
+"""
+
+
+def queue_worker(database: str, worker: int, transitions: int, latencies: list[float], errors: list[str]):
+    """
+    Участник записывается в очередь, принимающий берёт запись и выставляет результат
+    """
+    from db import connect
+    conn = connect(database)
+    for i in range(transitions):
+        start = time.perf_counter()
+        try:
+            with conn:
+                cur = conn.execute(
+                    "INSERT INTO queue(olymp_id, participant_id, problem_id) VALUES (1, ?, ?)",
+                    (worker, i % 9 + 1)
+                )
+                entry_id = cur.lastrowid
+            with conn:
+                conn.execute("UPDATE queue SET status = 2, examiner_id = ? WHERE id = ?", (worker, entry_id))
+                conn.execute("UPDATE examiners SET is_busy = 1, busyness_level = busyness_level + 1 WHERE id = ?", (worker,))
+            with conn:
+                conn.execute("UPDATE queue SET status = 3 WHERE id = ?", (entry_id,))
+                conn.execute("UPDATE examiners SET is_busy = 0 WHERE id = ?", (worker,))
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def churn_worker(database: str, worker: int, stop: threading.Event, counter: list[int]):
+    from db import connect
+    conn = connect(database)
+    written = 0
+    while not stop.is_set():
+        try:
+            with conn:
+                conn.execute("INSERT INTO telebot_states(chat_id, user_id, state) VALUES (?, ?, 'state')", (worker, written))
+            with conn:
+                conn.execute("INSERT INTO delivery_log(chat_id, method, sent_at) VALUES (?, 'sendMessage', ?)",
+                             (worker, time.time()))
+            with conn:
+                conn.execute("INSERT INTO metrics_samples(name, value, taken_at) VALUES ('latency', ?, ?)",
+                             (written, time.time()))
+            written += 3
+        except Exception:
+            pass
+    counter.append(written)
+    conn.close()
+
+
+def run(main_database: str, churn_database: str, args) -> dict:
+    from db import connect
+    with connect(churn_database) as conn:
+        conn.executescript(CHURN_SCHEMA)
+    with connect(main_database) as conn:
+        conn.execute("DELETE FROM queue")
+        conn.executemany(
+            "INSERT OR IGNORE INTO examiners(id, olymp_id, user_id, conference_link, busyness_level, is_busy) "
+            "VALUES (?, 1, ?, '', 0, 0)",
+            [(i, i) for i in range(args.queue_workers)]
+        )
+    latencies: list[float] = []
+    errors: list[str] = []
+    churn_written: list[int] = []
+    stop = threading.Event()
+    churn_threads = [threading.Thread(target=churn_worker, args=(churn_database, i, stop, churn_written))
+                     for i in range(args.churn_workers)]
+    queue_threads = [threading.Thread(target=queue_worker, args=(main_database, i, args.transitions, latencies, errors))
+                     for i in range(args.queue_workers)]
+    for thread in churn_threads:
+        thread.start()
+    start = time.perf_counter()
+    for thread in queue_threads:
+        thread.start()
+    for thread in queue_threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in churn_threads:
+        thread.join()
+    latencies.sort()
+    return {
+        "transitions_per_s": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else None,
+        "max_ms": latencies[-1] * 1000 if latencies else None,
+        "errors": len(errors),
+        "churn_writes_per_s": sum(churn_written) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queue-workers", type=int, default=8)
+    parser.add_argument("--transitions", type=int, default=50)
+    parser.add_argument("--churn-workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with sandbox():
+        from db import DATABASE, create_update_db
+        create_update_db()
+        results = {
+            "Всё в olymp.db": run(DATABASE, DATABASE, args),
+            "Отдельный churn.db": run(DATABASE, os.path.join(os.path.dirname(DATABASE), "churn.db"), args),
+        }
+    print(f"{'Раскладка':<20} {'сдач/с':>8} {'p50, мс':>9} {'p95, мс':>9} {'max, мс':>9} {'ошибок':>7} {'churn/с':>9}")
+    for name, r in results.items():
+        print(f"{name:<20} {r['transitions_per_s']:>8.1f} {r['p50_ms'] or 0:>9.1f} {r['p95_ms'] or 0:>9.1f} "
+              f"{r['max_ms'] or 0:>9.1f} {r['errors']:>7} {r['churn_writes_per_s']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Время основных операций бота на синтетической олимпиаде (см. `benchmarks.generator`):
+поиск участника по Telegram ID, запись в очередь, подбор принимающего и записи,
+сообщения об изменении записи в очереди, подсчёт результатов, выборка участников по тэгам, выгрузка результатов и загрузка таблицы участников.
+
+Результаты можно сохранить в JSON и сравнить с прогоном на другом коммите:
+
+    python -m benchmarks.core [--participants N] [--examiners N] [--runs N] [--json PATH] [--compare PATH]
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+from io import BytesIO
+from benchmarks import sandbox, stub_telegram_api, ROOT, OWNER_TG_ID
+from benchmarks.generator import generate_olymp
+
+MAX_PICK_ATTEMPTS = 1000 # Сколько раз пытаться подобрать участника или запись, прежде чем сдаться
+
+
+def sql_queries() -> int:
+    import perf
+    return perf.snapshot()["sql"]["count"]
+
+
+def measure(func, runs: int, setup=None) -> dict:
+    """
+    Вызвать `func(setup())` `runs` раз. Подготовка в замер не входит
+    """
+    durations = []
+    queries = 0
+    for _ in range(runs):
+        arg = setup() if setup else None
+        before = sql_queries()
+        start = time.perf_counter()
+        func(arg)
+        durations.append(time.perf_counter() - start)
+        queries += sql_queries() - before
+    durations.sort()
+    return {
+        "runs": runs,
+        "mean_ms": statistics.fmean(durations) * 1000,
+        "p50_ms": durations[len(durations) // 2] * 1000,
+        "p95_ms": durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000,
+        "sql_queries": queries / runs,
+    }
+
+
+def members_table(rows: int, prefix: str) -> bytes:
+    import pandas as pd
+    table = pd.DataFrame({
+        "name": [f"Имя{i}" for i in range(rows)],
+        "surname": [f"Фамилия{i}" for i in range(rows)],
+        "tg_handle": [f"{prefix}{i}" for i in range(rows)],
+        "grade": [8 + i % 4 for i in range(rows)],
+    })
+    buffer = BytesIO()
+    table.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def run_benchmarks(args) -> dict:
+    from benchmarks.routing import make_message
+    from db import connect, create_update_db
+    create_update_db()
+    synthetic = generate_olymp(args.participants, args.examiners, args.tags, seed=args.seed)
+    stub_telegram_api()
+    import bot as bot_module
+    from olymp import Olymp, OlympStatus
+    from users import Participant, Examiner
+    from queue_entry import QueueEntry, QueueStatus
+    rng = random.Random(args.seed)
+    olymp_id = synthetic.olymp_id
+    results = {}
+
+    results["Participant.from_tg_id"] = measure(
+        lambda tg_id: Participant.from_tg_id(tg_id, olymp_id),
+        args.runs, lambda: rng.choice(synthetic.participant_tg_ids)
+    )
+
+    results["Participant.results"] = measure(
+        lambda participant: participant.results(),
+        args.runs, lambda: Participant.from_tg_id(rng.choice(synthetic.participant_tg_ids), olymp_id)
+    )
+
+    def free_participant() -> tuple[Participant, int]:
+        for _ in range(MAX_PICK_ATTEMPTS):
+            participant = Participant.from_tg_id(rng.choice(synthetic.participant_tg_ids), olymp_id)
+            if participant.queue_entry:
+                continue
+            for problem in participant.problems():
+                if participant.attempts_left(problem) > 0 and not participant.solved(problem):
+                    return participant, problem
+        raise RuntimeError(f"За {MAX_PICK_ATTEMPTS} попыток не нашёлся участник не в очереди с задачей, "
+                           f"которую можно сдавать: увеличьте --participants или уменьшите --runs")
+    joined: list[QueueEntry] = []
+    def release_joined():
+        """
+        Отменить оставшиеся активными записи из `joined` и освободить их принимающих:
+        иначе после очередного замера все принимающие могут оказаться заняты
+        """
+        for queue_entry in joined:
+            if queue_entry.status in QueueStatus.active():
+                queue_entry.status = QueueStatus.CANCELED
+            if queue_entry.examiner_id:
+                Examiner.from_id(queue_entry.examiner_id).is_busy = False
+        joined.clear()
+    def join_queue(arg):
+        participant, problem = arg
+        joined.append(participant.join_queue(problem))
+    results["Participant.join_queue"] = measure(join_queue, args.runs, free_participant)
+    release_joined()
+
+    def unfinished_participant() -> tuple[Participant, int]:
+        for _ in range(MAX_PICK_ATTEMPTS):
+            participant, problem = free_participant()
+            if not participant.finished:
+                return participant, problem
+        raise RuntimeError(f"За {MAX_PICK_ATTEMPTS} попыток не нашёлся участник, не завершивший олимпиаду")
+    def joined_entry() -> QueueEntry:
+        participant, problem = unfinished_participant()
+        queue_entry = participant.join_queue(problem)
+        joined.append(queue_entry)
+        return queue_entry
+    results["announce_queue_entry (запись)"] = measure(bot_module.announce_queue_entry, args.runs, joined_entry)
+    release_joined()
+    def end_discussion():
+        """
+        Завершить одно из обсуждений, начатых генератором, чтобы освободился принимающий
+        """
+        with connect() as conn:
+            row = conn.execute("SELECT * FROM queue WHERE olymp_id = ? AND status = ? ORDER BY id LIMIT 1",
+                               (olymp_id, QueueStatus.DISCUSSING)).fetchone()
+        if row is None:
+            return
+        queue_entry = QueueEntry(*row)
+        queue_entry.status = QueueStatus.CANCELED
+        Examiner.from_id(queue_entry.examiner_id).is_busy = False
+    def failed_entry() -> QueueEntry:
+        for queue_entry in joined: # После приёма принимающий остаётся занятым, пока не отметится свободным
+            if queue_entry.examiner_id and queue_entry.status not in QueueStatus.active():
+                Examiner.from_id(queue_entry.examiner_id).is_busy = False
+        for _ in range(MAX_PICK_ATTEMPTS):
+            queue_entry = joined_entry()
+            if queue_entry.examiner_id:
+                queue_entry.status = QueueStatus.FAIL
+                return queue_entry
+            queue_entry.status = QueueStatus.CANCELED
+            end_discussion()
+        raise RuntimeError(f"За {MAX_PICK_ATTEMPTS} попыток новой записи в очереди не назначился принимающий: "
+                           f"все принимающие заняты")
+    results["announce_queue_entry (не принято)"] = measure(bot_module.announce_queue_entry, args.runs, failed_entry)
+    release_joined() # Убираем созданные записи, чтобы очередь осталась как была
+
+    with connect() as conn:
+        waiting = [QueueEntry(*row) for row in conn.execute(
+            "SELECT * FROM queue WHERE olymp_id = ? AND status = ?", (olymp_id, QueueStatus.WAITING)).fetchall()]
+        free_examiners = [row[0] for row in conn.execute(
+            "SELECT users.tg_id FROM examiners JOIN users ON users.user_id = examiners.user_id "
+            "WHERE olymp_id = ? AND is_busy = 0", (olymp_id,)).fetchall()]
+    results["QueueEntry.look_for_examiner"] = measure(
+        lambda queue_entry: queue_entry.look_for_examiner(), args.runs, lambda: rng.choice(waiting)
+    )
+    results["Examiner.look_for_queue_entry"] = measure(
+        lambda examiner: examiner.look_for_queue_entry(),
+        args.runs, lambda: Examiner.from_tg_id(rng.choice(free_examiners), olymp_id)
+    )
+
+    olymp = bot_module.current_olymp
+    def tag_filter():
+        tags = rng.sample(synthetic.tag_names, 2)
+        return [tags[0]], [tags[1]]
+    results["Olymp.get_participants (тэги)"] = measure(
+        lambda tags: olymp.get_participants(include_tags=tags[0], exclude_tags=tags[1]), args.runs, tag_filter
+    )
+
+    owner_message = lambda text: make_message(OWNER_TG_ID, text)
+    with connect() as conn: # К выгрузке результатов всем участникам уже выдан третий блок
+        conn.execute("UPDATE participants SET last_block_number = 3 WHERE olymp_id = ?", (olymp_id,))
+    results["results_command"] = measure(
+        lambda message: bot_module.results_command(message), args.export_runs, lambda: owner_message("/results")
+    )
+
+    registration = Olymp.create("Регистрация (бенчмарк)", OlympStatus.REGISTRATION)
+    contest = bot_module.current_olymp
+    bot_module.current_olymp = registration
+    table = members_table(args.upload_rows, f"upload{registration.id}_")
+    bot_module.get_file = lambda *args, **kwargs: BytesIO(table)
+    upload = lambda message: bot_module.upload_members(
+        message, "grade", "{0} класс", Participant, 'участник', ('', 'а', 'ов'), ('а', 'ов', 'ов')
+    )
+    results["upload_members (новые)"] = measure(upload, 1, lambda: owner_message("/upload_participants"))
+    results["upload_members (повторно)"] = measure(upload, args.export_runs, lambda: owner_message("/upload_participants"))
+    bot_module.current_olymp = contest
+    return results
+
+
+def commit_id() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--participants", type=int, default=300)
+    parser.add_argument("--examiners", type=int, default=30)
+    parser.add_argument("--tags", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=50, help="Повторов для быстрых операций")
+    parser.add_argument("--export-runs", type=int, default=3, help="Повторов для выгрузки и загрузки таблиц")
+    parser.add_argument("--upload-rows", type=int, default=100, help="Строк в загружаемой таблице участников")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Сохранить результаты в JSON-файл")
+    parser.add_argument("--compare", help="JSON-файл с результатами другого прогона для сравнения")
+    args = parser.parse_args()
+
+    with sandbox():
+        results = run_benchmarks(args)
+    report = {
+        "commit": commit_id(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+        "results": results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf8") as f:
+            baseline = json.load(f)["results"]
+
+    print(f"{'Операция':<34} {'среднее, мс':>12} {'p50, мс':>9} {'p95, мс':>9} {'SQL':>7}"
+          + (f" {'было, мс':>10} {'было SQL':>16}" if baseline else ""))
+    for name, r in results.items():
+        line = f"{name:<34} {r['mean_ms']:>12.2f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['sql_queries']:>7.1f}"
+        if baseline and name in baseline:
+            old = baseline[name]["mean_ms"]
+            line += f" {old:>10.2f} ({(r['mean_ms'] - old) / old * 100:+.0f}%) {baseline[name]['sql_queries']:>8.1f}"
+        print(line)
+    if args.json:
+        with open(args.json, "w", encoding="utf8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
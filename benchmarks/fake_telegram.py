@@ -0,0 +1,172 @@
+"""
+Локальная замена Telegram Bot API для нагрузочных тестов без сети. Бот подключается к ней через
+`telebot.apihelper.API_URL`, обновления отдаются через `getUpdates`, а все исходящие вызовы
+(`sendMessage`, `sendDocument`, `copyMessage`, `editMessageText`, `answerCallbackQuery`, `getFile`, …)
+запоминаются и передаются наблюдателю. Файлы, добавленные через `add_file`, отдаются по `getFile`
+и скачиваются по `file_url` (значение для `telebot.apihelper.FILE_URL`)
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from urllib.parse import urlsplit, parse_qsl
+
+BOT_USER = {"id": 42, "is_bot": True, "first_name": "Bot", "username": "olymp_bot"}
+TRUE_METHODS = {
+    "deleteMessage", "answerCallbackQuery", "setMyCommands", "deleteMyCommands", "setChatMenuButton",
+    "deleteWebhook", "sendChatAction", "pinChatMessage", "unpinChatMessage",
+}
+
+
+class FakeTelegramServer:
+    """
+    :param on_call: Вызывается как `on_call(method, params, timestamp)` для каждого вызова, кроме `getUpdates`
+    """
+    def __init__(self, on_call: Callable[[str, dict, float], None] | None = None, port: int = 0):
+        self.on_call = on_call
+        self.__updates: list[dict] = []
+        self.__next_update_id = 1
+        self.__next_message_id = 1
+        self.__condition = threading.Condition()
+        self.calls: dict[str, int] = {}
+        self.__files: dict[str, bytes] = {}
+        self.__server = ThreadingHTTPServer(("127.0.0.1", port), self.__handler_class())
+        self.__server.daemon_threads = True
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name="fake-telegram", daemon=True)
+
+    @property
+    def api_url(self) -> str:
+        """
+        Значение для `telebot.apihelper.API_URL`
+        """
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}/bot{{0}}/{{1}}"
+
+    @property
+    def file_url(self) -> str:
+        """
+        Значение для `telebot.apihelper.FILE_URL`
+        """
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}/file/bot{{0}}/{{1}}"
+
+    def add_file(self, file_id: str, content: bytes):
+        """
+        Сделать файл доступным для скачивания по `file_id`
+        """
+        self.__files[file_id] = content
+
+    def file_content(self, file_id: str) -> bytes | None:
+        return self.__files.get(file_id)
+
+    def start(self):
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        with self.__condition:
+            self.__condition.notify_all()
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def push_update(self, update: dict) -> int:
+        """
+        Поставить обновление в очередь `getUpdates`. `update_id` назначается автоматически
+        """
+        with self.__condition:
+            update_id = self.__next_update_id
+            self.__next_update_id += 1
+            self.__updates.append({"update_id": update_id, **update})
+            self.__condition.notify_all()
+        return update_id
+
+    def pending_updates(self) -> int:
+        with self.__condition:
+            return len(self.__updates)
+
+    def get_updates(self, offset: int, limit: int, timeout: float) -> list[dict]:
+        deadline = time.monotonic() + timeout
+        with self.__condition:
+            self.__updates = [u for u in self.__updates if u["update_id"] >= offset]
+            while not self.__updates and (remaining := deadline - time.monotonic()) > 0:
+                self.__condition.wait(remaining)
+                self.__updates = [u for u in self.__updates if u["update_id"] >= offset]
+            return self.__updates[:limit]
+
+    def respond(self, method: str, params: dict):
+        now = time.perf_counter()
+        with self.__condition:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            message_id = self.__next_message_id
+            self.__next_message_id += 1
+        if self.on_call:
+            self.on_call(method, params, now)
+        if method == "getMe":
+            return BOT_USER
+        if method in TRUE_METHODS:
+            return True
+        if method == "getFile":
+            file_id = params.get("file_id", "file")
+            return {"file_id": file_id, "file_unique_id": file_id, "file_path": f"documents/{file_id}",
+                    **({"file_size": len(self.__files[file_id])} if file_id in self.__files else {})}
+        if method == "copyMessage":
+            return {"message_id": message_id}
+        chat_id = params.get("chat_id")
+        chat_id = int(chat_id) if chat_id and str(chat_id).lstrip("-").isdigit() else 0
+        message = {"message_id": message_id, "date": int(time.time()), "from": BOT_USER,
+                   "chat": {"id": chat_id, "type": "private"}}
+        if "text" in params:
+            message["text"] = params["text"]
+        if method == "sendDocument":
+            message["document"] = {"file_id": f"file{message_id}", "file_unique_id": f"file{message_id}"}
+            if "caption" in params:
+                message["caption"] = params["caption"]
+        return message
+
+    def __handler_class(self):
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def __handle(self):
+                url = urlsplit(self.path)
+                if url.path.startswith("/file/"):
+                    return self.__send_file(url.path.rsplit("/", 1)[-1])
+                method = url.path.rsplit("/", 1)[-1]
+                params = dict(parse_qsl(url.query))
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if body and self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+                    params.update(parse_qsl(body.decode()))
+                if method == "getUpdates":
+                    result = server.get_updates(int(params.get("offset", 0)), int(params.get("limit", 100)),
+                                                min(float(params.get("timeout", 0)), 1.0))
+                else:
+                    result = server.respond(method, params)
+                payload = json.dumps({"ok": True, "result": result}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def __send_file(self, file_id: str):
+                content = server.file_content(file_id)
+                if content is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = __handle
+            do_POST = __handle
+
+            def log_message(self, format, *args):
+                pass
+        return Handler
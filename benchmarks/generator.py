@@ -0,0 +1,123 @@
+"""
+Генератор синтетической олимпиады: участники, принимающие, 9 задач в 6 блоках, тэги
+и история сдач в очереди. Пользователи и очередь вставляются пачками в обход моделей,
+чтобы большие олимпиады создавались быстро
+"""
+import random
+from dataclasses import dataclass, field
+
+PROBLEMS_AMOUNT = 9
+MAX_ATTEMPTS = 3
+
+
+@dataclass
+class SyntheticOlymp:
+    olymp_id: int
+    participant_tg_ids: list[int] = field(default_factory=list)
+    examiner_tg_ids: list[int] = field(default_factory=list)
+    problem_ids: list[int] = field(default_factory=list)
+    tag_names: list[str] = field(default_factory=list)
+    queue_entries: int = 0
+
+
+def generate_olymp(
+    participants: int = 300,
+    examiners: int = 30,
+    tags: int = 5,
+    *,
+    waiting: int = 10,
+    discussing: int = 10,
+    name: str = "Синтетическая олимпиада",
+    seed: int = 0,
+) -> SyntheticOlymp:
+    """
+    Создать олимпиаду в статусе `CONTEST` в текущей базе данных
+
+    :param waiting: Сколько участников сейчас ждут в очереди
+    :param discussing: Сколько участников сейчас сдают задачу (не больше `examiners`)
+    """
+    from db import connect
+    from olymp import Olymp, OlympStatus
+    from problem import Problem, ProblemBlock, BlockType
+    from queue_entry import QueueStatus
+    from tag import Tag
+    rng = random.Random(seed)
+
+    olymp = Olymp.create(name)
+    result = SyntheticOlymp(olymp.id)
+    problems = [Problem.create(olymp.id, f"Задача {i}") for i in range(1, PROBLEMS_AMOUNT + 1)]
+    result.problem_ids = [p.id for p in problems]
+    for number in range(3):
+        block_problems = problems[number*3:number*3+3]
+        ProblemBlock.create(olymp.id, block_problems, BlockType(number))
+        ProblemBlock.create(olymp.id, block_problems, BlockType(number + 3))
+    tag_ids = [Tag.create(f"tag{i}", f"Синтетический тэг {i}", no_error=True).id for i in range(tags)]
+    result.tag_names = [f"tag{i}" for i in range(tags)]
+
+    with connect() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COALESCE(MAX(user_id), 0), COALESCE(MAX(tg_id), 0) FROM users")
+        user_id, tg_id = cur.fetchone()
+        tg_id = max(tg_id, 10**6)
+        users, user_tags, participant_rows, examiner_rows = [], [], [], []
+        for i in range(participants + examiners):
+            user_id += 1
+            tg_id += 1
+            is_participant = i < participants
+            prefix = "p" if is_participant else "e"
+            users.append((user_id, tg_id, f"{prefix}{olymp.id}_{i}", f"Имя{i}", f"Фамилия{i}"))
+            user_tags += [(user_id, tag_id) for tag_id in tag_ids if rng.random() < 0.3]
+            if is_participant:
+                participant_rows.append((olymp.id, user_id, rng.choice([8, 9, 10, 11]), rng.randint(1, 3)))
+                result.participant_tg_ids.append(tg_id)
+            else:
+                examiner_rows.append((olymp.id, user_id, f"https://conf.example/{i}", 0, 0))
+                result.examiner_tg_ids.append(tg_id)
+        cur.executemany("INSERT INTO users(user_id, tg_id, tg_handle, name, surname) VALUES (?, ?, ?, ?, ?)", users)
+        cur.executemany("INSERT INTO user_tags(user_id, tag_id) VALUES (?, ?)", user_tags)
+        cur.executemany("INSERT INTO participants(olymp_id, user_id, grade, last_block_number) VALUES (?, ?, ?, ?)",
+                        participant_rows)
+        cur.executemany("INSERT INTO examiners(olymp_id, user_id, conference_link, busyness_level, is_busy) "
+                        "VALUES (?, ?, ?, ?, ?)", examiner_rows)
+
+        cur.execute("SELECT id FROM examiners WHERE olymp_id = ? ORDER BY id", (olymp.id,))
+        examiner_ids = [row[0] for row in cur.fetchall()]
+        examiner_problems = []
+        for n, examiner_id in enumerate(examiner_ids):
+            # Каждую задачу принимают хотя бы трое, остальные задачи добавляются случайно
+            own = {result.problem_ids[(n + k) % PROBLEMS_AMOUNT] for k in range(3)}
+            own |= {problem_id for problem_id in result.problem_ids if rng.random() < 0.3}
+            examiner_problems += [(examiner_id, problem_id) for problem_id in sorted(own)]
+        cur.executemany("INSERT INTO examiner_problems(examiner_id, problem_id) VALUES (?, ?)", examiner_problems)
+
+        cur.execute("SELECT id, last_block_number FROM participants WHERE olymp_id = ? ORDER BY id", (olymp.id,))
+        participant_ids = cur.fetchall()
+        queue, busyness = [], dict.fromkeys(examiner_ids, 0)
+        finished_statuses = [QueueStatus.SUCCESS, QueueStatus.FAIL, QueueStatus.FAIL, QueueStatus.CANCELED]
+        for participant_id, last_block_number in participant_ids:
+            for problem_id in result.problem_ids[:last_block_number * 3]:
+                for _ in range(rng.randint(0, MAX_ATTEMPTS - 1)):
+                    status = rng.choice(finished_statuses)
+                    examiner_id = None if status == QueueStatus.CANCELED else rng.choice(examiner_ids)
+                    if examiner_id:
+                        busyness[examiner_id] += 1
+                    queue.append((olymp.id, participant_id, problem_id, status.value, examiner_id))
+                    if status == QueueStatus.SUCCESS:
+                        break
+        active = rng.sample(participant_ids, min(len(participant_ids), waiting + discussing))
+        for n, (participant_id, _) in enumerate(active):
+            problem_id = rng.choice(result.problem_ids[:3])
+            if n < discussing and n < len(examiner_ids):
+                examiner_id = examiner_ids[n]
+                busyness[examiner_id] += 1
+                cur.execute("UPDATE examiners SET is_busy = 1 WHERE id = ?", (examiner_id,))
+                queue.append((olymp.id, participant_id, problem_id, QueueStatus.DISCUSSING.value, examiner_id))
+            else:
+                queue.append((olymp.id, participant_id, problem_id, QueueStatus.WAITING.value, None))
+        cur.executemany("INSERT INTO queue(olymp_id, participant_id, problem_id, status, examiner_id) VALUES (?, ?, ?, ?, ?)",
+                        queue)
+        cur.executemany("UPDATE examiners SET busyness_level = ? WHERE id = ?",
+                        [(level, examiner_id) for examiner_id, level in busyness.items()])
+        result.queue_entries = len(queue)
+    olymp.status = OlympStatus.CONTEST
+    return result
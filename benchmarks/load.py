@@ -0,0 +1,236 @@
+"""
+Сквозной нагрузочный тест без сети: бот целиком (`bot.py`, опрос через `getUpdates`, пул потоков telebot)
+работает против локальной замены Telegram API (см. `benchmarks.fake_telegram`) на синтетической олимпиаде.
+
+Участники записываются в очередь на задачи (кнопка «Сдать задачу» и выбор задачи), принимающие
+выставляют «Принято»/«Не принято» и снова отмечаются через /free. Каждый следующий шаг делается,
+как только бот ответил на предыдущий. Измеряется задержка от поступления обновления
+до первого ответа бота в тот же чат и общая пропускная способность
+
+    python -m benchmarks.load [--participants N] [--examiners N] [--rounds N] [--think SECONDS] [--json PATH]
+"""
+import argparse
+import heapq
+import itertools
+import json
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from benchmarks import sandbox
+from benchmarks.generator import generate_olymp
+from benchmarks.fake_telegram import FakeTelegramServer
+
+REPLY_METHODS = {"sendMessage", "sendDocument", "sendPhoto", "copyMessage", "editMessageText",
+                 "editMessageReplyMarkup", "deleteMessage"}
+
+
+def user_json(tg_id: int) -> dict:
+    return {"id": tg_id, "is_bot": False, "first_name": "Load", "username": f"load{tg_id}"}
+
+
+class Driver:
+    """
+    Имитация участников и принимающих: реагирует на исходящие сообщения бота и ставит
+    в очередь следующие обновления
+    """
+    def __init__(self, server: FakeTelegramServer, participants: list[int], examiners: list[int],
+                 rounds: int, think: float, success_rate: float, seed: int):
+        self.server = server
+        self.rounds_left = dict.fromkeys(participants, rounds)
+        self.participants = set(participants)
+        self.examiners = set(examiners)
+        self.think = think
+        self.success_rate = success_rate
+        self.rng = random.Random(seed)
+        self.latencies: list[float] = []
+        self.latencies_by_kind: dict[str, list[float]] = {}
+        self.updates_sent = 0
+        self.last_activity = time.monotonic()
+        self.__lock = threading.Lock()
+        self.__pending: dict[int, deque[tuple[float, str]]] = {}
+        self.__scheduled: list[tuple[float, int, int, str, dict]] = []
+        self.__counter = itertools.count()
+        self.__message_ids = itertools.count(1)
+        self.__wakeup = threading.Event()
+
+    def schedule(self, chat_id: int, kind: str, update: dict):
+        with self.__lock:
+            heapq.heappush(self.__scheduled, (time.monotonic() + self.think, next(self.__counter), chat_id, kind, update))
+        self.__wakeup.set()
+
+    def send_text(self, tg_id: int, text: str, kind: str):
+        self.schedule(tg_id, kind, {"message": {
+            "message_id": next(self.__message_ids), "from": user_json(tg_id), "chat": {"id": tg_id, "type": "private"},
+            "date": int(time.time()), "text": text,
+            **({"entities": [{"type": "bot_command", "offset": 0, "length": len(text)}]} if text.startswith("/") else {}),
+        }})
+
+    def send_callback(self, tg_id: int, message_id: int, data: str, kind: str):
+        self.schedule(tg_id, kind, {"callback_query": {
+            "id": str(next(self.__counter)), "from": user_json(tg_id), "chat_instance": str(tg_id), "data": data,
+            "message": {"message_id": message_id, "from": user_json(tg_id), "chat": {"id": tg_id, "type": "private"},
+                        "date": int(time.time()), "text": "Выбери задачу для сдачи"},
+        }})
+
+    def participant_wants_to_join(self, tg_id: int):
+        if self.rounds_left[tg_id] <= 0:
+            return
+        self.rounds_left[tg_id] -= 1
+        self.send_text(tg_id, self.join_button, "Сдать задачу")
+
+    def start(self, join_button: str):
+        self.join_button = join_button
+        for tg_id in self.examiners:
+            self.send_text(tg_id, "/free", "/free")
+        for tg_id in self.participants:
+            self.participant_wants_to_join(tg_id)
+
+    def run(self, stop: threading.Event):
+        """
+        Отправлять запланированные обновления, пока не выставлен `stop`
+        """
+        while not stop.is_set():
+            with self.__lock:
+                due = []
+                now = time.monotonic()
+                while self.__scheduled and self.__scheduled[0][0] <= now:
+                    due.append(heapq.heappop(self.__scheduled))
+                wait = self.__scheduled[0][0] - now if self.__scheduled else 0.05
+            for _, _, chat_id, kind, update in due:
+                with self.__lock:
+                    self.__pending.setdefault(chat_id, deque()).append((time.perf_counter(), kind))
+                    self.updates_sent += 1
+                    self.last_activity = time.monotonic()
+                self.server.push_update(update)
+            self.__wakeup.wait(min(wait, 0.05))
+            self.__wakeup.clear()
+
+    def idle(self) -> bool:
+        with self.__lock:
+            return not self.__scheduled and not any(self.__pending.values())
+
+    def on_call(self, method: str, params: dict, timestamp: float):
+        if method not in REPLY_METHODS:
+            return
+        try:
+            chat_id = int(params.get("chat_id"))
+        except (TypeError, ValueError):
+            return
+        with self.__lock:
+            self.last_activity = time.monotonic()
+            pending = self.__pending.get(chat_id)
+            if pending:
+                sent_at, kind = pending.popleft()
+                self.latencies.append(timestamp - sent_at)
+                self.latencies_by_kind.setdefault(kind, []).append(timestamp - sent_at)
+        markup = json.loads(params["reply_markup"]) if params.get("reply_markup") else {}
+        buttons = [button for row in markup.get("keyboard", []) for button in row]
+        texts = [button["text"] if isinstance(button, dict) else button for button in buttons]
+        if chat_id in self.participants:
+            inline = [button["callback_data"] for row in markup.get("inline_keyboard", []) for button in row
+                      if button.get("callback_data", "").startswith("join_queue_") and not button["callback_data"].endswith("_cancel")]
+            if inline:
+                self.send_callback(chat_id, 1, self.rng.choice(inline), "Выбор задачи")
+            elif self.join_button in texts:
+                self.participant_wants_to_join(chat_id)
+        elif chat_id in self.examiners:
+            if "Принято" in texts:
+                verdict = "Принято" if self.rng.random() < self.success_rate else "Не принято"
+                self.send_text(chat_id, verdict, "Вердикт")
+            elif "/free" in params.get("text", "") and "Чтобы продолжить принимать задачи" in params.get("text", ""):
+                self.send_text(chat_id, "/free", "/free")
+
+
+def percentile(values: list[float], q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def summary(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "mean_ms": statistics.fmean(values) * 1000 if values else 0.0,
+        "p50_ms": percentile(values, 0.5) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "max_ms": values[-1] * 1000 if values else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--participants", type=int, default=200)
+    parser.add_argument("--examiners", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5, help="Сколько раз каждый участник записывается в очередь")
+    parser.add_argument("--think", type=float, default=0.0, help="Задержка перед каждым действием пользователя, с")
+    parser.add_argument("--success-rate", type=float, default=0.5, help="Доля принятых сдач")
+    parser.add_argument("--threads", type=int, default=2, help="Потоков обработки обновлений у бота")
+    parser.add_argument("--timeout", type=float, default=600, help="Ограничение на длительность теста, с")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Сохранить результаты в JSON-файл")
+    args = parser.parse_args()
+
+    with sandbox():
+        from db import create_update_db
+        create_update_db()
+        synthetic = generate_olymp(args.participants, args.examiners, seed=args.seed, waiting=0, discussing=0)
+        server = FakeTelegramServer()
+        driver = Driver(server, synthetic.participant_tg_ids, synthetic.examiner_tg_ids,
+                        args.rounds, args.think, args.success_rate, args.seed)
+        server.on_call = driver.on_call
+        server.start()
+        from telebot import apihelper
+        apihelper.API_URL = server.api_url
+        import bot as bot_module
+        bot = bot_module.bot
+        if bot.threaded:
+            bot.worker_pool.close()
+            from telebot.util import ThreadPool
+            bot.worker_pool = ThreadPool(bot, num_threads=args.threads)
+
+        stop = threading.Event()
+        polling = threading.Thread(target=bot.infinity_polling, kwargs={"timeout": 5, "long_polling_timeout": 1},
+                                   daemon=True)
+        driving = threading.Thread(target=driver.run, args=(stop,), daemon=True)
+        polling.start()
+        driving.start()
+        start = time.monotonic()
+        driver.start(bot_module.JOIN_QUEUE_BUTTON)
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.2)
+            if driver.idle() and time.monotonic() - driver.last_activity > 1.0:
+                break
+        elapsed = driver.last_activity - start
+        stop.set()
+        bot.stop_polling()
+        polling.join(timeout=10)
+        server.stop()
+        bot_module.state_storage.close()
+
+    report = {
+        "params": {key: value for key, value in vars(args).items() if key != "json"},
+        "elapsed_s": elapsed,
+        "updates": driver.updates_sent,
+        "unanswered": driver.updates_sent - len(driver.latencies),
+        "updates_per_s": driver.updates_sent / elapsed,
+        "latency": summary(driver.latencies),
+        "latency_by_kind": {kind: summary(values) for kind, values in driver.latencies_by_kind.items()},
+        "api_calls": server.calls,
+    }
+    print(f"Обновлений: {report['updates']} за {elapsed:.1f} с ({report['updates_per_s']:.1f}/с), "
+          f"без ответа: {report['unanswered']}")
+    print(f"{'Действие':<16} {'кол-во':>7} {'среднее, мс':>12} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'max, мс':>9}")
+    for kind, s in [("Все", report["latency"]), *sorted(report["latency_by_kind"].items())]:
+        print(f"{kind:<16} {s['count']:>7} {s['mean_ms']:>12.1f} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} "
+              f"{s['p99_ms']:>9.1f} {s['max_ms']:>9.1f}")
+    print("Вызовы API: " + ", ".join(f"{method} {count}" for method, count in sorted(server.calls.items())))
+    if args.json:
+        with open(args.json, "w", encoding="utf8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Память и выделения при загрузке олимпиады целиком (см. `benchmarks.generator`): все участники,
+принимающие, задачи, блоки задач и вся история очереди превращаются в объекты моделей.
+
+Для каждого вида объектов выводится время загрузки, число SQL-запросов, сколько памяти
+осталось занято после загрузки и пик по `tracemalloc`, число выделенных блоков памяти
+и размер одного объекта (сам объект и его `__dict__`, если он есть)
+
+    python -m benchmarks.memory [--participants N] [--examiners N] [--json PATH] [--compare PATH]
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from benchmarks import sandbox
+from benchmarks.core import commit_id, sql_queries
+from benchmarks.generator import generate_olymp
+
+
+def object_size(obj) -> int:
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def measure(load) -> tuple[list, dict]:
+    """
+    Вызвать `load()` под `tracemalloc`. Возвращает загруженные объекты и замеры
+    """
+    gc.collect()
+    queries = sql_queries()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    objects = load()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return objects, {
+        "objects": len(objects),
+        "time_ms": elapsed * 1000,
+        "sql_queries": sql_queries() - queries,
+        "retained_kib": current / 1024,
+        "peak_kib": peak / 1024,
+        "retained_blocks": blocks,
+        "object_bytes": object_size(objects[0]) if objects else 0,
+    }
+
+
+def run_benchmarks(args) -> dict:
+    from db import create_update_db
+    create_update_db()
+    synthetic = generate_olymp(args.participants, args.examiners, args.tags, seed=args.seed)
+    from olymp import Olymp
+    olymp = Olymp.current()
+    loaders = {
+        "Participant": lambda: olymp.get_participants(),
+        "Examiner": lambda: olymp.get_examiners(),
+        "Problem": lambda: olymp.get_problems(),
+        "ProblemBlock": lambda: olymp.get_problem_blocks(),
+        "QueueEntry": lambda: olymp.last_queue_entries(synthetic.queue_entries),
+    }
+    results = {}
+    loaded = [] # Объекты держатся до конца, как при загрузке олимпиады целиком
+    for name, load in loaders.items():
+        objects, results[name] = measure(load)
+        loaded.append(objects)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--participants", type=int, default=5000)
+    parser.add_argument("--examiners", type=int, default=200)
+    parser.add_argument("--tags", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Сохранить результаты в JSON-файл")
+    parser.add_argument("--compare", help="JSON-файл с результатами другого прогона для сравнения")
+    args = parser.parse_args()
+
+    with sandbox():
+        results = run_benchmarks(args)
+    report = {
+        "commit": commit_id(),
+        "python": sys.version.split()[0],
+        "params": {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+        "results": results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf8") as f:
+            baseline = json.load(f)["results"]
+
+    print(f"{'Объекты':<14} {'кол-во':>7} {'время, мс':>10} {'SQL':>7} {'занято, КиБ':>12} {'пик, КиБ':>10} "
+          f"{'блоков':>8} {'объект, Б':>10}" + (f" {'было, КиБ':>10}" if baseline else ""))
+    for name, r in results.items():
+        line = (f"{name:<14} {r['objects']:>7} {r['time_ms']:>10.1f} {r['sql_queries']:>7} {r['retained_kib']:>12.1f} "
+                f"{r['peak_kib']:>10.1f} {r['retained_blocks']:>8} {r['object_bytes']:>10}")
+        if baseline and name in baseline:
+            old = baseline[name]["retained_kib"]
+            line += f" {old:>10.1f} ({(r['retained_kib'] - old) / old * 100:+.0f}%)"
+        print(line)
+    if args.json:
+        with open(args.json, "w", encoding="utf8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
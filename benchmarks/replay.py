@@ -0,0 +1,146 @@
+"""
+Воспроизведение записанной работы бота (см. `recorder.py`, параметр `record_updates` в config.ini).
+
+Обновления из записи по очереди прогоняются через обработчики `bot.py` на копии снимка базы данных,
+без сети и без пауз, в одном потоке. Telegram API подменён, скачанные файлы берутся из записи.
+Выводится общее время, время по обработчикам и расхождения итоговой базы с записанной
+(или с другой базой, `--expected`)
+
+    python -m benchmarks.replay <папка записи> [--expected PATH] [--limit N] [--json PATH]
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from contextlib import closing
+from benchmarks import sandbox, stub_telegram_api
+
+
+def diff_databases(actual: str, expected: str) -> dict[str, dict]:
+    """
+    Сравнить таблицы двух баз построчно.
+    :return: {`таблица`: {"only_actual": N, "only_expected": N}} только для различающихся таблиц
+    """
+    from db import connect
+    result = {}
+    with closing(connect(actual)) as conn:
+        conn.execute("ATTACH DATABASE ? AS expected", (expected,))
+        tables = {row[0] for row in conn.execute(
+            "SELECT name FROM main.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")}
+        expected_tables = {row[0] for row in conn.execute(
+            "SELECT name FROM expected.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")}
+        for table in sorted(tables | expected_tables):
+            if table not in expected_tables or table not in tables:
+                result[table] = {"missing_in": "expected" if table not in expected_tables else "actual"}
+                continue
+            only_actual = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT * FROM main.`{table}` EXCEPT SELECT * FROM expected.`{table}`)").fetchone()[0]
+            only_expected = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT * FROM expected.`{table}` EXCEPT SELECT * FROM main.`{table}`)").fetchone()[0]
+            if only_actual or only_expected:
+                result[table] = {"only_actual": only_actual, "only_expected": only_expected}
+    return result
+
+
+def recorded_get_file(files_dir: str, store: bool = False):
+    """
+    Замена `utils.get_file` (или, если `store`, `utils.get_stored_file`), которая отдаёт файлы,
+    сохранённые при записи
+    """
+    from utils import UserError
+    import file_store
+    def get_file(message, bot, no_file_error: str, expected_type: str | None = None):
+        document = message.document or (message.reply_to_message and message.reply_to_message.document)
+        if not document:
+            raise UserError(no_file_error)
+        if expected_type and not document.file_name.endswith(expected_type):
+            raise UserError(f"Файл должен иметь расширение `{expected_type}`")
+        path = os.path.join(files_dir, document.file_unique_id)
+        if store:
+            with open(path, "rb") as f:
+                return file_store.save(f.read(), os.path.splitext(document.file_name)[1] or ".pdf")
+        return open(path, "rb")
+    return get_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", help="Папка записи")
+    parser.add_argument("--expected", help="База данных, с которой сравнивать результат (по умолчанию final/olymp.db из записи)")
+    parser.add_argument("--limit", type=int, help="Воспроизвести только первые N обновлений")
+    parser.add_argument("--top", type=int, default=15, help="Сколько обработчиков показывать")
+    parser.add_argument("--json", help="Сохранить отчёт в JSON-файл")
+    args = parser.parse_args()
+
+    recording = os.path.abspath(args.recording)
+    with open(os.path.join(recording, "meta.json"), encoding="utf8") as f:
+        meta = json.load(f)
+    with open(os.path.join(recording, "updates.jsonl"), encoding="utf8") as f:
+        updates = [json.loads(line) for line in f if line.strip()]
+    if args.limit:
+        updates = updates[:args.limit]
+    snapshot = os.path.join(recording, "snapshot")
+    expected = os.path.abspath(args.expected) if args.expected else os.path.join(recording, "final", "olymp.db")
+    separate_churn_db = os.path.exists(os.path.join(snapshot, "churn.db"))
+
+    with sandbox(meta["owner_id"], separate_churn_db="yes" if separate_churn_db else "no"):
+        for name in os.listdir(snapshot):
+            shutil.copy(os.path.join(snapshot, name), os.path.join("database", name))
+        stub_telegram_api()
+        from telebot.types import Update
+        import bot as bot_module
+        import perf
+        from db import DATABASE
+        bot = bot_module.bot
+        bot.threaded = False # Обновления обрабатываются строго по порядку, как одна последовательность
+        bot_module.get_file = recorded_get_file(os.path.join(recording, "files"))
+        bot_module.get_stored_file = recorded_get_file(os.path.join(recording, "files"), store=True)
+        perf.reset()
+
+        errors = 0
+        start = time.perf_counter()
+        for update in updates:
+            try:
+                bot.process_new_updates([Update.de_json(update)])
+            except Exception:
+                errors += 1
+        elapsed = time.perf_counter() - start
+        bot_module.state_storage.close()
+        handlers = perf.snapshot()["handlers"]
+        divergence = diff_databases(DATABASE, expected) if os.path.exists(expected) else None
+
+    report = {
+        "recording": recording,
+        "updates": len(updates),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "updates_per_s": len(updates) / elapsed if elapsed else 0.0,
+        "handlers": {name: stats["time"] | {"sql_queries_mean": stats["sql_queries"].get("mean", 0.0)}
+                     for name, stats in handlers.items()},
+        "divergence": divergence,
+    }
+    print(f"Обновлений: {len(updates)} за {elapsed:.2f} с ({report['updates_per_s']:.1f}/с), "
+          f"необработанных ошибок: {errors}")
+    print(f"{'Обработчик':<36} {'вызовов':>8} {'всего, мс':>10} {'среднее':>9} {'p95':>8} {'max':>8} {'SQL':>6}")
+    for name, stats in sorted(report["handlers"].items(), key=lambda item: -item[1]["total"])[:args.top]:
+        print(f"{name:<36} {stats['count']:>8} {stats['total'] * 1000:>10.1f} {stats['mean'] * 1000:>9.2f} "
+              f"{stats['p95'] * 1000:>8.2f} {stats['max'] * 1000:>8.2f} {stats['sql_queries_mean']:>6.1f}")
+    if divergence is None:
+        print(f"Итоговой базы для сравнения нет ({expected})")
+    elif not divergence:
+        print("Итоговая база совпадает с записанной")
+    else:
+        print("Расхождения итоговой базы (строк только после воспроизведения / только в записанной):")
+        for table, diff in divergence.items():
+            if "missing_in" in diff:
+                print(f"  {table}: таблицы нет в {'записанной' if diff['missing_in'] == 'expected' else 'воспроизведённой'} базе")
+            else:
+                print(f"  {table}: {diff['only_actual']} / {diff['only_expected']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
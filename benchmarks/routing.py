@@ -0,0 +1,120 @@
+"""
+Сравнение стоимости выбора обработчика для одного обновления: последовательная проверка всех
+обработчиков `bot.py` в порядке объявления фильтров (как в `telebot.TeleBot`) против
+таблицы маршрутизации `RoutedTeleBot` с упорядоченными по стоимости фильтрами.
+
+Сами обработчики не вызываются — измеряется только поиск первого подходящего.
+
+    python -m benchmarks.routing [--repeat N]
+"""
+import argparse
+import time
+from benchmarks import sandbox, OWNER_TG_ID
+
+PARTICIPANT_TG_ID = 1001
+EXAMINER_TG_ID = 2001
+
+
+def populate():
+    from db import create_update_db
+    from olymp import Olymp, OlympStatus
+    from problem import Problem, ProblemBlock, BlockType
+    from users import Participant, Examiner
+    create_update_db()
+    olymp = Olymp.create("Бенчмарк")
+    problems = [Problem.create(olymp.id, f"Задача {i}") for i in range(1, 10)]
+    for number in range(3):
+        block_problems = problems[number*3:number*3+3]
+        ProblemBlock.create(olymp.id, block_problems, BlockType(number))
+        ProblemBlock.create(olymp.id, block_problems, BlockType(number + 3))
+    Participant.create_as_new_user("participant", "Участник", "Тестовый", 9, olymp.id, tg_id=PARTICIPANT_TG_ID)
+    Examiner.create_as_new_user(
+        "examiner", "Принимающий", "Тестовый", "conf.link", olymp.id,
+        tg_id=EXAMINER_TG_ID, problems=[p.id for p in problems], is_busy=False
+    )
+    olymp.status = OlympStatus.CONTEST
+
+
+def make_message(user_id: int, text: str):
+    from telebot.types import Message
+    return Message.de_json({
+        'message_id': 1,
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'Bench', 'username': f'user{user_id}'},
+        'chat': {'id': user_id, 'type': 'private'},
+        'date': 0,
+        'text': text,
+    })
+
+
+def make_callback(user_id: int, data: str):
+    from telebot.types import CallbackQuery
+    return CallbackQuery.de_json({
+        'id': '1',
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'Bench', 'username': f'user{user_id}'},
+        'chat_instance': '1',
+        'data': data,
+        'message': make_message(user_id, "…").json,
+    })
+
+
+def first_match(bot, handlers: list[dict], update, filters_key: str):
+    """
+    :return: `handler`, `tested` — первый подходящий обработчик и количество проверенных
+    """
+    tested = 0
+    for handler in handlers:
+        tested += 1
+        if all(bot._test_filter(name, value, update) for name, value in handler[filters_key].items()):
+            return handler, tested
+    return None, tested
+
+
+def measure(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with sandbox():
+        populate()
+        import bot as bot_module
+        bot = bot_module.bot
+        samples = [
+            ("message", make_message(PARTICIPANT_TG_ID, bot_module.JOIN_QUEUE_BUTTON)),
+            ("message", make_message(PARTICIPANT_TG_ID, "/my_stats")),
+            ("message", make_message(PARTICIPANT_TG_ID, "просто текст")),
+            ("message", make_message(EXAMINER_TG_ID, "/free")),
+            ("message", make_message(EXAMINER_TG_ID, "/help")),
+            ("message", make_message(OWNER_TG_ID, "/olymp_info")),
+            ("message", make_message(OWNER_TG_ID, "/unknown_command")),
+            ("callback_query", make_callback(PARTICIPANT_TG_ID, "join_queue_3")),
+            ("callback_query", make_callback(OWNER_TG_ID, "page_list_participant_2")),
+        ]
+        print(f"{'Обновление':<42} {'До, мкс':>10} {'проверено':>10} {'После, мкс':>11} {'проверено':>10}")
+        total_before = total_after = 0.0
+        for update_type, update in samples:
+            handlers = bot.message_handlers if update_type == 'message' else bot.callback_query_handlers
+            routed = bot.route(update, handlers, update_type)
+            before, tested_before = first_match(bot, handlers, update, 'declared_filters')
+            after, tested_after = first_match(bot, routed, update, 'filters')
+            if before is not after:
+                raise AssertionError(f"Маршрутизация выбрала другой обработчик для {update_type}")
+            time_before = measure(lambda: first_match(bot, handlers, update, 'declared_filters'), args.repeat)
+            time_after = measure(lambda: first_match(bot, bot.route(update, handlers, update_type), update, 'filters'),
+                                 args.repeat)
+            total_before += time_before
+            total_after += time_after
+            name = update.text if update_type == 'message' else "callback " + update.data
+            name += f" → {before['function'].__name__ if before else '—'}"
+            print(f"{name[:42]:<42} {time_before:>10.1f} {tested_before:>10} {time_after:>11.1f} {tested_after:>10}")
+        print(f"{'Всего':<42} {total_before:>10.1f} {'':>10} {total_after:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
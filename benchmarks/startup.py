@@ -0,0 +1,108 @@
+"""
+Отчёт о времени запуска бота: разбивка времени импорта по пакетам (через `python -X importtime`),
+время повторных вызовов `create_update_db` и `Olymp.current` после импорта (сам импорт bot.py
+уже их выполнил, так что они не входят в разбивку времени импорта) и пиковое потребление памяти.
+
+Для сравнения замеряется и «жадный» запуск, при котором pandas и openpyxl импортируются сразу,
+как это было раньше.
+
+    python -m benchmarks.startup [--runs N] [--top N] [--json PATH]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from benchmarks import sandbox, ROOT
+
+BOOT_CODE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import bot
+imported = time.perf_counter()
+if {eager}:
+    import pandas, openpyxl.styles
+eager_imported = time.perf_counter()
+import db, olymp
+phase_start = time.perf_counter()
+db.create_update_db()
+db_done = time.perf_counter()
+olymp.Olymp.current()
+current_done = time.perf_counter()
+json.dump({{
+    "import_bot_ms": (imported - start) * 1000,
+    "eager_imports_ms": (eager_imported - imported) * 1000,
+    "create_update_db_ms": (db_done - phase_start) * 1000,
+    "olymp_current_ms": (current_done - db_done) * 1000,
+    "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}}, sys.stdout)
+"""
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """
+    :return: [(`module`, `self_us`, `cumulative_us`)]
+    """
+    result = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        result.append((module.strip(), int(self_us), int(cumulative_us)))
+    return result
+
+
+def boot(eager: bool) -> tuple[dict, list[tuple[str, int, int]]]:
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOT_CODE.format(eager=eager)],
+        capture_output=True, text=True, env=env, check=True
+    )
+    return json.loads(process.stdout), parse_importtime(process.stderr)
+
+
+def by_package(imports: list[tuple[str, int, int]]) -> dict[str, int]:
+    packages: dict[str, int] = {}
+    for module, self_us, _ in imports:
+        package = module.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    return dict(sorted(packages.items(), key=lambda item: -item[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Сколько раз перезапускать бота для усреднения")
+    parser.add_argument("--top", type=int, default=12, help="Сколько пакетов показывать в разбивке")
+    parser.add_argument("--json", help="Сохранить отчёт в JSON-файл")
+    args = parser.parse_args()
+
+    report = {}
+    with sandbox():
+        boot(eager=False) # Первый запуск создаёт базу данных, его не считаем
+        for mode, eager in (("lazy", False), ("eager", True)):
+            runs = [boot(eager) for _ in range(args.runs)]
+            phases = {key: sum(run[0][key] for run in runs) / len(runs) for key in runs[0][0]}
+            report[mode] = {"phases": phases, "packages_us": by_package(runs[-1][1])}
+
+    for mode, title in (("lazy", "Ленивый импорт"), ("eager", "С pandas/openpyxl при запуске")):
+        phases = report[mode]["phases"]
+        total = phases["import_bot_ms"] + phases["eager_imports_ms"]
+        print(f"{title}:")
+        print(f"  Импорт bot.py (вместе с загрузкой): {phases['import_bot_ms']:8.1f} мс")
+        if phases["eager_imports_ms"]:
+            print(f"  Импорт pandas и openpyxl:           {phases['eager_imports_ms']:8.1f} мс")
+        print(f"  Итого до начала опроса:             {total:8.1f} мс")
+        print("  Отдельно, повторные вызовы после импорта:")
+        print(f"    create_update_db:                 {phases['create_update_db_ms']:8.1f} мс")
+        print(f"    Olymp.current:                    {phases['olymp_current_ms']:8.1f} мс")
+        print(f"  Пиковая память (RSS):               {phases['maxrss_kb'] / 1024:8.1f} МБ")
+        print("  Время импорта по пакетам (собственное):")
+        for package, self_us in list(report[mode]["packages_us"].items())[:args.top]:
+            print(f"    {package:<28} {self_us / 1000:8.1f} мс")
+    if args.json:
+        with open(args.json, "w", encoding="utf8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,11 @@ import os
 from pathlib import Path
 import re
 from typing import Callable
-import json
+import time
+import threading
+from collections import OrderedDict
 from db import create_update_db, StateDBStorage
-from data import TOKEN, OWNER_ID, OWNER_HANDLE, BUTTONS_IMG
+from data import TOKEN, OWNER_ID, OWNER_HANDLE, BUTTONS_IMG, METRICS_PORT, RECORD_UPDATES
 import telebot
 from telebot.types import Message, CallbackQuery, InputFile, ReplyKeyboardMarkup, ReplyKeyboardRemove, ReplyParameters
 from telebot.formatting import escape_html
@@ -19,16 +21,24 @@ from users import User, OlympMember, Participant, Examiner
 from tag import Tag
 from problem import Problem, ProblemBlock, BlockType
 from queue_entry import QueueEntry, QueueStatus
-from utils import UserError, decline, get_arg, get_n_args, get_tags_args, get_file, save_downloaded_file
-import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
-from io import BytesIO
+from queue_event import QueueEvent
+from utils import UserError, decline, get_arg, get_n_args, get_tags_args, get_file, get_stored_file, unit_of_work
+from routing import RoutedTeleBot
+import perf
+import metrics
+import member_counts
+import render_cache
+import recorder
+import file_store
+import file_cache
+import texts
 
 
 PROMOTE_COMMANDS = False # Подсказывать ли команды участникам
 NO_EXAMINER_COMPLAINTS = False # Давать ли участникам возможность пожаловаться на то, что принимающий не пришёл
 MEMBER_PAGE_SIZE = 10 # Сколько членов олимпиады показывать в одном сообщении списка
+MEMBER_PAGE_CACHE_SIZE = 64 # Сколько заранее отрисованных страниц списков членов олимпиады хранить
+MEMBER_PAGE_CACHE_TTL = 60 # Сколько секунд заранее отрисованная страница считается актуальной
 ASK_PEOPLE_HANDLES = ['@ladnoplyashem', '@sovasofya'] # TODO: Вынести в отдельный файл
 
 
@@ -69,10 +79,11 @@ class MyExceptionHandler(telebot.ExceptionHandler):
         return handled
 
 
-bot = telebot.TeleBot(
+state_storage = StateDBStorage()
+bot = RoutedTeleBot(
     TOKEN,
     parse_mode="HTML",
-    state_storage=StateDBStorage(),
+    state_storage=state_storage,
     use_class_middlewares=True,
     disable_web_page_preview=True,
     exception_handler=MyExceptionHandler()
@@ -131,6 +142,10 @@ bot.add_custom_filter(DocCommandsFilter())
 bot.add_custom_filter(DiscussingExaminerFilter())
 
 current_olymp = Olymp.current()
+# (ID олимпиады, класс члена олимпиады, курсор страницы) ->
+# (`member_counts.generation()`, время, версии данных членов в `render_cache`, страница), см. `member_page_text`
+member_pages: OrderedDict[tuple[int, str, str], tuple[int, float, dict[int, int], tuple[str, int, int]]] = OrderedDict()
+member_pages_lock = threading.Lock()
 
 
 JOIN_QUEUE_BUTTON = "Сдать задачу"
@@ -146,11 +161,17 @@ participant_keyboard_in_queue.add(LEAVE_QUEUE_BUTTON, MY_STATS_BUTTON)
 participant_keyboard_olymp_finished = ReplyKeyboardMarkup(resize_keyboard=True)
 participant_keyboard_olymp_finished.add(MY_STATS_BUTTON)
 
-def participant_keyboard_choose_problem(participant: Participant):
-    buttons = {f"{i+1}: {problem.name}": {'callback_data': f'join_queue_{i+1}'} 
-               for i, problem in enumerate(participant.problems())}
-    buttons["Отмена"] = {'callback_data': 'join_queue_cancel'}
-    return quick_markup(buttons, row_width=3)
+def participant_keyboard_choose_problem(participant: Participant) -> str:
+    """
+    Клавиатура выбора задачи в виде JSON (`reply_markup` принимает его вместо `InlineKeyboardMarkup`).
+    Собирается один раз, пока у участника не изменятся блоки задач
+    """
+    def render():
+        buttons = {f"{i+1}: {problem.name}": {'callback_data': f'join_queue_{i+1}'} 
+                   for i, problem in enumerate(participant.problems())}
+        buttons["Отмена"] = {'callback_data': 'join_queue_cancel'}
+        return quick_markup(buttons, row_width=3).to_json()
+    return participant.cached_render(("participants", participant.id, "keyboard_choose_problem"), render)
 
 
 BUTTON_HELP = (f"Чтобы сдать задачу, используй кнопку «{JOIN_QUEUE_BUTTON}» "
@@ -221,7 +242,7 @@ def send_welcome(message: Message):
     bot.send_message(message.chat.id, f"Пользователь не найден. Если ты регистрировался(-лась) на олимпиаду, напиши {OWNER_HANDLE}")
 
 
-@bot.callback_query_handler(lambda callback_query: callback_query.data.startswith('handle_changed_'))
+@bot.callback_query_handler(callback_prefix='handle_changed_')
 def handle_change_handler(callback_query: CallbackQuery):
     handle_changed = callback_query.data.endswith('_yes')
     message = callback_query.message
@@ -263,7 +284,7 @@ def send_authentication_confirmation(member: OlympMember, *, already_authenticat
     if current_olymp.status == OlympStatus.CONTEST and isinstance(member, Participant) and not member.finished:
         bot.send_photo(
             member.tg_id,
-            photo=InputFile(BUTTONS_IMG, "Где_кнопки.png"),
+            photo=file_cache.input_file(BUTTONS_IMG, "Где_кнопки.png"),
             caption=BUTTON_HELP,
             reply_markup=participant_keyboard,
             show_caption_above_media=True
@@ -276,39 +297,17 @@ def send_all_problem_blocks(participant: Participant):
         problem_block = participant.problem_block_from_number(problem_block_number)
         bot.send_document(
             participant.tg_id,
-            InputFile(problem_block.path or ProblemBlock.DEFAULT_PATH, f"Блок_{problem_block_number}.pdf")
+            file_cache.input_file(problem_block.path or ProblemBlock.DEFAULT_PATH, f"Блок_{problem_block_number}.pdf")
         )
 
 
 @bot.message_handler(commands=['help'], roles=['owner', 'examiner', 'participant'])
 def help(message: Message):
-    commands = [[["help", "Показать список команд"]]]
-    roles = []
-    if message.from_user.id == OWNER_ID:
-        roles.append('owner')
-    if current_olymp and Examiner.from_tg_id(message.from_user.id, current_olymp.id, no_error=True):
-        roles.append('examiner')
-    if current_olymp and Participant.from_tg_id(message.from_user.id, current_olymp.id, no_error=True):
-        roles.append('participant')
-    several_roles = (len(roles) > 1)
-    for role in roles:
-        with open(os.path.join("help", f"{role}.json"), encoding="utf8") as f:
-            data = json.load(f)
-        if several_roles:
-            commands.append(data["title"])
-        commands += data["commands"]
-    response = ""
-    for block in commands:
-        if isinstance(block, str):
-            bot.send_message(message.chat.id, response)
-            response = f"<strong>{block}</strong>\n\n"
-            continue
-        for command_description in block:
-            command, description = tuple(command_description)
-            command = ("/" + command) if (" " not in command) else f"<code>/{escape_html(command)}</code>"
-            response += command + " — " + description + "\n"
-        response += "\n"
-    bot.send_message(message.chat.id, response)
+    roles = ('owner',) if message.from_user.id == OWNER_ID else ()
+    if current_olymp:
+        roles += tuple(current_olymp.member_roles(message.from_user.id))
+    for response in texts.help_messages(roles):
+        bot.send_message(message.chat.id, response)
 
 
 @bot.message_handler(
@@ -370,14 +369,12 @@ def olymp_reg_start(message: Message):
     if current_olymp.status != OlympStatus.TBA:
         raise UserError("Олимпиада уже идёт или завершилась")
     current_olymp.status = OlympStatus.REGISTRATION
-    participants = current_olymp.get_participants()
-    examiners = current_olymp.get_examiners()
-    for p in participants:
+    for p in current_olymp.iter_participants():
         if p.tg_id:
             p_message = (f"Мы запустили авторизацию в боте для онлайн-участников. Тебя авторизовали автоматически!\n"
                          f"{p.display_data()}")
             bot.send_message(p.tg_id, p_message)
-    for e in examiners:
+    for e in current_olymp.iter_examiners():
         if e.tg_id:
             e_message = (f"Мы запустили авторизацию в боте. Тебя автоматически авторизовали как принимающего!\n"
                          f"{e.display_data()}")
@@ -394,16 +391,15 @@ def start_olymp():
     if current_olymp.status != OlympStatus.REGISTRATION:
         raise UserError("Олимпиада уже идёт или завершилась")
     current_olymp.status = OlympStatus.CONTEST
-    participants = current_olymp.get_participants()
     participant_message = (f"Олимпиада началась! Можешь приступать к решению задач\n"
                            f"Если у тебя возникли вопросы, обращайся к "
                            f"{' или '.join(ASK_PEOPLE_HANDLES)} (организационные вопросы) "
                            f"или к {OWNER_HANDLE} (функционирование бота)")
-    for p in participants:
+    for p in current_olymp.iter_participants():
         if p.tg_id:
             bot.send_photo(
                 p.tg_id,
-                photo=InputFile(BUTTONS_IMG, "Где_кнопки.png"),
+                photo=file_cache.input_file(BUTTONS_IMG, "Где_кнопки.png"),
                 caption=BUTTON_HELP,
                 reply_markup=participant_keyboard,
                 show_caption_above_media=True
@@ -411,11 +407,10 @@ def start_olymp():
             problem_block = p.last_block
             bot.send_document(
                 p.tg_id,
-                document=InputFile(problem_block.path or ProblemBlock.DEFAULT_PATH, "Блок_1.pdf"),
+                document=file_cache.input_file(problem_block.path or ProblemBlock.DEFAULT_PATH, "Блок_1.pdf"),
                 caption=participant_message
             )
-    examiners = current_olymp.get_examiners()
-    for e in examiners:
+    for e in current_olymp.iter_examiners():
         if e.tg_id:
             bot.delete_state(e.tg_id, e.tg_id, bot_id = bot.bot_id)
             bot.send_message(
@@ -474,7 +469,7 @@ def olymp_start(message: Message):
     }))
 
 
-@bot.callback_query_handler(lambda callback_query: callback_query.data.startswith('start_olymp_'))
+@bot.callback_query_handler(callback_prefix='start_olymp_')
 def olymp_start_confirmation_handler(callback_query: CallbackQuery):
     confirmed = callback_query.data.endswith('confirm')
     message = callback_query.message
@@ -504,9 +499,8 @@ def finish_olymp():
             f"Олимпиада частично завершена, {decline(participants_left, 'продолжа', ('ет', 'ют', 'ют'))} "
             f"участие {participants_left} {decline(participants_left, 'участник', ('', 'а', 'ов'))}"
         )
-    for e in current_olymp.get_examiners():
-        if e.tg_id:
-            bot.send_message(e.tg_id, e_message)
+    for tg_id, _ in current_olymp.examiner_contacts():
+        bot.send_message(tg_id, e_message)
     bot.send_message(OWNER_ID, owner_message)
 
 
@@ -523,26 +517,27 @@ def olymp_finish(message: Message):
     
     include_tags, exclude_tags = get_tags_args(message)
     tags_defined = not(include_tags is None and exclude_tags is None)
-    participants = current_olymp.get_participants(finished=False, include_tags=include_tags, exclude_tags=exclude_tags)
-    if not participants:
+    if not current_olymp.participants_amount(finished=False, include_tags=include_tags, exclude_tags=exclude_tags):
         if tags_defined:
             raise UserError("По указанным фильтрам нет участников, для которых олимпиада ещё не завершена")
         else:
             return finish_olymp()
-    examiners = current_olymp.get_examiners()
     p_not_in_queue_message = ("Олимпиада завершилась! Больше записываться в очередь нельзя. "
                               "Можешь отправляться на заслуженный отдых")
     p_in_queue_message = ("Олимпиада завершилась! Больше записываться в очередь нельзя, "
                           "но тех, кто уже записался, мы проверим, так что не уходи")
-    for p in participants:
-        p.finished = True
-        if p.tg_id:
-            is_in_queue = p.queue_entry is not None
-            bot.send_message(
-                p.tg_id,
-                p_in_queue_message if is_in_queue else p_not_in_queue_message,
-                reply_markup = None if is_in_queue else participant_keyboard_olymp_finished
-            )
+    receivers = []
+    with unit_of_work():
+        for p in current_olymp.iter_participants(finished=False, include_tags=include_tags, exclude_tags=exclude_tags):
+            p.finished = True
+            if p.tg_id:
+                receivers.append((p.tg_id, p.queue_entry is not None))
+    for tg_id, is_in_queue in receivers:
+        bot.send_message(
+            tg_id,
+            p_in_queue_message if is_in_queue else p_not_in_queue_message,
+            reply_markup = None if is_in_queue else participant_keyboard_olymp_finished
+        )
     if current_olymp.unhandled_queue_left(finished=True):
         participants_left = current_olymp.participants_amount(finished=False)
         if participants_left == 0:
@@ -555,9 +550,8 @@ def olymp_finish(message: Message):
         e_message = ("Но мы ещё работаем с очередью, так что не уходи раньше времени. "
                      "Если ты завершил(-а) проверку, и даже в статусе /free к тебе никто "
                      "не идёт — тогда можешь идти отдыхать")
-        for e in examiners:
-            if e.tg_id:
-                bot.send_message(e.tg_id, e_message)
+        for tg_id, _ in current_olymp.examiner_contacts():
+            bot.send_message(tg_id, e_message)
         bot.send_message(message.chat.id, owner_message)
     else:
         finish_olymp()
@@ -601,13 +595,14 @@ def olymp_create(message: Message):
 
 def upload_members(message: Message, required_key: str, key_description: str, member_class: type[OlympMember],
                    term_stem: str, term_endings: tuple[str, str, str], term_endings_gen: tuple[str, str, str]):
+    import pandas as pd # Тяжёлый импорт, нужен только здесь и в results_command
     if not current_olymp:
         raise UserError("Нет текущей олимпиады")
     if current_olymp.status not in [OlympStatus.TBA, OlympStatus.REGISTRATION]:
         raise UserError("Олимпиада уже начата")
     required_columns = ["name", "surname", "tg_handle", required_key]
-    file_data = get_file(message, bot, "Необходимо указать Excel-таблицу", ".xlsx")
-    member_table = pd.read_excel(BytesIO(file_data))
+    with get_file(message, bot, "Необходимо указать Excel-таблицу", ".xlsx") as file:
+        member_table = pd.read_excel(file)
     if not set(required_columns).issubset(set(member_table.columns)):
         raise UserError("Таблица должна содержать столбцы " + ', '.join([f'<code>{col}</code>' for col in required_columns]))
     old_members_amount = 0
@@ -619,7 +614,7 @@ def upload_members(message: Message, required_key: str, key_description: str, me
             if user.name != m["name"] or user.surname != m["surname"]:
                 old_user = user
         if member := member_class.from_tg_handle(m["tg_handle"], current_olymp.id, no_error=True):
-            value = member._additional_values[required_key]
+            value = getattr(member, required_key)
             if value != m[required_key]:
                 old_user = member
             old_members_amount += 1
@@ -641,9 +636,9 @@ def upload_members(message: Message, required_key: str, key_description: str, me
         for old_user, member in updated_users:
             if isinstance(old_user, member_class):
                 response += (f"\n- {old_user.full_name}, "
-                             f"{key_description.format(old_user._additional_values[required_key])} "
+                             f"{key_description.format(getattr(old_user, required_key))} "
                              f"→ {member.full_name}, "
-                             f"{key_description.format(member._additional_values[required_key])} "
+                             f"{key_description.format(getattr(member, required_key))} "
                              f"({member.display_tg_handle()})")
             else:
                 response += f"\n- {old_user.full_name} → {member.full_name} ({member.display_tg_handle()})"
@@ -857,7 +852,7 @@ def return_participant_to_queue(participant: Participant):
         participant_response = (f"Вернули тебя в начало очереди на задачу {problem_number}: {problem}. "
                                 f"Свободных принимающих пока нет, но бот напишет тебе, когда подходящий принимающий освободится")
         if PROMOTE_COMMANDS:
-            participant_response += f"Чтобы покинуть очередь, используй команду /leave_queue"
+            participant_response += texts.LEAVE_QUEUE_HINT
         bot.send_message(participant.tg_id, participant_response, reply_markup=participant_keyboard_in_queue)
 
 
@@ -935,8 +930,8 @@ def view_member_command(message: Message):
         view_member(message, Examiner, 'принимающий', 'принимающего')
 
 
-def list_members_page(message: Message, member_class: type[OlympMember], page: int, member_amount: int, title: str,
-                      get_func: Callable[[int, int], list[OlympMember]]):
+def list_members_page(message: Message, member_class: type[OlympMember], page: int, page_cursor: str, member_amount: int,
+                      title: str, get_func: Callable[[int | None, int | None, int], list[OlympMember]]):
     """
     Отредактировать сообщение `message`, чтобы отобразить страницу `page` списка членов олимпиады
 
@@ -949,14 +944,19 @@ def list_members_page(message: Message, member_class: type[OlympMember], page: i
     :param page: Номер страницы
     :type page: `int`
 
+    :param page_cursor: Где начинается страница: `a<ID>` — после члена олимпиады с этим ID,
+    `b<ID>` — заканчивается перед ним
+    :type page_cursor: `str`
+
     :param member_amount: Количество членов олимпиады
     :type member_amount: `int``
 
     :param title: Заголовок сообщения о списке
     :type title: `str`
 
-    :param get_func: Функция получения списка из номера первого члена олимпиады и длины списка
-    :type get_func: get_list(start, limit) -> `list[OlympMember]`
+    :param get_func: Функция получения списка из ID, после которого он начинается, ID, перед которым
+    он заканчивается, и длины списка
+    :type get_func: get_list(after_id, before_id, limit) -> `list[OlympMember]`
     """
     if not current_olymp:
         raise UserError("Нет текущей олимпиады")
@@ -967,40 +967,81 @@ def list_members_page(message: Message, member_class: type[OlympMember], page: i
         bot.edit_message_text(title, message.chat.id, message.id, reply_markup=quick_markup(buttons))
         return
     max_page = (member_amount-1) // MEMBER_PAGE_SIZE + 1
-    if page > max_page:
-        page = max_page
-    text = title + f"\nСтраница {page}/{max_page}"
+    page = min(page, max_page)
+    page_text, first_id, last_id = member_page_text(member_class, page_cursor, get_func)
+    if not page_text:
+        # Члены олимпиады, от которых отсчитывалась страница, удалены — показываем список с начала
+        page, page_cursor = 1, 'a0'
+        page_text, first_id, last_id = member_page_text(member_class, page_cursor, get_func)
+    text = title + f"\nСтраница {page}/{max_page}" + page_text
     buttons = {}
     if page == 1:
         buttons['← X'] = callback_invalid
     else:
-        buttons[f'← {page-1}'] = {'callback_data': f'page_list_{member_class_name}_{page-1}'}
+        buttons[f'← {page-1}'] = {'callback_data': f'page_list_{member_class_name}_{page-1}_b{first_id}'}
     if page == max_page:
         buttons['X →'] = callback_invalid
     else:
-        buttons[f'{page+1} →'] = {'callback_data': f'page_list_{member_class_name}_{page+1}'}
-    member_list = get_func((page-1)*MEMBER_PAGE_SIZE, MEMBER_PAGE_SIZE)
-    for member in member_list:
-        text += f"\n- {member}"
+        buttons[f'{page+1} →'] = {'callback_data': f'page_list_{member_class_name}_{page+1}_a{last_id}'}
     text += f"\nЧтобы просмотреть подробную информацию о ком-то одном, используй команду <code>/view_{member_class_name}</code>"
     bot.edit_message_text(text, message.chat.id, message.id, reply_markup=quick_markup(buttons))
 
 
-def list_participants_page(message: Message, page: int):
+def member_page_text(member_class: type[OlympMember], page_cursor: str,
+                     get_func: Callable[[int | None, int | None, int], list[OlympMember]]) -> tuple[str, int, int]:
+    """
+    Строки страницы списка членов олимпиады, начинающейся с `page_cursor` (см. `list_members_page`).
+    Вместе со страницей загружается и отрисовывается следующая в том же направлении:
+    её почти наверняка откроют следующей, и тогда она возьмётся из `member_pages`, если с тех пор не менялись
+    ни состав олимпиады, ни данные членов на странице
+    :return: `текст страницы`, `ID первого`, `ID последнего` (пустой текст, если на странице никого нет)
+    """
+    key = (current_olymp.id, member_class.__name__, page_cursor)
+    with member_pages_lock:
+        cached = member_pages.get(key)
+        if cached:
+            member_pages.move_to_end(key)
+    if (cached and cached[0] == member_counts.generation() and time.monotonic() - cached[1] < MEMBER_PAGE_CACHE_TTL
+            and render_cache.fresh(cached[2])):
+        return cached[3]
+    backward = page_cursor[0] == 'b'
+    member_id = int(page_cursor[1:])
+    members = get_func(None if backward else member_id, member_id if backward else None, MEMBER_PAGE_SIZE * 2)
+    if backward:
+        current, adjacent = members[-MEMBER_PAGE_SIZE:], members[:-MEMBER_PAGE_SIZE]
+    else:
+        current, adjacent = members[:MEMBER_PAGE_SIZE], members[MEMBER_PAGE_SIZE:]
+    if not current:
+        return "", 0, 0
+    result = "".join(f"\n- {member}" for member in current), current[0].id, current[-1].id
+    if adjacent:
+        adjacent_cursor = f"b{current[0].id}" if backward else f"a{current[-1].id}"
+        adjacent_page = "".join(f"\n- {member}" for member in adjacent), adjacent[0].id, adjacent[-1].id
+        stamps = {member.user_id: member.render_stamp for member in adjacent}
+        with member_pages_lock:
+            member_pages[(current_olymp.id, member_class.__name__, adjacent_cursor)] = (
+                member_counts.generation(), time.monotonic(), stamps, adjacent_page
+            )
+            while len(member_pages) > MEMBER_PAGE_CACHE_SIZE:
+                member_pages.popitem(last=False)
+    return result
+
+
+def list_participants_page(message: Message, page: int, page_cursor: str = 'a0'):
     amount = current_olymp.participants_amount()
     list_members_page(
-        message, Participant, page, amount,
+        message, Participant, page, page_cursor, amount,
         f"В олимпиаде {decline(amount, 'участву', ('ет', 'ют', 'ет'))} {amount} {decline(amount, 'человек', ('', 'а', ''))}",
-        lambda start, limit: current_olymp.get_participants(start, limit, sort=True)
+        lambda after_id, before_id, limit: current_olymp.get_participants_page(after_id=after_id, before_id=before_id, limit=limit)
     )
 
 
-def list_examiners_page(message: Message, page: int):
+def list_examiners_page(message: Message, page: int, page_cursor: str = 'a0'):
     amount = current_olymp.examiners_amount()
     list_members_page(
-        message, Examiner, page, amount, 
+        message, Examiner, page, page_cursor, amount, 
         f"В олимпиаде {amount} {decline(amount, 'принимающ', ('ий', 'их', 'их'))}",
-        lambda start, limit: current_olymp.get_examiners(start, limit, sort=True)
+        lambda after_id, before_id, limit: current_olymp.get_examiners_page(after_id=after_id, before_id=before_id, limit=limit)
     )
 
 
@@ -1016,18 +1057,19 @@ def list_members_command(message: Message):
         list_examiners_page(reply, 1)
 
 
-@bot.callback_query_handler(lambda callback_query: callback_query.data.startswith('page_list_'))
+@bot.callback_query_handler(callback_prefix='page_list_')
 def list_members_page_handler(callback_query: CallbackQuery):
     message = callback_query.message
-    member_type, page = callback_query.data[len('page_list_'):].split('_')
+    member_type, page, *page_cursor = callback_query.data[len('page_list_'):].split('_')
     if page == 'invalid':
         bot.answer_callback_query(callback_query.id, "Страницы нет")
         return
-    page = int(page)
+    # В кнопках, созданных до появления курсоров, есть только номер страницы — такие списки открываются с начала
+    page, page_cursor = (int(page), page_cursor[0]) if page_cursor else (1, 'a0')
     if member_type == 'participant':
-        list_participants_page(message, page)
+        list_participants_page(message, page, page_cursor)
     else:
-        list_examiners_page(message, page)
+        list_examiners_page(message, page, page_cursor)
 
 
 @bot.message_handler(commands=['olymp_info'], roles=['owner'])
@@ -1035,10 +1077,7 @@ def olymp_info(message: Message):
     if not current_olymp:
         response = f"Нет текущей олимпиады"
     else:
-        p_amount = current_olymp.participants_amount()
-        p_finished = current_olymp.participants_amount(finished=True)
-        e_amount = current_olymp.examiners_amount()
-        pr_amount = current_olymp.problems_amount()
+        p_amount, p_finished, e_amount, pr_amount = current_olymp.amounts()
         response = (f"Олимпиада <em>{current_olymp.name}</em>:\n"
                     f"<strong>ID:</strong> <code>{current_olymp.id}</code>\n"
                     f"<strong>Статус:</strong> <code>{current_olymp.status.name}</code>\n"
@@ -1050,6 +1089,50 @@ def olymp_info(message: Message):
     bot.send_message(message.chat.id, response)
 
 
+@bot.message_handler(commands=['perf'], roles=['owner'])
+def perf_command(message: Message):
+    syntax_hint = "Синтаксис команды: <code>/perf [dump|reset]</code>"
+    args = get_n_args(message, 0, 1, syntax_hint)
+    if not args:
+        bot.send_message(message.chat.id, perf.report())
+    elif args[0] == "dump":
+        Path("created_files").mkdir(exist_ok=True)
+        dump_path = os.path.join("created_files", f"perf_{int(time.time())}.json")
+        perf.dump(dump_path)
+        with open(dump_path, "rb") as dump:
+            bot.send_document(message.chat.id, InputFile(dump, os.path.basename(dump_path)), caption="Замеры производительности")
+    elif args[0] == "reset":
+        perf.reset()
+        bot.send_message(message.chat.id, "Замеры производительности сброшены")
+    else:
+        raise UserError(syntax_hint)
+
+
+@bot.message_handler(commands=['olymp_counters'], roles=['owner'])
+def olymp_counters(message: Message):
+    syntax_hint = "Синтаксис команды: <code>/olymp_counters [fix]</code>"
+    args = get_n_args(message, 0, 1, syntax_hint)
+    if args and args[0] != "fix":
+        raise UserError(syntax_hint)
+    if not current_olymp:
+        raise UserError("Нет текущей олимпиады")
+    names = ("Незавершивших участников", "Записей в очереди у незавершивших участников",
+             "Записей в очереди у завершивших участников", "Свободных принимающих", "Занятых принимающих")
+    counters = current_olymp.counters()
+    recounted = current_olymp.recount_counters()
+    response = f"Счётчики олимпиады <em>{current_olymp.name}</em> (сохранённое значение / пересчёт):\n"
+    for name, value, actual in zip(names, counters, recounted):
+        response += f"{name}: {value} / {actual}" + (" ❗️" if value != actual else "") + "\n"
+    if tuple(counters) == tuple(recounted):
+        response += "Счётчики совпадают с пересчётом"
+    elif args:
+        current_olymp.reset_counters()
+        response += "Счётчики исправлены"
+    else:
+        response += "Счётчики расходятся с пересчётом. Чтобы исправить их, используй команду <code>/olymp_counters fix</code>"
+    bot.send_message(message.chat.id, response)
+
+
 @bot.message_handler(
     commands=['last_queue_entries'], 
     roles=['owner'],
@@ -1068,37 +1151,61 @@ def last_queue_entries(message: Message):
         key, value = match.groups()
         if key in settings:
             raise UserError(syntax_hint)
-        match key:
-            case 'limit': value = int(value)
-            case 'problem': value = Problem.from_id(value)
-            case 'participant': value = Participant.from_tg_handle(value, current_olymp.id)
-            case 'examiner': value = Examiner.from_tg_handle(value, current_olymp.id)
+        if key in ['problem', 'limit']:
+            if not value.isnumeric():
+                raise UserError(syntax_hint)
+            value = int(value)
         settings[key] = value
-    limit = settings.get('limit', 10)
-    chosen_participant: Participant | None = settings.get('participant')
-    chosen_examiner: Examiner | None = settings.get('examiner')
-    chosen_problem: Problem | None = settings.get('problem')
-    queue_entries = current_olymp.last_queue_entries(
-        limit,
-        participant=chosen_participant,
-        examiner=chosen_examiner,
-        problem=chosen_problem
+    send_queue_history(
+        message.chat.id,
+        settings.get('limit', 10),
+        participant=settings.get('participant'),
+        examiner=settings.get('examiner'),
+        problem=settings.get('problem')
     )
-    response = f"Записи в очереди:\n"
-    for queue_entry in queue_entries:
-        participant: Participant = chosen_participant or Participant.from_id(queue_entry.participant_id)
-        examiner: Examiner | None = chosen_examiner or (Examiner.from_id(queue_entry.examiner_id) if queue_entry.examiner_id else None)
-        problem: Problem = chosen_problem or Problem.from_id(queue_entry.problem_id)
-        response += (f"ЗАПИСЬ <code>{queue_entry.id}</code>\n"
-                     f"- <strong>Участник:</strong> {participant} ({participant.grade} класс)\n")
-        if examiner: 
-            response += f"- <strong>Принимающий:</strong> {examiner}\n"
-        else: response += "- <strong>Принимающий</strong> не назначен\n"
-        response += (f"- <strong>Задача:</strong> <code>{problem.id}</code> {problem}\n"
-                     f"- <strong>Статус:</strong> {queue_entry.status}\n")
-    bot.send_message(message.chat.id, response)
-    
-        
+
+
+def send_queue_history(
+    chat_id: int, limit: int, *,
+    before_id: int | None = None,
+    participant: int | str | None = None,
+    examiner: int | str | None = None,
+    problem: int | None = None
+):
+    """
+    Отправить записи в очереди (см. `Olymp.queue_history`) с кнопкой, которая показывает более ранние записи
+    """
+    queue_entries = current_olymp.queue_history(
+        limit, before_id=before_id, participant=participant, examiner=examiner, problem=problem
+    )
+    if not queue_entries:
+        bot.send_message(chat_id, "Записей в очереди нет" if not before_id else "Более ранних записей нет")
+        return
+    response = f"Записи в очереди:\n" + "".join(queue_entry.display() for queue_entry in queue_entries)
+    reply_markup = None
+    if len(queue_entries) == limit:
+        # Хэндлы в кнопку не помещаются, поэтому фильтры по участнику и принимающему передаются их ID из записей
+        participant_id = queue_entries[0].participant_id if participant else ''
+        examiner_id = queue_entries[0].examiner_id if examiner else ''
+        reply_markup = quick_markup({'Более ранние записи': {'callback_data': (
+            f'queue_history_{queue_entries[0].id}_{participant_id}_{examiner_id}_{problem or ""}_{limit}'
+        )}})
+    bot.send_message(chat_id, response, reply_markup=reply_markup)
+
+
+@bot.callback_query_handler(callback_prefix='queue_history_')
+def queue_history_handler(callback_query: CallbackQuery):
+    message = callback_query.message
+    if not current_olymp:
+        raise UserError("Нет текущей олимпиады")
+    before_id, participant, examiner, problem, limit = [
+        int(value) if value else None for value in callback_query.data[len('queue_history_'):].split('_')
+    ]
+    bot.edit_message_reply_markup(message.chat.id, message.id, reply_markup=None)
+    send_queue_history(
+        message.chat.id, limit, before_id=before_id, participant=participant, examiner=examiner, problem=problem
+    )
+
 
 @bot.message_handler(
     commands=['update_queue_entry_status'],
@@ -1174,9 +1281,10 @@ def update_queue_entry_problem(message: Message):
                 f"{examiner.full_name}, по ссылке {examiner.conference_link}"
             )
             return
-        queue_entry.status = QueueStatus.WAITING
-        queue_entry.examiner_id = None
-        examiner.is_busy = True
+        with unit_of_work():
+            queue_entry.status = QueueStatus.WAITING
+            queue_entry.examiner_id = None
+            examiner.is_busy = True
         bot.send_message(
             examiner.tg_id,
             f"Участнику {participant.full_name} сменили задачу на задачу, которую ты не принимаешь\n"
@@ -1279,7 +1387,6 @@ def problem_info(message: Message):
 def problem_block_create(message: Message):
     if not current_olymp:
         raise UserError("Нет текущей олимпиады")
-    file = get_file(message, bot, "Необходим файл с условиями задач", ".pdf")
     args = get_n_args(message, 3, 4, "Необходимо указать задачи для блока")
     problems = list(map(int, args[:3]))
     block_type = None
@@ -1287,7 +1394,7 @@ def problem_block_create(message: Message):
         if not re.match(r"^(JUNIOR|SENIOR)_[123]$", args[3]):
             raise UserError("Тип блока должен быть указан в форме <code>(JUNIOR|SENIOR)_(1|2|3)</code>")
         block_type = BlockType[args[3]]
-    path = save_downloaded_file(file)
+    path = get_stored_file(message, bot, "Необходим файл с условиями задач", ".pdf")
     problem_block = ProblemBlock.create(current_olymp.id, problems, block_type=block_type, path=path)
     response = (f"Блок {problem_block} создан!\n"
                 f"Задачи:")
@@ -1350,7 +1457,7 @@ def problem_block_info(message: Message):
     if problem_block.path:
         bot.send_document(
             message.chat.id,
-            InputFile(problem_block.path, f"Блок_{problem_block.id}.pdf"),
+            file_cache.input_file(problem_block.path, f"Блок_{problem_block.id}.pdf"),
             caption=response
         )
     else:
@@ -1381,9 +1488,8 @@ def problem_block_update_type(message: Message):
 def problem_block_update_file(message: Message):
     if not current_olymp:
         raise UserError("Нет текущей олимпиады")
-    file = get_file(message, bot, "Необходим файл с условиями задач", ".pdf")
     problem_block = get_problem_block_from_arg(message)
-    path = save_downloaded_file(file)
+    path = get_stored_file(message, bot, "Необходим файл с условиями задач", ".pdf")
     problem_block.delete_file(no_error=True)
     problem_block.path = path
     bot.send_message(message.chat.id, f"Файл блока {problem_block} обновлён")
@@ -1433,7 +1539,7 @@ def problem_block_delete(message: Message):
     )
 
 
-@bot.callback_query_handler(lambda callback_query: callback_query.data.startswith('delete_block_'))
+@bot.callback_query_handler(callback_prefix='delete_block_')
 def delete_block_handler(callback_query: CallbackQuery):
     message = callback_query.message
     bot.delete_message(message.chat.id, message.id)
@@ -1513,9 +1619,10 @@ def examiner_busyness_status(message: Message):
 
 
 def announce_queue_entry(queue_entry: QueueEntry):
-    participant: Participant = Participant.from_id(queue_entry.participant_id)
-    problem: Problem = Problem.from_id(queue_entry.problem_id)
-    problem_number = participant.get_problem_number(problem)
+    event = QueueEvent.load(queue_entry)
+    participant = event.participant
+    problem = event.problem
+    problem_number = event.problem_number
     p_continues = (current_olymp.status == OlympStatus.CONTEST and not participant.finished)
     
     # Нет принимающего
@@ -1524,26 +1631,26 @@ def announce_queue_entry(queue_entry: QueueEntry):
             response = (f"Ты теперь в очереди на задачу {problem_number}: {problem}. "
                         f"Свободных принимающих пока нет, но бот напишет тебе, когда подходящий принимающий освободится")
             if PROMOTE_COMMANDS:
-                response += f"\nЧтобы покинуть очередь, используй команду /leave_queue"
+                response += "\n" + texts.LEAVE_QUEUE_HINT
             bot.send_message(participant.tg_id, response, reply_markup=participant_keyboard_in_queue)
             return
         elif queue_entry.status == QueueStatus.CANCELED:
             if p_continues:
                 response = "Ты больше не в очереди"
                 if PROMOTE_COMMANDS:
-                    response += (". Чтобы записаться на сдачу задачи снова, используй команду <code>"
-                                 + escape_html("/queue <номер задачи>")
-                                 + "</code>")
+                    response += ". " + texts.JOIN_QUEUE_AGAIN_HINT
                 keyboard = participant_keyboard
             else:
                 response = "Ты больше не в очереди. Олимпиада завершена, можешь отправляться на заслуженный отдых"
                 keyboard = participant_keyboard_olymp_finished
             bot.send_message(participant.tg_id, response, reply_markup=keyboard)
-            if participant.finished and not current_olymp.unhandled_queue_left(finished=True):
-                finish_olymp()
+            if participant.finished:
+                event.refresh_counters()
+                if not event.unhandled_queue_left:
+                    finish_olymp()
             return
     
-    examiner: Examiner = Examiner.from_id(queue_entry.examiner_id)
+    examiner = event.examiner
 
     # Приём завершён
     if queue_entry.status not in QueueStatus.active():
@@ -1551,7 +1658,7 @@ def announce_queue_entry(queue_entry: QueueEntry):
         if queue_entry.status == QueueStatus.FAIL:
             participant_response = f"Задача {problem_number}: {problem} не принята"
             if p_continues:
-                attempts = participant.attempts_left(problem)
+                attempts = event.attempts_left
                 participant_response += (f". У тебя {decline(attempts, 'остал', ('ась', 'ось', 'ось'))} "
                                         f"{attempts} {decline(attempts, 'попыт', ('ка', 'ки', 'ок'))}, "
                                         f"чтобы её сдать")
@@ -1563,48 +1670,43 @@ def announce_queue_entry(queue_entry: QueueEntry):
             examiner_response = (f"Сдача задачи {problem} участником {participant.full_name} отменена")
         elif queue_entry.status == QueueStatus.SUCCESS:
             participant_response = f"Задача {problem_number}: {problem} принята! Поздравляем"
-            if p_continues and participant.should_get_new_problem(problem):
+            if p_continues and event.should_get_new_problem():
                 new_problem_block = participant.give_next_problem_block()
                 participant_response += (f"\nЗа решение этой задачи тебе полагается {participant.last_block_number} блок задач. "
                                          f"Теперь можешь сдавать и их!")
             examiner_response = (f"Задача {problem} отмечена как успешно сданная участником {participant.full_name}")
         if p_continues:
-            can_continue = (participant.last_block_number != 3)
-            if not can_continue:
-                for _, success, attempts in participant.results()[1]:
-                    if not success and (attempts > 0):
-                        can_continue = True
-                        break
+            can_continue = (participant.last_block_number != 3 or new_problem_block is not None or event.solvable_left)
             if not can_continue:
                 participant_response += ("\n✅ У тебя не осталось задач, которые можно сдавать! Так что "
                                          "для тебя олимпиада завершена, можешь отправляться на заслуженный отдых")
-                participant.finished = True
+                event.finish_participant()
                 bot.send_message(participant.tg_id, participant_response, reply_markup=participant_keyboard_olymp_finished)
                 bot.send_message(OWNER_ID, f"Участник {participant} завершил олимпиаду!")
-                if current_olymp.participants_amount(finished=False) == 0:
+                if event.unfinished_participants == 0:
                     finish_olymp()
                 return
             if PROMOTE_COMMANDS:
-                participant_response += ("\nЧтобы записаться на сдачу задачи, используй команду <code>"
-                                        + escape_html("/queue <номер задачи>")
-                                        + "</code>")
+                participant_response += "\n" + texts.JOIN_QUEUE_HINT
             keyboard = participant_keyboard
         else:
             participant_response += "\nОлимпиада завершена, можешь отправляться на заслуженный отдых"
             keyboard = participant_keyboard_olymp_finished
-        unhandled_queue_left = current_olymp.unhandled_queue_left(finished=True)
+        if participant.finished:
+            event.refresh_counters()
+        unhandled_queue_left = event.unhandled_queue_left
         if current_olymp.status == OlympStatus.CONTEST or unhandled_queue_left:
             examiner_response += "\n❗️ Чтобы продолжить принимать задачи, используй команду /free"
         if new_problem_block:
             bot.send_document(
                 participant.tg_id, 
-                document=InputFile(new_problem_block.path or ProblemBlock.DEFAULT_PATH, f"Блок_{participant.last_block_number}.pdf"),
+                document=file_cache.input_file(new_problem_block.path or ProblemBlock.DEFAULT_PATH, f"Блок_{participant.last_block_number}.pdf"),
                 caption=participant_response,
                 reply_markup=keyboard
             )
         else:
             bot.send_message(participant.tg_id, participant_response, reply_markup=keyboard)
-        bot.send_message(examiner.tg_id, examiner_response, reply_markup=ReplyKeyboardRemove() if not examiner.queue_entry else None)
+        bot.send_message(examiner.tg_id, examiner_response, reply_markup=ReplyKeyboardRemove() if not event.examiner_in_queue else None)
         if participant.finished and not unhandled_queue_left:
             finish_olymp()
         return
@@ -1648,7 +1750,7 @@ def withdraw_examiner(message: Message):
 
 
 @bot.callback_query_handler(
-    lambda callback_query: callback_query.data.startswith('examiner_didnt_come'), 
+    callback_prefix='examiner_didnt_come',
     olymp_statuses=[OlympStatus.CONTEST, OlympStatus.QUEUE]
 )
 def examiner_didnt_come_handler(callback_query: CallbackQuery):
@@ -1703,7 +1805,7 @@ def queue(message: Message):
         problem_number = participant.get_problem_number(problem)
         error_message = f"Ты уже в очереди на задачу {problem_number}: {problem}"
         if PROMOTE_COMMANDS:
-            error_message += ". Чтобы покинуть очередь, используй команду /leave_queue"
+            error_message += ". " + texts.LEAVE_QUEUE_HINT
         bot.delete_message(temp_reply.chat.id, temp_reply.id)
         raise UserError(error_message, reply_markup=participant_keyboard_in_queue)
     if match := re.match(r"/queue (\d+)", message.text):
@@ -1717,7 +1819,7 @@ def queue(message: Message):
 
 
 @bot.callback_query_handler(
-    lambda callback_query: callback_query.data.startswith('join_queue_'),
+    callback_prefix='join_queue_',
     olymp_statuses=[OlympStatus.CONTEST])
 def join_queue_handler(callback_query: CallbackQuery):
     message = callback_query.message
@@ -1735,7 +1837,7 @@ def join_queue_handler(callback_query: CallbackQuery):
         problem_number = participant.get_problem_number(problem)
         error_message = f"Ты уже в очереди на задачу {problem_number}: {problem}"
         if PROMOTE_COMMANDS:
-            error_message += ". Чтобы покинуть очередь, используй команду /leave_queue"
+            error_message += ". " + texts.LEAVE_QUEUE_HINT
         raise UserError(error_message, reply_markup=participant_keyboard_in_queue)
     problem_number = int(callback_query.data[len('join_queue_'):])
     join_queue(participant, problem_number)
@@ -1771,9 +1873,7 @@ def leave_queue(message: Message):
             return
         error_message = "Ты уже не в очереди"
         if PROMOTE_COMMANDS:
-            error_message += (". Чтобы записаться на сдачу задачи, используй команду <code>"
-                              + escape_html("/queue <номер задачи>")
-                              + "</code>")
+            error_message += ". " + texts.JOIN_QUEUE_HINT
         raise UserError(error_message, reply_markup=participant_keyboard)
     if queue_entry.status != QueueStatus.WAITING:
         raise UserError("Нельзя покинуть очередь во время сдачи задач")
@@ -1793,7 +1893,7 @@ def leave_queue(message: Message):
 
 
 @bot.callback_query_handler(
-    lambda callback_query: callback_query.data.startswith('leave_queue_'), 
+    callback_prefix='leave_queue_',
     olymp_statuses=[OlympStatus.CONTEST, OlympStatus.QUEUE]
 )
 def leave_queue_handler(callback_query: CallbackQuery):
@@ -1810,9 +1910,7 @@ def leave_queue_handler(callback_query: CallbackQuery):
     if not queue_entry:
         error_message = "Ты уже не в очереди"
         if PROMOTE_COMMANDS and not participant.finished:
-            error_message += (". Чтобы записаться в очередь, используй команду <code>"
-                              + escape_html("/queue <номер задачи>")
-                              + "</code>")
+            error_message += ". " + texts.JOIN_QUEUE_SHORT_HINT
         raise UserError(error_message, 
                         reply_markup=participant_keyboard_olymp_finished if participant.finished else participant_keyboard)
     if queue_entry.status != QueueStatus.WAITING:
@@ -1826,11 +1924,10 @@ def give_out_problem_block(message: Message):
     command = extract_command(message.text)
     new_problem_block_number = 2 if command == 'give_out_second_block' else 3
     include_tags, exclude_tags = get_tags_args(message)
-    participants = current_olymp.get_participants(finished=False, include_tags=include_tags, exclude_tags=exclude_tags)
     issues_no_prev = 0
     issues_contact = 0
     receivers = 0
-    for p in participants:
+    for p in current_olymp.iter_participants(finished=False, include_tags=include_tags, exclude_tags=exclude_tags):
         last_block_number = p.last_block_number
         if last_block_number < new_problem_block_number - 1:
             issues_no_prev += 1
@@ -1841,13 +1938,11 @@ def give_out_problem_block(message: Message):
                 participant_reply = (f"Тебе выдан {'второй' if last_block_number + 1 == 2 else 'завершающий третий'} блок задач. "
                                      f"Теперь можешь решать и сдавать их тоже!")
                 if PROMOTE_COMMANDS:
-                    participant_reply += (f"\nЧтобы записаться на сдачу задачи, используй команду <code>"
-                                          + escape_html("/queue <номер задачи>")
-                                          + "</code>")
+                    participant_reply += "\n" + texts.JOIN_QUEUE_HINT
                 try:
                     bot.send_document(
                         p.tg_id,
-                        InputFile(new_problem_block.path or ProblemBlock.DEFAULT_PATH, f"Блок_{last_block_number + 1}.pdf"),
+                        file_cache.input_file(new_problem_block.path or ProblemBlock.DEFAULT_PATH, f"Блок_{last_block_number + 1}.pdf"),
                         caption=participant_reply
                     )
                 except Exception as send_error:
@@ -1883,12 +1978,10 @@ def give_problem_block(message: Message):
     participant_reply = (f"Тебе выдан {'второй' if participant.last_block_number == 2 else 'завершающий третий'} блок задач. "
                          f"Теперь можешь решать и сдавать их тоже!")
     if PROMOTE_COMMANDS:
-        participant_reply += ("\nЧтобы записаться на сдачу задачи, используй команду <code>"
-                              + escape_html("/queue <номер задачи>")
-                              + "</code>")
+        participant_reply += "\n" + texts.JOIN_QUEUE_HINT
     bot.send_document(
         participant.tg_id,
-        InputFile(problem_block.path or ProblemBlock.DEFAULT_PATH, f"Блок_{participant.last_block_number}.pdf"),
+        file_cache.input_file(problem_block.path or ProblemBlock.DEFAULT_PATH, f"Блок_{participant.last_block_number}.pdf"),
         caption=participant_reply
     )
     bot.send_message(
@@ -1935,24 +2028,22 @@ def announce_command(message: Message):
     e_amount = 0
     err_amount = 0
     if send_to_participants:
-        for p in current_olymp.get_participants(include_tags=include_tags, exclude_tags=exclude_tags):
-            if p.tg_id:
-                try:
-                    bot.copy_message(p.tg_id, announcement.chat.id, announcement.id)
-                    p_amount += 1
-                except Exception as send_error:
-                    err_amount += 1
+        for tg_id, _ in current_olymp.participant_contacts(include_tags=include_tags, exclude_tags=exclude_tags):
+            try:
+                bot.copy_message(tg_id, announcement.chat.id, announcement.id)
+                p_amount += 1
+            except Exception as send_error:
+                err_amount += 1
         owner_response += f"{p_amount} {decline(p_amount, 'участник', ('', 'а', 'ов'))}"
     if send_to_participants and send_to_examiners:
         owner_response += " и "
     if send_to_examiners:
-        for e in current_olymp.get_examiners(include_tags=include_tags, exclude_tags=exclude_tags):
-            if e.tg_id:
-                try:
-                    bot.copy_message(e.tg_id, announcement.chat.id, announcement.id)
-                    e_amount += 1
-                except Exception as send_error:
-                    err_amount += 1
+        for tg_id, _ in current_olymp.examiner_contacts(include_tags=include_tags, exclude_tags=exclude_tags):
+            try:
+                bot.copy_message(tg_id, announcement.chat.id, announcement.id)
+                e_amount += 1
+            except Exception as send_error:
+                err_amount += 1
         owner_response += f"{e_amount} {decline(e_amount, 'принимающ', ('ий', 'их', 'их'))}"
     owner_response += " получил" + ("и" if p_amount + e_amount > 1 else "") + " оповещение!"
     if err_amount:
@@ -1970,6 +2061,8 @@ def announce_command(message: Message):
     olymp_statuses=[OlympStatus.CONTEST, OlympStatus.QUEUE, OlympStatus.RESULTS]
 )
 def results_command(message: Message):
+    import pandas as pd # Тяжёлые импорты, нужны только здесь и в upload_members
+    from openpyxl.styles import Font, Alignment
     COLUMNS = {
         'ID': 7.0,
         'ФИО': 25.0,
@@ -1979,7 +2072,7 @@ def results_command(message: Message):
     COLUMNS['Сумма'] = 10.3
     junior_table = pd.DataFrame(columns=COLUMNS.keys())
     senior_table = pd.DataFrame(columns=COLUMNS.keys())
-    for participant in current_olymp.get_participants():
+    for participant in current_olymp.iter_participants():
         sum, problem_results = participant.results()
         row = [None, f'{participant.surname} {participant.name}', participant.grade]
         for _, successful, number in problem_results:
@@ -2053,17 +2146,30 @@ def other_messages(message: Message):
     raise UserError(error_message, contact_note=False)
 
 
-print("Запускаю бота...")
+perf.install(bot)
+
 
-owner_startup_message = "Бот запущен!"
-if not current_olymp:
-    owner_startup_message += (
-        "\nТекущая олимпиада не выбрана. Чтобы установить текущую олимпиаду, используй команду <code>"
-        + escape_html("/olymp_select <название>")
-        + "</code>")
-try:
-    bot.send_message(OWNER_ID, owner_startup_message)
-except ApiTelegramException as e:
-    print("! Не удалось оповестить владельца. Проверь owner_id в файле config.ini")
+if __name__ == "__main__":
+    print("Запускаю бота...")
 
-bot.infinity_polling()
+    owner_startup_message = "Бот запущен!"
+    if not current_olymp:
+        owner_startup_message += (
+            "\nТекущая олимпиада не выбрана. Чтобы установить текущую олимпиаду, используй команду <code>"
+            + escape_html("/olymp_select <название>")
+            + "</code>")
+    try:
+        bot.send_message(OWNER_ID, owner_startup_message)
+    except ApiTelegramException as e:
+        print("! Не удалось оповестить владельца. Проверь owner_id в файле config.ini")
+
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT, bot)
+        print(f"Метрики доступны на http://127.0.0.1:{METRICS_PORT}/metrics")
+    if RECORD_UPDATES:
+        print(f"Обновления записываются в {recorder.start(OWNER_ID)}")
+    file_store.collect_garbage()
+
+    bot.infinity_polling()
+    state_storage.close()
+    recorder.stop()
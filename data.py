@@ -14,6 +14,18 @@ __data = __config["data"]
 TOKEN = __data["token"]
 OWNER_ID = int(__data["owner_id"])
 OWNER_HANDLE = __data["owner_handle"]
+# Хранить ли часто меняющиеся данные (состояния, логи, метрики) в отдельном файле базы данных
+# database/churn.db (по умолчанию да). При первом запуске с отдельной базой состояния telebot
+# переносятся в неё из olymp.db
+SEPARATE_CHURN_DB = __data.getboolean("separate_churn_db", fallback=True)
+# Обработчики, работающие дольше этого времени (в мс), записываются в лог вместе с их SQL-запросами
+SLOW_HANDLER_MS = __data.getint("slow_handler_ms", fallback=500)
+# Порт для метрик в формате Prometheus на 127.0.0.1. 0 — не запускать сервер метрик
+METRICS_PORT = __data.getint("metrics_port", fallback=0)
+# Записывать ли полученные обновления и снимки базы данных для воспроизведения (см. recorder.py)
+RECORD_UPDATES = __data.getboolean("record_updates", fallback=False)
+# Сколько мегабайт памяти можно занять под часто отправляемые файлы (см. file_cache.py)
+FILE_CACHE_MB = __data.getint("file_cache_mb", fallback=32)
 
 PREDEFINED_PATH = "predefined_files"
 BUTTONS_IMG = os.path.join(PREDEFINED_PATH, "buttons.png")
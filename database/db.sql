@@ -98,4 +98,100 @@ CREATE TABLE IF NOT EXISTS `queue` (
 	FOREIGN KEY(`participant_id`) REFERENCES `participants`(`id`),
 	FOREIGN KEY(`problem_id`) REFERENCES `problems`(`id`),
 	FOREIGN KEY(`examiner_id`) REFERENCES `examiners`(`id`)
-);
\ No newline at end of file
+);
+CREATE TABLE IF NOT EXISTS `db_meta` (
+	`key` text primary key NOT NULL UNIQUE,
+	`value` text NOT NULL
+);;
+CREATE TABLE IF NOT EXISTS `olymp_counters` (
+	`olymp_id` INTEGER primary key NOT NULL UNIQUE,
+	`unfinished_participants` INTEGER NOT NULL DEFAULT 0,
+	`active_queue_unfinished` INTEGER NOT NULL DEFAULT 0,
+	`active_queue_finished` INTEGER NOT NULL DEFAULT 0,
+	`free_examiners` INTEGER NOT NULL DEFAULT 0,
+	`busy_examiners` INTEGER NOT NULL DEFAULT 0,
+	FOREIGN KEY(`olymp_id`) REFERENCES `olymps`(`id`) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS `queue_participant_status` ON `queue`(`participant_id`, `status`);
+CREATE TRIGGER IF NOT EXISTS `olymp_counters_olymp_insert` AFTER INSERT ON `olymps`
+BEGIN
+	INSERT OR IGNORE INTO `olymp_counters`(`olymp_id`) VALUES (NEW.`id`);
+END;
+CREATE TRIGGER IF NOT EXISTS `olymp_counters_olymp_delete` AFTER DELETE ON `olymps`
+BEGIN
+	DELETE FROM `olymp_counters` WHERE `olymp_id` = OLD.`id`;
+END;
+CREATE TRIGGER IF NOT EXISTS `olymp_counters_participant_insert` AFTER INSERT ON `participants`
+WHEN NEW.`finished` = 0
+BEGIN
+	UPDATE `olymp_counters` SET `unfinished_participants` = `unfinished_participants` + 1 WHERE `olymp_id` = NEW.`olymp_id`;
+END;
+CREATE TRIGGER IF NOT EXISTS `olymp_counters_participant_delete` AFTER DELETE ON `participants`
+WHEN OLD.`finished` = 0
+BEGIN
+	UPDATE `olymp_counters` SET `unfinished_participants` = `unfinished_participants` - 1 WHERE `olymp_id` = OLD.`olymp_id`;
+END;
+CREATE TRIGGER IF NOT EXISTS `olymp_counters_participant_finished` AFTER UPDATE OF `finished` ON `participants`
+WHEN OLD.`finished` != NEW.`finished`
+BEGIN
+	UPDATE `olymp_counters` SET
+		`unfinished_participants` = `unfinished_participants` + (NEW.`finished` = 0) - (OLD.`finished` = 0),
+		`active_queue_unfinished` = `active_queue_unfinished` + ((NEW.`finished` = 0) - (OLD.`finished` = 0)) * (
+			SELECT COUNT(*) FROM `queue` WHERE `participant_id` = NEW.`id` AND `status` IN (0, 2)
+		),
+		`active_queue_finished` = `active_queue_finished` + ((NEW.`finished` = 1) - (OLD.`finished` = 1)) * (
+			SELECT COUNT(*) FROM `queue` WHERE `participant_id` = NEW.`id` AND `status` IN (0, 2)
+		)
+	WHERE `olymp_id` = NEW.`olymp_id`;
+END;
+CREATE TRIGGER IF NOT EXISTS `olymp_counters_queue_insert` AFTER INSERT ON `queue`
+WHEN NEW.`status` IN (0, 2)
+BEGIN
+	UPDATE `olymp_counters` SET
+		`active_queue_unfinished` = `active_queue_unfinished` + IFNULL((SELECT `finished` = 0 FROM `participants` WHERE `id` = NEW.`participant_id`), 0),
+		`active_queue_finished` = `active_queue_finished` + IFNULL((SELECT `finished` = 1 FROM `participants` WHERE `id` = NEW.`participant_id`), 0)
+	WHERE `olymp_id` = NEW.`olymp_id`;
+END;
+CREATE TRIGGER IF NOT EXISTS `olymp_counters_queue_delete` AFTER DELETE ON `queue`
+WHEN OLD.`status` IN (0, 2)
+BEGIN
+	UPDATE `olymp_counters` SET
+		`active_queue_unfinished` = `active_queue_unfinished` - IFNULL((SELECT `finished` = 0 FROM `participants` WHERE `id` = OLD.`participant_id`), 0),
+		`active_queue_finished` = `active_queue_finished` - IFNULL((SELECT `finished` = 1 FROM `participants` WHERE `id` = OLD.`participant_id`), 0)
+	WHERE `olymp_id` = OLD.`olymp_id`;
+END;
+CREATE TRIGGER IF NOT EXISTS `olymp_counters_queue_update` AFTER UPDATE OF `status`, `participant_id`, `olymp_id` ON `queue`
+WHEN (OLD.`status` IN (0, 2)) != (NEW.`status` IN (0, 2))
+	OR (NEW.`status` IN (0, 2) AND (OLD.`participant_id` != NEW.`participant_id` OR OLD.`olymp_id` != NEW.`olymp_id`))
+BEGIN
+	UPDATE `olymp_counters` SET
+		`active_queue_unfinished` = `active_queue_unfinished` - IFNULL((SELECT `finished` = 0 FROM `participants` WHERE `id` = OLD.`participant_id`), 0),
+		`active_queue_finished` = `active_queue_finished` - IFNULL((SELECT `finished` = 1 FROM `participants` WHERE `id` = OLD.`participant_id`), 0)
+	WHERE `olymp_id` = OLD.`olymp_id` AND OLD.`status` IN (0, 2);
+	UPDATE `olymp_counters` SET
+		`active_queue_unfinished` = `active_queue_unfinished` + IFNULL((SELECT `finished` = 0 FROM `participants` WHERE `id` = NEW.`participant_id`), 0),
+		`active_queue_finished` = `active_queue_finished` + IFNULL((SELECT `finished` = 1 FROM `participants` WHERE `id` = NEW.`participant_id`), 0)
+	WHERE `olymp_id` = NEW.`olymp_id` AND NEW.`status` IN (0, 2);
+END;
+CREATE TRIGGER IF NOT EXISTS `olymp_counters_examiner_insert` AFTER INSERT ON `examiners`
+BEGIN
+	UPDATE `olymp_counters` SET
+		`free_examiners` = `free_examiners` + (NEW.`is_busy` = 0),
+		`busy_examiners` = `busy_examiners` + (NEW.`is_busy` = 1)
+	WHERE `olymp_id` = NEW.`olymp_id`;
+END;
+CREATE TRIGGER IF NOT EXISTS `olymp_counters_examiner_delete` AFTER DELETE ON `examiners`
+BEGIN
+	UPDATE `olymp_counters` SET
+		`free_examiners` = `free_examiners` - (OLD.`is_busy` = 0),
+		`busy_examiners` = `busy_examiners` - (OLD.`is_busy` = 1)
+	WHERE `olymp_id` = OLD.`olymp_id`;
+END;
+CREATE TRIGGER IF NOT EXISTS `olymp_counters_examiner_busy` AFTER UPDATE OF `is_busy` ON `examiners`
+WHEN OLD.`is_busy` != NEW.`is_busy`
+BEGIN
+	UPDATE `olymp_counters` SET
+		`free_examiners` = `free_examiners` + (NEW.`is_busy` = 0) - (OLD.`is_busy` = 0),
+		`busy_examiners` = `busy_examiners` + (NEW.`is_busy` = 1) - (OLD.`is_busy` = 1)
+	WHERE `olymp_id` = NEW.`olymp_id`;
+END
\ No newline at end of file
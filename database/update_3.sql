@@ -1,5 +1,4 @@
-PRAGMA foreign_keys = off;
-BEGIN TRANSACTION;
+-- Выполняется в транзакции мигратора (db.migrate) при выключенных внешних ключах
 ALTER TABLE `queue` RENAME TO `queue_old`;
 CREATE TABLE IF NOT EXISTS `queue` (
 	`id` integer primary key NOT NULL UNIQUE,
@@ -17,5 +16,3 @@ CREATE TABLE IF NOT EXISTS `queue` (
 );
 INSERT INTO `queue`(`id`, `olymp_id`, `participant_id`, `problem_id`, `status`, `examiner_id`) SELECT * FROM `queue_old`;
 DROP TABLE `queue_old`;
-COMMIT;
-PRAGMA foreign_keys = on;
\ No newline at end of file
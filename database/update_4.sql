@@ -1,5 +1,4 @@
-PRAGMA foreign_keys = off;
-BEGIN TRANSACTION;
+-- Выполняется в транзакции мигратора (db.migrate) при выключенных внешних ключах
 ALTER TABLE `participants` RENAME TO `participants_old`;
 CREATE TABLE IF NOT EXISTS `participants` (
 	`id` integer primary key NOT NULL UNIQUE,
@@ -27,5 +26,3 @@ CREATE TABLE IF NOT EXISTS `examiners` (
 );
 INSERT INTO `examiners`(`id`, `olymp_id`, `user_id`, `conference_link`, `busyness_level`, `is_busy`) SELECT * FROM `examiners_old`;
 DROP TABLE `examiners_old`;
-COMMIT;
-PRAGMA foreign_keys = on;
\ No newline at end of file
@@ -0,0 +1,4 @@
+CREATE TABLE IF NOT EXISTS `db_meta` (
+	`key` text primary key NOT NULL UNIQUE,
+	`value` text NOT NULL
+);
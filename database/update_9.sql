@@ -0,0 +1,10 @@
+-- В базах, обновлённых до версии 5, у tags.name нет UNIQUE (см. update_5.sql), а Tag.create на него опирается.
+-- Тэги с одинаковым кодом сливаются в тэг с наименьшим ID
+UPDATE `user_tags` SET `tag_id` = (
+	SELECT MIN(`same`.`id`) FROM `tags` JOIN `tags` AS `same` ON `same`.`name` = `tags`.`name`
+	WHERE `tags`.`id` = `user_tags`.`tag_id`
+)
+WHERE `tag_id` IN (SELECT `id` FROM `tags`);
+DELETE FROM `user_tags` WHERE `rowid` NOT IN (SELECT MIN(`rowid`) FROM `user_tags` GROUP BY `user_id`, `tag_id`);
+DELETE FROM `tags` WHERE `id` NOT IN (SELECT MIN(`id`) FROM `tags` GROUP BY `name`);
+CREATE UNIQUE INDEX IF NOT EXISTS `tags_name` ON `tags`(`name`)
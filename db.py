@@ -1,16 +1,41 @@
 import os
+import time
+import atexit
+import threading
+import hashlib
+import tempfile
+from contextlib import closing
 from enum import Enum
 import sqlite3
 from enums import OlympStatus, QueueStatus, BlockType
+from data import SEPARATE_CHURN_DB
+from perf import TracedConnection
 from telebot.states import State
 from telebot.storage.base_storage import StateStorageBase
 
 __DATABASE_DIR = "database"
 __DATABASE_FILE = "olymp.db"
 DATABASE = os.path.join(__DATABASE_DIR, __DATABASE_FILE)
-DB_VERSION = 6
+__CHURN_DATABASE_FILE = "churn.db"
+# База для часто меняющихся и не особо ценных данных: состояний telebot, логов доставки, метрик.
+# Если она отдельная, запись в неё не блокирует основную базу с очередью и участниками
+CHURN_DATABASE = os.path.join(__DATABASE_DIR, __CHURN_DATABASE_FILE) if SEPARATE_CHURN_DB else DATABASE
+DB_VERSION = 9
 DB_VERSION_FILE = os.path.join(__DATABASE_DIR, "version.txt")
 SCRIPT_FILE = os.path.join(__DATABASE_DIR, "db.sql")
+ENUM_TABLES: list[tuple[type[Enum], str]] = [
+    (OlympStatus, "olymp_status"),
+    (QueueStatus, "queue_status"),
+    (BlockType, "block_types"),
+]
+
+def connect(database: str = DATABASE, *, check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Открыть соединение с базой данных бота: основной (`DATABASE`)
+    или базой часто меняющихся данных (`CHURN_DATABASE`).
+    Запросы через соединение учитываются в замерах `perf`
+    """
+    return sqlite3.connect(database, check_same_thread=check_same_thread, factory=TracedConnection)
 
 def set_enum(enum_type: type[Enum], table: str, cursor: sqlite3.Cursor):
     for e in list(enum_type):
@@ -25,44 +50,128 @@ def set_enum(enum_type: type[Enum], table: str, cursor: sqlite3.Cursor):
         cursor.execute(q, (id, name))
     cursor.connection.commit()
 
-def create_update_db():
-    if __DATABASE_FILE not in os.listdir(__DATABASE_DIR):
+def enums_checksum() -> str:
+    """
+    Контрольная сумма перечислений, которые хранятся в базе данных.
+    Если она совпадает с сохранённой, перечисления заново не синхронизируются
+    """
+    data = ";".join(table + ":" + ",".join(f"{e.value}={e.name}" for e in enum_type) for enum_type, table in ENUM_TABLES)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+def sync_enums(cursor: sqlite3.Cursor, force: bool = False):
+    checksum = enums_checksum()
+    cursor.execute("SELECT value FROM db_meta WHERE key = 'enums_checksum'")
+    fetch = cursor.fetchone()
+    if fetch and fetch[0] == checksum and not force:
+        return
+    for enum_type, table in ENUM_TABLES:
+        set_enum(enum_type, table, cursor=cursor)
+    cursor.execute(
+        "INSERT INTO db_meta(key, value) VALUES ('enums_checksum', ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (checksum,)
+    )
+    cursor.connection.commit()
+
+def get_db_version(cursor: sqlite3.Cursor) -> int:
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+def migration_scripts(from_version: int, to_version: int = DB_VERSION) -> list[tuple[int, str]]:
+    scripts = []
+    for version in range(from_version + 1, to_version + 1):
+        update_file = os.path.join(__DATABASE_DIR, f"update_{version}.sql")
+        with open(update_file, encoding="utf8") as f:
+            scripts.append((version, f.read()))
+    return scripts
+
+def init_version(connection: sqlite3.Connection):
+    """
+    Для базы без версии в `PRAGMA user_version`: создать схему с нуля, если база пустая,
+    или перенести версию из старого файла `version.txt`
+    """
+    cur = connection.cursor()
+    if get_db_version(cur) != 0:
+        return
+    cur.execute("SELECT COUNT(*) FROM sqlite_master")
+    if cur.fetchone()[0] == 0:
         with open(SCRIPT_FILE, encoding="utf8") as f:
             script = f.read()
-        with sqlite3.connect(DATABASE) as con:
-            cur = con.cursor()
-            cur.executescript(script)
-            con.commit()
-    else:
-        with open(DB_VERSION_FILE) as f:
-            current_version = int(f.read())
-        if current_version != DB_VERSION:
-            scripts = []
-            for version in range(current_version + 1, DB_VERSION + 1):
-                update_file = os.path.join(__DATABASE_DIR, f"update_{version}.sql")
-                with open(update_file, encoding="utf8") as f:
-                    scripts.append(f.read())
-            with sqlite3.connect(DATABASE) as con:
-                cur = con.cursor()
-                for script in scripts:
-                    cur.executescript(script)
-                con.commit()
-    with open(DB_VERSION_FILE, "w") as f:
-        f.write(str(DB_VERSION))
-    with sqlite3.connect(DATABASE) as con:
+        connection.executescript(f"BEGIN;\n{script};\nPRAGMA user_version = {DB_VERSION};\nCOMMIT;")
+        return
+    if not os.path.exists(DB_VERSION_FILE):
+        raise RuntimeError(f"Не удалось определить версию базы данных {DATABASE}")
+    with open(DB_VERSION_FILE) as f:
+        legacy_version = int(f.read())
+    cur.execute(f"PRAGMA user_version = {legacy_version}")
+    connection.commit()
+    os.remove(DB_VERSION_FILE)
+
+def migrate(connection: sqlite3.Connection, to_version: int = DB_VERSION) -> list[tuple[int, float]]:
+    """
+    Применить обновления схемы. Каждое обновление выполняется в одной транзакции
+    вместе с повышением версии, так что при ошибке база остаётся в предыдущей версии
+
+    :return: [(`version`, `seconds`)]
+    """
+    cur = connection.cursor()
+    cur.execute("PRAGMA foreign_keys = OFF")
+    timings = []
+    for version, script in migration_scripts(get_db_version(cur), to_version):
+        start = time.perf_counter()
+        try:
+            connection.executescript(f"BEGIN;\n{script};\nPRAGMA user_version = {version};\nCOMMIT;")
+        except sqlite3.Error:
+            if connection.in_transaction:
+                connection.rollback()
+            raise
+        timings.append((version, time.perf_counter() - start))
+    return timings
+
+def migrate_copy(database: str = DATABASE) -> list[tuple[int, float]]:
+    """
+    Прогнать обновления схемы на копии базы данных, не трогая саму базу
+
+    :return: [(`version`, `seconds`)]
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_path = os.path.join(tmp, "olymp_copy.db")
+        with closing(sqlite3.connect(database)) as source, closing(sqlite3.connect(copy_path)) as copy:
+            source.backup(copy)
+            cur = copy.cursor()
+            if get_db_version(cur) == 0 and os.path.exists(DB_VERSION_FILE):
+                with open(DB_VERSION_FILE) as f:
+                    cur.execute(f"PRAGMA user_version = {int(f.read())}")
+            return migrate(copy)
+
+def create_update_db():
+    with closing(connect()) as con:
         cur = con.cursor()
-        set_enum(OlympStatus, "olymp_status", cursor=cur)
-        set_enum(QueueStatus, "queue_status", cursor=cur)
-        set_enum(BlockType, "block_types", cursor=cur)
+        if get_db_version(cur) != DB_VERSION:
+            init_version(con)
+            migrate(con)
+        sync_enums(cur)
 
 class StateDBStorage(StateStorageBase):
+    """
+    Хранилище состояний telebot. Состояния держатся в памяти процесса, а в SQLite
+    записываются пачками: в фоне раз в `flush_interval` секунд, при накоплении
+    `batch_size` изменений и при завершении работы (см. `flush`, `close`)
+    """
+    __KEY_COLUMNS = ['chat_id', 'user_id', 'business_connection_id', 'message_thread_id', 'bot_id']
+
     def __init__(
         self,
-        database_path: str = DATABASE,
-        table_name: str = 'telebot_states'
+        database_path: str = CHURN_DATABASE,
+        table_name: str = 'telebot_states',
+        *,
+        flush_interval: float | None = 1.0,
+        batch_size: int = 50,
     ):
         self.database = database_path
         self.table_name = table_name
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
         q = (f"""
         CREATE TABLE IF NOT EXISTS {self.table_name} (
             chat_id INTEGER NOT NULL,
@@ -74,19 +183,122 @@ class StateDBStorage(StateStorageBase):
             PRIMARY KEY(chat_id, user_id, bot_id)
         )
         """)
-        with sqlite3.connect(self.database) as conn:
-            cur = conn.cursor()
-            cur.execute(q)
-            conn.commit()
+        columns = ', '.join(self.__KEY_COLUMNS)
+        self.__select_q = f"SELECT {columns}, state FROM {self.table_name}"
+        self.__delete_q = (f"DELETE FROM {self.table_name} WHERE "
+                           + ' AND '.join(f"{column} IS ?" for column in self.__KEY_COLUMNS))
+        # Первичный ключ — только (chat_id, user_id, bot_id): ключи, которые отличаются остальными столбцами,
+        # хранятся одной строкой, как раньше, и побеждает последняя запись
+        self.__upsert_q = (f"INSERT INTO {self.table_name} ({columns}, state) VALUES (?, ?, ?, ?, ?, ?) "
+                           f"ON CONFLICT DO UPDATE SET business_connection_id = excluded.business_connection_id, "
+                           f"message_thread_id = excluded.message_thread_id, state = excluded.state")
+
+        self.__lock = threading.Lock()
+        created = not os.path.exists(self.database)
+        self.__conn = connect(self.database, check_same_thread=False)
+        self.__conn.execute(q)
+        self.__conn.commit()
+        if created and self.database != DATABASE and os.path.exists(DATABASE):
+            self.__copy_states(DATABASE)
+        self.__states: dict[tuple, str] = {
+            tuple(fetch[:-1]): fetch[-1] for fetch in self.__conn.execute(self.__select_q)
+        }
+        self.__pending: dict[tuple, str | None] = {}
+
+        self.__stop = threading.Event()
+        if flush_interval:
+            threading.Thread(target=self.__flush_loop, name="StateDBStorage-flush", daemon=True).start()
+        atexit.register(self.close)
+
+
+    def __copy_states(self, database_path: str):
+        """
+        Перенести состояния из таблицы с тем же именем в другой базе, если она там есть.
+        Нужно при первом запуске с отдельной базой `CHURN_DATABASE`, чтобы не потерять состояния из основной
+        """
+        self.__conn.execute("ATTACH DATABASE ? AS source", (database_path,))
+        try:
+            exists = self.__conn.execute(
+                "SELECT 1 FROM source.sqlite_master WHERE type = 'table' AND name = ?", (self.table_name,)
+            ).fetchone()
+            if exists:
+                columns = ', '.join(self.__KEY_COLUMNS)
+                self.__conn.execute(
+                    f"INSERT OR IGNORE INTO main.{self.table_name} ({columns}, state) "
+                    f"SELECT {columns}, state FROM source.{self.table_name}"
+                )
+                self.__conn.commit()
+        finally:
+            self.__conn.execute("DETACH DATABASE source")
 
 
     @staticmethod
-    def __param_columns(param_values: None | list = None):
-        param_names = ['chat_id', 'user_id', 'business_connection_id', 'message_thread_id', 'bot_id']
-        if param_values:
-            param_names = [name + (' = ?' if value else ' IS NULL') for name, value in zip(param_names, param_values)]
-            return ' AND '.join(param_names)
-        return ', '.join(param_names)
+    def __key(
+        chat_id: int,
+        user_id: int,
+        business_connection_id: str | None,
+        message_thread_id: int | None,
+        bot_id: int | None,
+    ) -> tuple:
+        return (chat_id, user_id, business_connection_id or None, message_thread_id or None, bot_id or None)
+
+
+    def __flush_loop(self):
+        while not self.__stop.wait(self.flush_interval):
+            self.__try_flush()
+
+
+    def __try_flush(self):
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            print(f"! Ошибка при сохранении состояний: {e}")
+
+
+    def flush(self):
+        """
+        Записать накопившиеся изменения состояний в базу данных одной транзакцией.
+        Если запись не удалась, изменения остаются в очереди до следующей попытки
+        """
+        with self.__lock:
+            if not self.__pending or self.__conn is None:
+                return
+            pending, self.__pending = self.__pending, {}
+            try:
+                self.__conn.executemany(
+                    self.__delete_q, [key for key, state in pending.items() if state is None]
+                )
+                self.__conn.executemany(
+                    self.__upsert_q, [key + (state,) for key, state in pending.items() if state is not None]
+                )
+                self.__conn.commit()
+            except sqlite3.Error:
+                self.__conn.rollback()
+                pending.update(self.__pending) # Более новые изменения важнее
+                self.__pending = pending
+                raise
+
+
+    def close(self):
+        self.__stop.set()
+        self.flush()
+        with self.__lock:
+            if self.__conn is not None:
+                self.__conn.close()
+                self.__conn = None
+
+
+    def __write(self, key: tuple, state: str | None):
+        with self.__lock:
+            if state is None:
+                self.__states.pop(key, None)
+            else:
+                self.__states[key] = state
+            self.__pending.pop(key, None) # Порядок в очереди — порядок последних изменений
+            self.__pending[key] = state
+            flush_now = len(self.__pending) >= self.batch_size
+        if flush_now:
+            self.__try_flush()
 
 
     def set_state(
@@ -100,19 +312,7 @@ class StateDBStorage(StateStorageBase):
     ) -> bool:
         if hasattr(state, "name"):
             state = state.name
-        params = [chat_id, user_id, business_connection_id, message_thread_id, bot_id]
-        param_columns = self.__param_columns()
-
-        with sqlite3.connect(self.database) as conn:
-            cur = conn.cursor()
-            q = (f"INSERT INTO {self.table_name} ({param_columns}, state) "
-                 f"VALUES ({', '.join('?'*(len(params)+1))}) "
-                 f"ON CONFLICT DO UPDATE SET state = excluded.state")
-            cur.execute(
-                q,
-                tuple(params + [state])
-            )
-            conn.commit()
+        self.__write(self.__key(chat_id, user_id, business_connection_id, message_thread_id, bot_id), state)
         return True
     
 
@@ -124,19 +324,7 @@ class StateDBStorage(StateStorageBase):
         message_thread_id: int | None = None,
         bot_id: int | None = None,
     ) -> str | None:
-        params = [chat_id, user_id, business_connection_id, message_thread_id, bot_id]
-        param_columns = self.__param_columns(params)
-        while None in params:
-            params.remove(None)
-
-        with sqlite3.connect(self.database) as conn:
-            cur = conn.cursor()
-            cur.execute(
-                f"SELECT state FROM {self.table_name} WHERE {param_columns}",
-                tuple(params)
-            )
-            fetch = cur.fetchone()
-        return fetch[0] if fetch else None
+        return self.__states.get(self.__key(chat_id, user_id, business_connection_id, message_thread_id, bot_id))
 
 
     def delete_state(
@@ -147,19 +335,19 @@ class StateDBStorage(StateStorageBase):
         message_thread_id: int | None = None,
         bot_id: int | None = None,
     ) -> bool:
-        params = [chat_id, user_id, business_connection_id, message_thread_id, bot_id]
-        param_columns = self.__param_columns(params)
-        while None in params:
-            params.remove(None)
-
-        with sqlite3.connect(self.database) as conn:
-            cur = conn.cursor()
-            cur.execute(
-                f"DELETE FROM {self.table_name} WHERE {param_columns}",
-                tuple(params)
-            )
-            conn.commit()
+        self.__write(self.__key(chat_id, user_id, business_connection_id, message_thread_id, bot_id), None)
         return True
 
 if __name__ == "__main__":
-    create_update_db()
+    import argparse
+    parser = argparse.ArgumentParser(description="Создать или обновить базу данных")
+    parser.add_argument("--on-copy", action="store_true", help="Прогнать обновления на копии базы и показать время")
+    args = parser.parse_args()
+    if args.on_copy:
+        timings = migrate_copy()
+        if not timings:
+            print(f"База данных уже в версии {DB_VERSION}")
+        for version, seconds in timings:
+            print(f"update_{version}.sql: {seconds * 1000:.1f} мс")
+    else:
+        create_update_db()
@@ -0,0 +1,82 @@
+"""
+Скачивание файлов, которые пользователи присылают боту. Все загрузки идут через общий пул соединений
+(`requests.Session`), файл читается по частям и сразу записывается в хранилище `file_store`
+или во временный файл, а размер проверяется и до начала, и во время скачивания.
+
+Адрес файлов берётся из `telebot.apihelper.FILE_URL`, если он задан (свой Bot API сервер
+или локальная замена для тестов), иначе используется api.telegram.org
+"""
+import tempfile
+import requests
+from typing import BinaryIO, Iterator
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+from data import TOKEN
+import file_store
+
+# Bot API в облаке отдаёт ботам файлы не больше 20 МБ
+MAX_FILE_SIZE = 20 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Файлы меньше этого размера временно хранятся в памяти, а не на диске
+SPOOL_SIZE = 1024 * 1024
+TIMEOUT = (10, 60)
+
+__session = requests.Session()
+__session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=8))
+__session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=8))
+
+
+class FileTooLargeError(Exception):
+    def __init__(self, max_size: int):
+        super().__init__(f"Файл больше {max_size} байт")
+        self.max_size = max_size
+
+
+def file_url(file_path: str) -> str:
+    if apihelper.FILE_URL:
+        return apihelper.FILE_URL.format(TOKEN, file_path)
+    return f"https://api.telegram.org/file/bot{TOKEN}/{file_path}"
+
+
+def stream(file_path: str, max_size: int | None = None) -> Iterator[bytes]:
+    """
+    Части файла по мере скачивания.
+    Выбрасывает `FileTooLargeError`, как только становится понятно, что файл больше `max_size`
+    (по умолчанию `MAX_FILE_SIZE`)
+    """
+    max_size = max_size or MAX_FILE_SIZE
+    with __session.get(file_url(file_path), stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        content_length = response.headers.get("Content-Length")
+        if content_length and int(content_length) > max_size:
+            raise FileTooLargeError(max_size)
+        size = 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_size:
+                raise FileTooLargeError(max_size)
+            yield chunk
+
+
+def to_store(file_path: str, extension: str, max_size: int | None = None) -> str:
+    """
+    Скачать файл в хранилище `file_store`.
+    :return: путь к файлу в хранилище
+    """
+    return file_store.save_stream(stream(file_path, max_size), extension)
+
+
+def to_temporary_file(file_path: str, max_size: int | None = None) -> BinaryIO:
+    """
+    Скачать файл во временный файл (небольшие остаются в памяти).
+    :return: временный файл, открытый на чтение с начала
+    """
+    file = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    try:
+        for chunk in stream(file_path, max_size):
+            file.write(chunk)
+    except BaseException:
+        file.close()
+        raise
+    file.seek(0)
+    return file
@@ -0,0 +1,77 @@
+"""
+Кэш в памяти для файлов, которые бот отправляет многим пользователям подряд: файлы блоков задач,
+`ProblemBlock.DEFAULT_PATH`, `BUTTONS_IMG`. Файл читается с диска один раз, пока не изменится
+(ключ — путь и время изменения). Если кэш занимает больше `FILE_CACHE_MB` мегабайт,
+вытесняются давно не отправлявшиеся файлы.
+
+Отправляемый объект — `BytesIO` поверх закэшированных байтов: пока его не меняют, он не копирует данные,
+а `read()` целиком возвращает тот же объект `bytes`
+"""
+import os
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from telebot.types import InputFile
+from data import FILE_CACHE_MB
+
+__lock = threading.Lock()
+# Путь -> (время изменения, содержимое), от давно использованных к недавно использованным
+__files: OrderedDict[str, tuple[int, bytes]] = OrderedDict()
+__size = 0
+__hits = 0
+__misses = 0
+
+
+def max_size() -> int:
+    return FILE_CACHE_MB * 1024 * 1024
+
+
+def read(path: str) -> bytes:
+    """
+    Содержимое файла из кэша или, если его там нет или файл изменился, с диска
+    """
+    global __size, __hits, __misses
+    mtime = os.stat(path).st_mtime_ns
+    with __lock:
+        cached = __files.get(path)
+        if cached and cached[0] == mtime:
+            __files.move_to_end(path)
+            __hits += 1
+            return cached[1]
+        __misses += 1
+    with open(path, "rb") as f:
+        content = f.read()
+    if len(content) > max_size():
+        return content
+    with __lock:
+        old = __files.pop(path, None)
+        if old:
+            __size -= len(old[1])
+        __files[path] = (mtime, content)
+        __size += len(content)
+        while __size > max_size():
+            _, (_, evicted) = __files.popitem(last=False)
+            __size -= len(evicted)
+    return content
+
+
+def input_file(path: str, file_name: str | None = None) -> InputFile:
+    """
+    Замена `InputFile(path, file_name)`, которая берёт содержимое из кэша
+    """
+    return InputFile(BytesIO(read(path)), file_name or os.path.basename(path))
+
+
+def stats() -> dict:
+    """
+    :return: {"hits", "misses", "files", "bytes", "max_bytes"}
+    """
+    with __lock:
+        return {"hits": __hits, "misses": __misses, "files": len(__files), "bytes": __size, "max_bytes": max_size()}
+
+
+def clear():
+    global __size
+    with __lock:
+        __files.clear()
+        __size = 0
@@ -0,0 +1,136 @@
+"""
+Хранилище скачанных файлов (условий задач), адресуемое содержимым.
+
+Файл лежит в `downloaded_files/<первые два символа хэша>/<SHA-256 содержимого><расширение>`,
+так что одинаковые файлы хранятся один раз, а имя не нужно подбирать по содержимому папки.
+Ссылки на файлы — это `problem_blocks.path`: файл нужен, пока на него ссылается хотя бы один блок задач.
+Ненужные файлы удаляются в фоновом потоке (см. `release` и `collect_garbage`)
+"""
+import os
+import time
+import queue
+import hashlib
+import threading
+from typing import Iterable
+from db import connect
+
+STORE_PATH = "downloaded_files"
+# Файлы, сохранённые недавно, не удаляются: ссылку на них ещё могут не успеть записать в базу
+GC_GRACE_PERIOD = 10 * 60
+
+__gc_queue: queue.Queue[str | None] = queue.Queue()
+__gc_thread: threading.Thread | None = None
+__gc_lock = threading.Lock()
+
+
+def path_for(digest: str, extension: str = ".pdf") -> str:
+    return os.path.join(STORE_PATH, digest[:2], digest + extension)
+
+
+def save(content: bytes, extension: str = ".pdf") -> str:
+    """
+    Сохранить файл, если такого ещё нет.
+    :return: путь к файлу для `problem_blocks.path`
+    """
+    return save_stream([content], extension)
+
+
+def save_stream(chunks: Iterable[bytes], extension: str = ".pdf") -> str:
+    """
+    Как `save`, но файл записывается по частям по мере их получения, а хэш считается на ходу.
+    Если `chunks` выбросит исключение, ничего не сохраняется
+    """
+    os.makedirs(STORE_PATH, exist_ok=True)
+    temp_path = os.path.join(STORE_PATH, f"{threading.get_ident()}_{time.monotonic_ns()}.tmp")
+    sha256 = hashlib.sha256()
+    try:
+        with open(temp_path, "wb") as f:
+            for chunk in chunks:
+                sha256.update(chunk)
+                f.write(chunk)
+        path = path_for(sha256.hexdigest(), extension)
+        if os.path.exists(path):
+            os.utime(path) # Продлевает защиту от сборки мусора, пока ссылка на файл не записана
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        return path
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def references(path: str) -> int:
+    """
+    Сколько блоков задач ссылается на файл
+    """
+    with connect() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM problem_blocks WHERE path = ?", (path,))
+        return cur.fetchone()[0]
+
+
+def release(path: str):
+    """
+    Ссылка на файл убрана из базы: удалить его в фоне, если других ссылок нет
+    """
+    __start()
+    __gc_queue.put(path)
+
+
+def collect_garbage():
+    """
+    Удалить в фоне все файлы хранилища, на которые не ссылается ни один блок задач
+    """
+    __start()
+    __gc_queue.put(None)
+
+
+def __start():
+    global __gc_thread
+    with __gc_lock:
+        if __gc_thread is None or not __gc_thread.is_alive():
+            __gc_thread = threading.Thread(target=__gc_worker, name="file_store_gc", daemon=True)
+            __gc_thread.start()
+
+
+def __gc_worker():
+    while True:
+        path = __gc_queue.get()
+        try:
+            if path is None:
+                __sweep()
+            elif references(path) == 0:
+                __remove_unused(path)
+        except Exception as e:
+            print(f"! Ошибка при удалении ненужных файлов: {e}")
+        finally:
+            __gc_queue.task_done()
+
+
+def __remove_unused(path: str):
+    try:
+        if time.time() - os.path.getmtime(path) < GC_GRACE_PERIOD:
+            return
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def __sweep():
+    with connect() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT DISTINCT path FROM problem_blocks WHERE path IS NOT NULL")
+        referenced = {os.path.normpath(path) for path, in cur.fetchall()}
+    for dir, _, filenames in os.walk(STORE_PATH):
+        for filename in filenames:
+            path = os.path.join(dir, filename)
+            if os.path.normpath(path) not in referenced:
+                __remove_unused(path)
+
+
+def wait_for_gc():
+    """
+    Дождаться, пока фоновый поток обработает все запросы на удаление
+    """
+    __gc_queue.join()
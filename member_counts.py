@@ -0,0 +1,48 @@
+"""
+Кэш количества участников и принимающих в олимпиадах.
+Количество считается запросом при первом обращении и сбрасывается моделями,
+когда в олимпиаде появляются или пропадают участники и принимающие
+"""
+import threading
+from typing import Callable
+
+__lock = threading.Lock()
+# (ID олимпиады, таблица) -> количество
+__counts: dict[tuple[int, str], int] = {}
+# Увеличивается при каждом сбросе: по нему кэши, зависящие от состава олимпиад, понимают, что устарели
+__generation = 0
+
+
+def get(olymp_id: int, table: str, count: Callable[[], int]) -> int:
+    """
+    Количество записей олимпиады `olymp_id` в таблице `table` (participants или examiners).
+    Если его нет в кэше, оно считается функцией `count`
+    """
+    key = (olymp_id, table)
+    with __lock:
+        if key in __counts:
+            return __counts[key]
+        generation = __generation
+    value = count()
+    with __lock:
+        if generation == __generation:
+            __counts[key] = value
+    return value
+
+
+def generation() -> int:
+    return __generation
+
+
+def invalidate(olymp_id: int | None = None):
+    """
+    Сбросить количества олимпиады `olymp_id` или, если она не указана, всех олимпиад
+    """
+    global __generation
+    with __lock:
+        if olymp_id is None:
+            __counts.clear()
+        else:
+            for key in [key for key in __counts if key[0] == olymp_id]:
+                del __counts[key]
+        __generation += 1
@@ -0,0 +1,179 @@
+"""
+Метрики бота в текстовом формате Prometheus на локальном HTTP-порту.
+Все значения берутся из счётчиков в памяти процесса: при запросе метрик база данных не читается
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import telebot
+from enums import QueueStatus
+from db import connect
+import perf
+import file_cache
+
+__lock = threading.Lock()
+__loaded = False
+# (olymp_id, status, problem_id) -> количество записей в очереди
+__queue: dict[tuple[int, QueueStatus, int], int] = {}
+# (olymp_id, is_busy) -> количество принимающих
+__examiners: dict[tuple[int, bool], int] = {}
+__bot: telebot.TeleBot | None = None
+
+
+def load():
+    """
+    Один раз посчитать записи в очереди и принимающих по базе данных.
+    Дальше счётчики обновляются моделями при каждом изменении
+    """
+    global __loaded
+    with connect() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT olymp_id, status, problem_id, COUNT(*) FROM queue GROUP BY olymp_id, status, problem_id")
+        queue = {(olymp_id, QueueStatus(status), problem_id): count for olymp_id, status, problem_id, count in cur.fetchall()}
+        cur.execute("SELECT olymp_id, is_busy, COUNT(*) FROM examiners GROUP BY olymp_id, is_busy")
+        examiners = {(olymp_id, bool(is_busy)): count for olymp_id, is_busy, count in cur.fetchall()}
+    with __lock:
+        __queue.clear()
+        __queue.update(queue)
+        __examiners.clear()
+        __examiners.update(examiners)
+        __loaded = True
+
+
+def __add(counter: dict, key: tuple, delta: int):
+    if not __loaded:
+        return
+    with __lock:
+        counter[key] = counter.get(key, 0) + delta
+
+
+def queue_entry_added(olymp_id: int, problem_id: int, status: QueueStatus = QueueStatus.WAITING):
+    __add(__queue, (olymp_id, status, problem_id), 1)
+
+
+def queue_entry_changed(olymp_id: int, old: tuple[QueueStatus, int], new: tuple[QueueStatus, int]):
+    """
+    :param old: (`статус`, `ID задачи`) до изменения
+    :param new: (`статус`, `ID задачи`) после изменения
+    """
+    if old == new:
+        return
+    __add(__queue, (olymp_id, *old), -1)
+    __add(__queue, (olymp_id, *new), 1)
+
+
+def examiner_added(olymp_id: int, is_busy: bool):
+    __add(__examiners, (olymp_id, bool(is_busy)), 1)
+
+
+def examiner_busy_changed(olymp_id: int, old: bool, new: bool):
+    if bool(old) == bool(new):
+        return
+    __add(__examiners, (olymp_id, bool(old)), -1)
+    __add(__examiners, (olymp_id, bool(new)), 1)
+
+
+def __escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def __labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{__escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def __histogram(lines: list[str], name: str, histogram: tuple[list[tuple[float, int]], int, float], **labels):
+    buckets, count, total = histogram
+    for bound, bucket_count in buckets:
+        le = "+Inf" if bound == float("inf") else repr(bound)
+        lines.append(f"{name}_bucket{__labels(**labels, le=le)} {bucket_count}")
+    lines.append(f"{name}_count{__labels(**labels)} {count}")
+    lines.append(f"{name}_sum{__labels(**labels)} {total}")
+
+
+def render() -> str:
+    exported = perf.export()
+    with __lock:
+        queue = dict(__queue)
+        examiners = dict(__examiners)
+    lines = []
+
+    lines.append("# HELP bot_updates_total Обновления, полученные от Telegram")
+    lines.append("# TYPE bot_updates_total counter")
+    for update_type, count in sorted(exported["updates"].items()):
+        lines.append(f"bot_updates_total{__labels(type=update_type)} {count}")
+
+    lines.append("# HELP bot_handler_seconds Время работы обработчиков")
+    lines.append("# TYPE bot_handler_seconds histogram")
+    for handler, histogram in sorted(exported["handlers"].items()):
+        __histogram(lines, "bot_handler_seconds", histogram, handler=handler)
+
+    lines.append("# HELP bot_queue_entries Записи в очереди по статусам и задачам")
+    lines.append("# TYPE bot_queue_entries gauge")
+    for (olymp_id, status, problem_id), count in sorted(queue.items(), key=lambda item: (item[0][0], item[0][1].value, item[0][2])):
+        lines.append(f"bot_queue_entries{__labels(olymp=olymp_id, status=status.name, problem=problem_id)} {count}")
+
+    lines.append("# HELP bot_examiners Принимающие: свободные и занятые")
+    lines.append("# TYPE bot_examiners gauge")
+    for (olymp_id, is_busy), count in sorted(examiners.items()):
+        lines.append(f"bot_examiners{__labels(olymp=olymp_id, state='busy' if is_busy else 'free')} {count}")
+
+    lines.append("# HELP bot_telegram_requests_in_flight Запросы к Telegram API, которые ещё не завершились")
+    lines.append("# TYPE bot_telegram_requests_in_flight gauge")
+    lines.append(f"bot_telegram_requests_in_flight {exported['api_in_flight']}")
+    lines.append("# HELP bot_telegram_requests_total Запросы к Telegram API")
+    lines.append("# TYPE bot_telegram_requests_total counter")
+    for method, count in sorted(exported["api_calls"].items()):
+        lines.append(f"bot_telegram_requests_total{__labels(method=method)} {count}")
+    if __bot is not None and __bot.threaded and __bot.worker_pool:
+        lines.append("# HELP bot_pending_tasks Обновления, которые ждут свободного потока обработки")
+        lines.append("# TYPE bot_pending_tasks gauge")
+        lines.append(f"bot_pending_tasks {__bot.worker_pool.tasks.qsize()}")
+
+    files = file_cache.stats()
+    lines.append("# HELP bot_file_cache_requests_total Обращения к кэшу отправляемых файлов")
+    lines.append("# TYPE bot_file_cache_requests_total counter")
+    lines.append(f"bot_file_cache_requests_total{__labels(result='hit')} {files['hits']}")
+    lines.append(f"bot_file_cache_requests_total{__labels(result='miss')} {files['misses']}")
+    lines.append("# HELP bot_file_cache_bytes Память, занятая кэшем отправляемых файлов")
+    lines.append("# TYPE bot_file_cache_bytes gauge")
+    lines.append(f"bot_file_cache_bytes {files['bytes']}")
+    lines.append("# HELP bot_file_cache_max_bytes Ограничение памяти для кэша отправляемых файлов")
+    lines.append("# TYPE bot_file_cache_max_bytes gauge")
+    lines.append(f"bot_file_cache_max_bytes {files['max_bytes']}")
+    lines.append("# HELP bot_file_cache_files Файлы в кэше отправляемых файлов")
+    lines.append("# TYPE bot_file_cache_files gauge")
+    lines.append(f"bot_file_cache_files {files['files']}")
+
+    lines.append("# HELP bot_sqlite_write_seconds Время записи в базу данных, включая ожидание блокировки")
+    lines.append("# TYPE bot_sqlite_write_seconds histogram")
+    __histogram(lines, "bot_sqlite_write_seconds", exported["sql_write"])
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int, bot: telebot.TeleBot | None = None) -> ThreadingHTTPServer:
+    """
+    Запустить сервер метрик на `127.0.0.1:port` в фоновом потоке
+    """
+    global __bot
+    __bot = bot
+    load()
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -1,14 +1,26 @@
 from enums import OlympStatus, QueueStatus
 import sqlite3
-from db import DATABASE
+from typing import Iterator
+from db import connect
 from tag import Tag
-from users import Participant, Examiner
+import tag_index
+import member_counts
+from users import User, Participant, Examiner
 from problem import Problem, ProblemBlock
 from queue_entry import QueueEntry
-from utils import UserError, value_exists, provide_cursor, update_in_table
+from queue_history import QueueHistoryEntry
+from utils import UserError, provide_cursor, update_in_table, factory_cursor
 
 
 class Olymp:
+    __slots__ = ("__id", "__name", "__status")
+    # Сколько участников или принимающих загружается за раз в `iter_participants` и `iter_examiners`
+    MEMBERS_CHUNK_SIZE = 500
+    # Столбцы olymp_counters в порядке `counters`
+    COUNTERS = (
+        "unfinished_participants", "active_queue_unfinished", "active_queue_finished", "free_examiners", "busy_examiners"
+    )
+
     def __init__(
         self,
         id: int,
@@ -20,15 +32,21 @@ class Olymp:
         self.__status = OlympStatus(status) if isinstance(status, int) else status
 
 
+    @classmethod
+    def from_row(cls, cursor: sqlite3.Cursor, row: tuple):
+        """Фабрика строк (`cursor.row_factory`) для `SELECT * FROM olymps`"""
+        return cls(*row)
+
     @classmethod
     def from_name(cls, name: str):
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
+            cur.row_factory = cls.from_row
             cur.execute("SELECT * FROM olymps WHERE name = ?", (name,))
-            fetch = cur.fetchone()
-        if not fetch:
+            olymp = cur.fetchone()
+        if not olymp:
             raise UserError(f"Олимпиады <em>{name}</em> не найдено")
-        return cls(*fetch)
+        return olymp
     
     
     @classmethod
@@ -43,51 +61,83 @@ class Olymp:
         """
         Добавить год в таблицу olymps
         """
-        exists = value_exists("olymps", {"name": name})
-        if exists:
-            raise UserError(f"Олимпиада <em>{name}</em> уже есть в базе")
         values = (name, status)
-        cursor.execute("INSERT INTO olymps(name, status) VALUES (?, ?)", values)
+        cursor.execute("INSERT INTO olymps(name, status) VALUES (?, ?) ON CONFLICT (name) DO NOTHING RETURNING id", values)
+        fetch = cursor.fetchone()
+        if fetch is None:
+            raise UserError(f"Олимпиада <em>{name}</em> уже есть в базе")
         cursor.connection.commit()
-        created_id = cursor.lastrowid
-        return cls(created_id, *values)
+        return cls(fetch[0], *values)
 
 
     @classmethod
     @provide_cursor
     def current(cls, *, cursor: sqlite3.Cursor | None = None):
-        cursor.execute("SELECT * FROM olymps WHERE status != ?", (OlympStatus.RESULTS,))
-        fetch = cursor.fetchall()
+        fetch = factory_cursor(cursor, cls.from_row).execute(
+            "SELECT * FROM olymps WHERE status != ?", (OlympStatus.RESULTS,)).fetchall()
         if len(fetch) > 1:
             raise ValueError("Найдено более одной текущей олимпиады")
         if len(fetch) == 0:
             return None
-        return Olymp(*fetch[0])
+        return fetch[0]
     
 
     def unhandled_queue_left(self, finished: bool | None = None) -> bool:
-        with sqlite3.connect(DATABASE) as conn:
-            cur = conn.cursor()
-            status_list = ','.join(map(str, QueueStatus.active(as_numbers=True)))
-            if finished is None:
-                q = (f"SELECT EXISTS(SELECT 1 FROM queue WHERE olymp_id = ?"
-                    f"AND status IN ({status_list}))")
-                params = (self.id,)
-            else:
-                q = f"""
-                SELECT EXISTS(
-                    SELECT 1 
-                    FROM queue
-                        LEFT JOIN participants ON (queue.participant_id = participants.id)
-                        LEFT JOIN users USING (user_id)
-                    WHERE queue.olymp_id = ? AND finished = ?
-                        AND status IN ({status_list})
-                )
-                """
-                params = (self.id, finished)
-            cur.execute(q, params)
-            result = cur.fetchone()
-            return bool(result[0])
+        """
+        Есть ли в очереди активные записи (участников, которые завершили или не завершили участие).
+        Берётся из счётчиков олимпиады, без обхода очереди
+        """
+        _, unfinished_queue, finished_queue, _, _ = self.counters()
+        if finished is None:
+            return unfinished_queue + finished_queue > 0
+        return (finished_queue if finished else unfinished_queue) > 0
+
+    @provide_cursor
+    def counters(self, *, cursor: sqlite3.Cursor | None = None) -> tuple[int, int, int, int, int]:
+        """
+        Счётчики олимпиады, которые поддерживаются триггерами базы при каждом изменении
+        участников, принимающих и очереди (таблица olymp_counters)
+        :return: `незавершивших участников`, `активных записей незавершивших участников`,
+        `активных записей завершивших участников`, `свободных принимающих`, `занятых принимающих`
+        """
+        cursor.execute(
+            f"SELECT {', '.join(self.COUNTERS)} FROM olymp_counters WHERE olymp_id = ?", (self.id,)
+        )
+        return cursor.fetchone() or (0, 0, 0, 0, 0)
+
+    @provide_cursor
+    def recount_counters(self, *, cursor: sqlite3.Cursor | None = None) -> tuple[int, int, int, int, int]:
+        """
+        Те же счётчики, что в `counters`, но посчитанные заново по таблицам
+        """
+        status_list = ', '.join(map(str, QueueStatus.active(as_numbers=True)))
+        cursor.execute(
+            f"""
+            SELECT
+                (SELECT COUNT(*) FROM participants WHERE olymp_id = :id AND finished = 0),
+                (SELECT COUNT(*) FROM queue JOIN participants ON participants.id = queue.participant_id
+                 WHERE queue.olymp_id = :id AND participants.finished = 0 AND queue.status IN ({status_list})),
+                (SELECT COUNT(*) FROM queue JOIN participants ON participants.id = queue.participant_id
+                 WHERE queue.olymp_id = :id AND participants.finished = 1 AND queue.status IN ({status_list})),
+                (SELECT COUNT(*) FROM examiners WHERE olymp_id = :id AND is_busy = 0),
+                (SELECT COUNT(*) FROM examiners WHERE olymp_id = :id AND is_busy = 1)
+            """,
+            {"id": self.id}
+        )
+        return cursor.fetchone()
+
+    @provide_cursor
+    def reset_counters(self, *, cursor: sqlite3.Cursor | None = None) -> tuple[int, int, int, int, int]:
+        """
+        Записать в olymp_counters счётчики, посчитанные заново (`recount_counters`)
+        """
+        values = self.recount_counters(cursor=cursor)
+        cursor.execute(
+            f"INSERT OR REPLACE INTO olymp_counters(olymp_id, {', '.join(self.COUNTERS)}) VALUES (?, ?, ?, ?, ?, ?)",
+            (self.id, *values)
+        )
+        cursor.connection.commit()
+        return values
     
     def last_queue_entries(
         self, limit: int = 10, *, 
@@ -98,8 +148,9 @@ class Olymp:
         if isinstance(participant, Participant): participant = participant.id
         if isinstance(examiner, Examiner): examiner = examiner.id
         if isinstance(problem, Problem): problem = problem.id
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
+            cur.row_factory = QueueEntry.from_row
             q = "SELECT * FROM queue WHERE olymp_id = ?"
             params = [self.id]
             if participant:
@@ -114,77 +165,192 @@ class Olymp:
             q += f" ORDER BY id DESC LIMIT ?"
             params.append(limit)
             cur.execute(q, tuple(params))
-            results = cur.fetchall()
-            queue_entries = [QueueEntry(*fetch) for fetch in results]
+            queue_entries = cur.fetchall()
             return queue_entries[::-1]
 
+    def queue_history(
+        self, limit: int = 10, *,
+        before_id: int | None = None,
+        participant: Participant | int | str | None = None,
+        examiner: Examiner | int | str | None = None,
+        problem: Problem | int | None = None
+    ) -> list[QueueHistoryEntry]:
+        """
+        Последние записи в очереди (раньше записи `before_id`, если она указана) вместе с данными
+        участников, принимающих и задач, одним запросом. Участника и принимающего можно указать
+        объектом, ID или tg-хэндлом — хэндл сравнивается в том же запросе.
+        Записи упорядочены от старых к новым
+        """
+        if isinstance(participant, Participant): participant = participant.id
+        if isinstance(examiner, Examiner): examiner = examiner.id
+        if isinstance(problem, Problem): problem = problem.id
+        q = QueueHistoryEntry._SELECT
+        params = [self.id]
+        if before_id:
+            q += " AND queue.id < ?"
+            params.append(before_id)
+        for member, id_column, handle_column in [
+            (participant, "queue.participant_id", "pu.tg_handle"),
+            (examiner, "queue.examiner_id", "eu.tg_handle")
+        ]:
+            if isinstance(member, str):
+                q += f" AND {handle_column} = ?"
+                params.append(User.conform_tg_handle(member))
+            elif member:
+                q += f" AND {id_column} = ?"
+                params.append(member)
+        if problem:
+            q += " AND queue.problem_id = ?"
+            params.append(problem)
+        q += " ORDER BY queue.id DESC LIMIT ?"
+        params.append(limit)
+        with connect() as conn:
+            cur = conn.cursor()
+            cur.row_factory = QueueHistoryEntry.from_row
+            cur.execute(q, tuple(params))
+            return cur.fetchall()[::-1]
+
 
     @staticmethod
     @provide_cursor
     def list_all(*, cursor: sqlite3.Cursor | None = None):
-        cursor.execute("SELECT * FROM olymps")
-        results = cursor.fetchall()
-        return [Olymp(*fetch) for fetch in results]
+        return factory_cursor(cursor, Olymp.from_row).execute("SELECT * FROM olymps").fetchall()
 
 
     @provide_cursor
     def __amount(self, table: str, conditions: list[str] = [], params: list = [], *, cursor: sqlite3.Cursor | None = None) -> int:
-        cursor.execute(f"SELECT 1 FROM {table} WHERE " + " AND ".join(["olymp_id = ?"] + conditions), tuple([self.id] + params))
-        return len(cursor.fetchall())
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE " + " AND ".join(["olymp_id = ?"] + conditions), tuple([self.id] + params))
+        return cursor.fetchone()[0]
 
-    def __tag_condition(
-        self, table: str,
+    @staticmethod
+    def __tag_masks(
         include_tags: list[Tag] | list[int] | list[str] | None = None,
         exclude_tags: list[Tag] | list[int] | list[str] | None = None
+    ) -> tuple[int, int]:
+        """
+        :return: `include_mask`, `exclude_mask` для `tag_index.matches`
+        """
+        masks = []
+        for tags in (include_tags or [], exclude_tags or []):
+            if tags and isinstance(tags[0], str):
+                tags = [tag_index.tag_id(name) for name in tags]
+            if tags and isinstance(tags[0], Tag):
+                tags = [tag.id for tag in tags]
+            masks.append(tag_index.mask(tags))
+        return masks[0], masks[1]
+
+    def __members_query(
+        self, member_class: type[Participant] | type[Examiner], columns: str, conditions: str, params: list,
+        include_tags: list[Tag] | list[int] | list[str] | None,
+        exclude_tags: list[Tag] | list[int] | list[str] | None,
+        cursor: sqlite3.Cursor
     ) -> tuple[str, list]:
         """
+        Запрос `columns` по участникам или принимающим олимпиады, подходящим под условия на столбцы
+        (`conditions` — продолжение WHERE) и фильтры по тэгам. Тэги проверяются функцией `tags_match`
+        по маскам из `tag_index`, без обращения к user_tags
         :return: `query`, `params`
         """
-        with_clauses = []
-        params = []
-        if include_tags:
-            if isinstance(include_tags[0], str):
-                include_tags = [Tag.from_name(name) for name in include_tags]
-            if isinstance(include_tags[0], Tag):
-                include_tags = [tag.id for tag in include_tags]
-            with_clauses.append(
-                """
-                user_lacking_required_tags AS (
-                    SELECT user_id, 
-                        ? - COUNT(*) as count
-                    FROM user_tags
-                    WHERE tag_id IN (""" + ', '.join(['?'] * len(include_tags)) + """)
-                    GROUP BY user_id
-                )
-                """
+        table = member_class._TABLE
+        q = f"SELECT {columns} FROM {table} JOIN users ON users.user_id = {table}.user_id WHERE {table}.olymp_id = ?"
+        if include_tags or exclude_tags:
+            include_mask, exclude_mask = self.__tag_masks(include_tags, exclude_tags)
+            cursor.connection.create_function(
+                "tags_match", 1, lambda user_id: tag_index.matches(user_id, include_mask, exclude_mask)
             )
-            params.extend([len(include_tags)] + include_tags)
-        if exclude_tags:
-            if isinstance(exclude_tags[0], str):
-                exclude_tags = [Tag.from_name(name) for name in exclude_tags]
-            if isinstance(exclude_tags[0], Tag):
-                exclude_tags = [tag.id for tag in exclude_tags]
-            with_clauses.append(
-                """
-                user_excluded_tags AS (
-                    SELECT user_id, COUNT(*) as count
-                    FROM user_tags
-                    WHERE tag_id IN (""" + ', '.join(['?'] * len(exclude_tags)) + """)
-                    GROUP BY user_id
-                )
-                """
-            )
-            params.extend(exclude_tags)
-        q = "WITH " + ", ".join(with_clauses) + "\n" if with_clauses else ""
-        q += f"SELECT user_id FROM {table} "
-        if include_tags: q += "LEFT JOIN user_lacking_required_tags l USING (user_id) "
-        if exclude_tags: q += "LEFT JOIN user_excluded_tags e USING (user_id) "
-        q += "WHERE olymp_id = ?"
-        if include_tags: q += " AND l.count = 0"
-        if exclude_tags: q += " AND COALESCE(e.count, 0) = 0"
-        params.append(self.id)
-        return q, params
-        
+            q += " AND tags_match(users.user_id)"
+        return q + conditions, [self.id] + params
+
+    def __get_members(
+        self, member_class: type[Participant] | type[Examiner], conditions: str, params: list, order: str,
+        start: int | None, limit: int | None,
+        include_tags: list[Tag] | list[int] | list[str] | None,
+        exclude_tags: list[Tag] | list[int] | list[str] | None,
+        cursor: sqlite3.Cursor
+    ) -> list[Participant] | list[Examiner]:
+        q, params = self.__members_query(
+            member_class, member_class._select_columns(), conditions, params, include_tags, exclude_tags, cursor
+        )
+        q += order
+        if limit:
+            q += " LIMIT ?"
+            params.append(limit)
+            if start:
+                q += " OFFSET ?"
+                params.append(start)
+        return factory_cursor(cursor, member_class.from_row).execute(q, tuple(params)).fetchall()
+
+    def __count_members(
+        self, member_class: type[Participant] | type[Examiner], conditions: str, params: list,
+        include_tags: list[Tag] | list[int] | list[str] | None,
+        exclude_tags: list[Tag] | list[int] | list[str] | None,
+        cursor: sqlite3.Cursor
+    ) -> int:
+        q, params = self.__members_query(member_class, "COUNT(*)", conditions, params, include_tags, exclude_tags, cursor)
+        cursor.execute(q, tuple(params))
+        return cursor.fetchone()[0]
+
+    def __member_contacts(
+        self, member_class: type[Participant] | type[Examiner], conditions: str, params: list,
+        include_tags: list[Tag] | list[int] | list[str] | None,
+        exclude_tags: list[Tag] | list[int] | list[str] | None,
+        cursor: sqlite3.Cursor
+    ) -> list[tuple[int, int]]:
+        table = member_class._TABLE
+        q, params = self.__members_query(
+            member_class, f"users.tg_id, {table}.id", conditions + " AND users.tg_id IS NOT NULL", params,
+            include_tags, exclude_tags, cursor
+        )
+        return cursor.execute(q + f" ORDER BY {table}.id", tuple(params)).fetchall()
+
+    def __iter_members(
+        self, member_class: type[Participant] | type[Examiner], conditions: str, params: list, chunk_size: int,
+        include_tags: list[Tag] | list[int] | list[str] | None,
+        exclude_tags: list[Tag] | list[int] | list[str] | None,
+        cursor: sqlite3.Cursor
+    ) -> Iterator[Participant] | Iterator[Examiner]:
+        """
+        Участники или принимающие по порядку ID, порциями по `chunk_size`. Каждая порция — отдельный запрос
+        после последнего полученного ID, так что между порциями база не заблокирована на чтение
+        и тело цикла может менять данные
+        """
+        table = member_class._TABLE
+        q, params = self.__members_query(
+            member_class, member_class._select_columns(), conditions + f" AND {table}.id > ?", params,
+            include_tags, exclude_tags, cursor
+        )
+        q += f" ORDER BY {table}.id LIMIT ?"
+        cursor = factory_cursor(cursor, member_class.from_row)
+        last_id = 0
+        while True:
+            chunk = cursor.execute(q, tuple(params + [last_id, chunk_size])).fetchall()
+            yield from chunk
+            if len(chunk) < chunk_size:
+                return
+            last_id = chunk[-1].id
+
+    def __members_page(
+        self, member_class: type[Participant] | type[Examiner], after_id: int | None, before_id: int | None, limit: int,
+        cursor: sqlite3.Cursor
+    ) -> list[Participant] | list[Examiner]:
+        table = member_class._TABLE
+        if before_id is not None:
+            conditions, params, order = f" AND {table}.id < ?", [before_id], f" ORDER BY {table}.id DESC"
+        else:
+            conditions, params, order = f" AND {table}.id > ?", [after_id or 0], f" ORDER BY {table}.id ASC"
+        q, params = self.__members_query(
+            member_class, member_class._select_columns(), conditions, params, None, None, cursor
+        )
+        members = factory_cursor(cursor, member_class.from_row).execute(q + order + " LIMIT ?", tuple(params + [limit])).fetchall()
+        if before_id is not None:
+            members.reverse()
+        return members
+
+    @staticmethod
+    def __participant_conditions(finished: bool | None) -> tuple[str, list]:
+        if finished is None:
+            return "", []
+        return " AND finished = ?", [finished]
 
     @provide_cursor
     def get_participants(
@@ -196,27 +362,68 @@ class Olymp:
     ) -> list[Participant]:
         if not limit and start:
             raise ValueError("Нельзя устанавливать начало списка участников, не устанавливая ограничение на количество")
-        q, params = self.__tag_condition("participants", include_tags, exclude_tags)
-        if finished is not None:
-            q += f" AND finished = ?"
-            params.append(finished)
-        if sort:
-            q += " ORDER BY id ASC"
-        if limit:
-            q += f" LIMIT ?"
-            params.append(limit)
-            if start:
-                q += f" OFFSET ?"
-                params.append(start)
-        cursor.execute(q, tuple(params))
-        results = cursor.fetchall()
-        return [Participant.from_user_id(user_id_tuple[0], self.id) for user_id_tuple in results]
-    
-    def participants_amount(self, finished: bool | None = None) -> int:
-        if finished is None:
-            return self.__amount("participants")
-        else:
-            return self.__amount("participants", ["finished = ?"], [finished])
+        q, params = self.__participant_conditions(finished)
+        return self.__get_members(
+            Participant, q, params, " ORDER BY id ASC" if sort else "", start, limit, include_tags, exclude_tags, cursor
+        )
+
+    @provide_cursor
+    def iter_participants(
+        self, *, finished: bool | None = None, chunk_size: int | None = None,
+        include_tags: list[Tag] | list[int] | list[str] | None = None,
+        exclude_tags: list[Tag] | list[int] | list[str] | None = None,
+        cursor: sqlite3.Cursor | None = None
+    ) -> Iterator[Participant]:
+        """
+        Как `get_participants(sort=True)`, но участники загружаются порциями по `chunk_size`
+        (по умолчанию `MEMBERS_CHUNK_SIZE`), а не все сразу
+        """
+        q, params = self.__participant_conditions(finished)
+        return self.__iter_members(
+            Participant, q, params, chunk_size or self.MEMBERS_CHUNK_SIZE, include_tags, exclude_tags, cursor
+        )
+
+    @provide_cursor
+    def get_participants_page(
+        self, *, after_id: int | None = None, before_id: int | None = None, limit: int,
+        cursor: sqlite3.Cursor | None = None
+    ) -> list[Participant]:
+        """
+        Не больше `limit` участников по порядку ID: сразу после участника `after_id`
+        или, если указан `before_id`, сразу перед участником `before_id`.
+        В отличие от `get_participants(start, limit)`, страница ищется по индексу, а не пропуском `start` строк
+        """
+        return self.__members_page(Participant, after_id, before_id, limit, cursor)
+
+    @provide_cursor
+    def participants_amount(
+        self, finished: bool | None = None, *,
+        include_tags: list[Tag] | list[int] | list[str] | None = None,
+        exclude_tags: list[Tag] | list[int] | list[str] | None = None,
+        cursor: sqlite3.Cursor | None = None
+    ) -> int:
+        q, params = self.__participant_conditions(finished)
+        if finished is not None and not finished and not include_tags and not exclude_tags:
+            return self.counters(cursor=cursor)[0]
+        if not q and not include_tags and not exclude_tags:
+            return member_counts.get(
+                self.id, Participant._TABLE, lambda: self.__count_members(Participant, q, params, None, None, cursor)
+            )
+        return self.__count_members(Participant, q, params, include_tags, exclude_tags, cursor)
+
+    @provide_cursor
+    def participant_contacts(
+        self, finished: bool | None = None, *,
+        include_tags: list[Tag] | list[int] | list[str] | None = None,
+        exclude_tags: list[Tag] | list[int] | list[str] | None = None,
+        cursor: sqlite3.Cursor | None = None
+    ) -> list[tuple[int, int]]:
+        """
+        (`tg_id`, `ID участника`) авторизованных участников, без загрузки самих участников.
+        Фильтры — как в `get_participants`
+        """
+        q, params = self.__participant_conditions(finished)
+        return self.__member_contacts(Participant, q, params, include_tags, exclude_tags, cursor)
     
     @provide_cursor
     def get_examiners(
@@ -228,31 +435,108 @@ class Olymp:
     ) -> list[Examiner]:
         if not limit and start:
             raise ValueError("Нельзя устанавливать начало списка принимающих, не устанавливая ограничение на количество")
-        q, params = self.__tag_condition("examiners", include_tags, exclude_tags)
-        if only_free:
-            q += " AND is_busy = 0"
+        q = " AND is_busy = 0" if only_free else ""
         if order_by_busyness:
-            q += " ORDER BY busyness_level ASC"
+            order = " ORDER BY busyness_level ASC"
         elif sort:
-            q += " ORDER BY id ASC"
-        if limit:
-            q += f" LIMIT {limit}"
-            if start:
-                q += f" OFFSET {start}"
-        cursor.execute(q, tuple(params))
-        results = cursor.fetchall()
-        return [Examiner.from_user_id(user_id_tuple[0], self.id) for user_id_tuple in results]
+            order = " ORDER BY id ASC"
+        else:
+            order = ""
+        return self.__get_members(Examiner, q, [], order, start, limit, include_tags, exclude_tags, cursor)
     
-    def examiners_amount(self) -> int:
-        return self.__amount("examiners")
+    @provide_cursor
+    def iter_examiners(
+        self, *, only_free: bool = False, chunk_size: int | None = None,
+        include_tags: list[Tag] | list[int] | list[str] | None = None,
+        exclude_tags: list[Tag] | list[int] | list[str] | None = None,
+        cursor: sqlite3.Cursor | None = None
+    ) -> Iterator[Examiner]:
+        """
+        Как `get_examiners(sort=True)`, но принимающие загружаются порциями по `chunk_size`
+        (по умолчанию `MEMBERS_CHUNK_SIZE`), а не все сразу
+        """
+        return self.__iter_members(
+            Examiner, " AND is_busy = 0" if only_free else "", [], chunk_size or self.MEMBERS_CHUNK_SIZE,
+            include_tags, exclude_tags, cursor
+        )
+
+    @provide_cursor
+    def get_examiners_page(
+        self, *, after_id: int | None = None, before_id: int | None = None, limit: int,
+        cursor: sqlite3.Cursor | None = None
+    ) -> list[Examiner]:
+        """
+        Как `get_participants_page`, но для принимающих
+        """
+        return self.__members_page(Examiner, after_id, before_id, limit, cursor)
+
+    @provide_cursor
+    def examiners_amount(
+        self, *,
+        include_tags: list[Tag] | list[int] | list[str] | None = None,
+        exclude_tags: list[Tag] | list[int] | list[str] | None = None,
+        cursor: sqlite3.Cursor | None = None
+    ) -> int:
+        if not include_tags and not exclude_tags:
+            return member_counts.get(
+                self.id, Examiner._TABLE, lambda: self.__count_members(Examiner, "", [], None, None, cursor)
+            )
+        return self.__count_members(Examiner, "", [], include_tags, exclude_tags, cursor)
+
+    @provide_cursor
+    def examiner_contacts(
+        self, *,
+        include_tags: list[Tag] | list[int] | list[str] | None = None,
+        exclude_tags: list[Tag] | list[int] | list[str] | None = None,
+        cursor: sqlite3.Cursor | None = None
+    ) -> list[tuple[int, int]]:
+        """
+        (`tg_id`, `ID принимающего`) авторизованных принимающих, без загрузки самих принимающих.
+        Фильтры — как в `get_examiners`
+        """
+        return self.__member_contacts(Examiner, "", [], include_tags, exclude_tags, cursor)
+
+    @provide_cursor
+    def member_roles(self, tg_id: int, *, cursor: sqlite3.Cursor | None = None) -> list[str]:
+        """
+        Роли пользователя в олимпиаде (`examiner`, `participant`) одним запросом, без загрузки членов олимпиады
+        """
+        cursor.execute(
+            """
+            SELECT
+                EXISTS(SELECT 1 FROM examiners JOIN users ON users.user_id = examiners.user_id
+                       WHERE examiners.olymp_id = :id AND users.tg_id = :tg_id),
+                EXISTS(SELECT 1 FROM participants JOIN users ON users.user_id = participants.user_id
+                       WHERE participants.olymp_id = :id AND users.tg_id = :tg_id)
+            """,
+            {"id": self.id, "tg_id": tg_id}
+        )
+        is_examiner, is_participant = cursor.fetchone()
+        return (["examiner"] if is_examiner else []) + (["participant"] if is_participant else [])
+
+    @provide_cursor
+    def amounts(self, *, cursor: sqlite3.Cursor | None = None) -> tuple[int, int, int, int]:
+        """
+        Все счётчики олимпиады одним запросом
+        :return: `участников`, `завершивших участников`, `принимающих`, `задач`
+        """
+        cursor.execute(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM participants WHERE olymp_id = :id),
+                (SELECT COUNT(*) FROM participants WHERE olymp_id = :id AND finished = 1),
+                (SELECT COUNT(*) FROM examiners WHERE olymp_id = :id),
+                (SELECT COUNT(*) FROM problems WHERE olymp_id = :id)
+            """,
+            {"id": self.id}
+        )
+        return cursor.fetchone()
     
     @provide_cursor
     def get_problems(self, *, sort: bool = False, cursor: sqlite3.Cursor | None = None) -> list[Problem]:
         q = "SELECT * FROM problems WHERE olymp_id = ?"
         if sort: q += " ORDER BY id"
-        cursor.execute(q, (self.id,))
-        results = cursor.fetchall()
-        return [Problem(*fetch) for fetch in results]
+        return factory_cursor(cursor, Problem.from_row).execute(q, (self.id,)).fetchall()
     
     def problems_amount(self) -> int:
         return self.__amount("problems")
@@ -261,9 +545,7 @@ class Olymp:
     def get_problem_blocks(self, *, sort: bool = False, cursor: sqlite3.Cursor | None = None) -> list[ProblemBlock]:
         q = "SELECT * FROM problem_blocks WHERE olymp_id = ?"
         if sort: q += " ORDER BY id"
-        cursor.execute(q, (self.id,))
-        results = cursor.fetchall()
-        return [ProblemBlock.from_columns(*fetch) for fetch in results]
+        return factory_cursor(cursor, ProblemBlock.from_row).execute(q, (self.id,)).fetchall()
     
     def problem_blocks_amount(self) -> int:
         return self.__amount("problem_blocks")
@@ -0,0 +1,337 @@
+"""
+Замеры производительности: время работы обработчиков, количество и время SQL-запросов
+и запросов к Telegram API. Данные хранятся в скользящих гистограммах в памяти процесса
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+import telebot
+from telebot import apihelper
+from data import SLOW_HANDLER_MS
+
+logger = logging.getLogger("perf")
+
+HISTOGRAM_WINDOW = 1000 # Сколько последних замеров хранит гистограмма
+SQL_TRACE_LIMIT = 200 # Сколько запросов одного обработчика сохраняется для лога медленных обработчиков
+HANDLER_METRICS = ("time", "sql_queries", "sql_time", "api_calls", "api_time")
+# Границы корзин (в секундах) для гистограмм, которые отдаются в формате Prometheus
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+class RollingHistogram:
+    """
+    Распределение последних `window` значений плюс общее количество и сумма за всё время.
+    Если заданы `buckets`, дополнительно считается, сколько значений попало в каждую корзину
+    """
+    def __init__(self, window: int = HISTOGRAM_WINDOW, buckets: tuple[float, ...] | None = None):
+        self.__values: deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1) if buckets else None
+
+    def add(self, value: float):
+        self.__values.append(value)
+        self.count += 1
+        self.total += value
+        if self.buckets:
+            self.bucket_counts[bisect_left(self.buckets, value)] += 1
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """
+        :return: [(`граница корзины`, `количество значений не больше неё`)], последняя граница — `inf`
+        """
+        result = []
+        count = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), self.bucket_counts):
+            count += bucket_count
+            result.append((bound, count))
+        return result
+
+    def summary(self) -> dict:
+        values = sorted(self.__values)
+        if not values:
+            return {"count": 0, "total": 0.0}
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": sum(values) / len(values),
+            "p50": values[len(values) // 2],
+            "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "max": values[-1],
+        }
+
+
+class Trace:
+    """
+    Замеры одного вызова обработчика
+    """
+    __slots__ = ("handler", "sql", "sql_queries", "sql_time", "api_calls", "api_time")
+    def __init__(self, handler: str):
+        self.handler = handler
+        self.sql: list[tuple[str, float]] = []
+        self.sql_queries = 0
+        self.sql_time = 0.0
+        self.api_calls = 0
+        self.api_time = 0.0
+
+
+__local = threading.local()
+__lock = threading.Lock()
+__handlers: dict[str, dict[str, RollingHistogram]] = {}
+__sql = RollingHistogram()
+__api: dict[str, RollingHistogram] = {}
+__sql_write = RollingHistogram(buckets=LATENCY_BUCKETS)
+__updates: dict[str, int] = {}
+__api_in_flight = 0
+__started = time.time()
+
+
+def current_trace() -> Trace | None:
+    return getattr(__local, "trace", None)
+
+
+def record_sql(statement: str, seconds: float):
+    with __lock:
+        __sql.add(seconds)
+        # Запись ждёт, пока освободится блокировка базы, поэтому её время включает ожидание
+        if statement.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+            __sql_write.add(seconds)
+    trace = current_trace()
+    if trace is None:
+        return
+    trace.sql_queries += 1
+    trace.sql_time += seconds
+    if len(trace.sql) < SQL_TRACE_LIMIT:
+        trace.sql.append((statement, seconds))
+
+
+def record_api(method: str, seconds: float):
+    with __lock:
+        if method not in __api:
+            __api[method] = RollingHistogram()
+        __api[method].add(seconds)
+    trace = current_trace()
+    if trace is not None:
+        trace.api_calls += 1
+        trace.api_time += seconds
+
+
+def record_commit(seconds: float):
+    with __lock:
+        __sql_write.add(seconds)
+
+
+def record_updates(updates: list):
+    with __lock:
+        for update in updates:
+            update_type = next((key for key, value in update.__dict__.items() if key != "update_id" and value is not None), "unknown")
+            __updates[update_type] = __updates.get(update_type, 0) + 1
+
+
+def record_handler(trace: Trace, seconds: float):
+    with __lock:
+        if trace.handler not in __handlers:
+            __handlers[trace.handler] = {metric: RollingHistogram() for metric in HANDLER_METRICS}
+            __handlers[trace.handler]["time"] = RollingHistogram(buckets=LATENCY_BUCKETS)
+        stats = __handlers[trace.handler]
+        stats["time"].add(seconds)
+        stats["sql_queries"].add(trace.sql_queries)
+        stats["sql_time"].add(trace.sql_time)
+        stats["api_calls"].add(trace.api_calls)
+        stats["api_time"].add(trace.api_time)
+    if seconds * 1000 >= SLOW_HANDLER_MS:
+        lines = [f"Медленный обработчик {trace.handler}: {seconds * 1000:.1f} мс, "
+                 f"SQL: {trace.sql_queries} ({trace.sql_time * 1000:.1f} мс), "
+                 f"Telegram API: {trace.api_calls} ({trace.api_time * 1000:.1f} мс)"]
+        lines += [f"  {sql_seconds * 1000:7.2f} мс  {' '.join(statement.split())}" for statement, sql_seconds in trace.sql]
+        if trace.sql_queries > len(trace.sql):
+            lines.append(f"  … и ещё {trace.sql_queries - len(trace.sql)}")
+        logger.warning("\n".join(lines))
+
+
+class TracedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=(), /):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_sql(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_sql(sql, time.perf_counter() - start)
+
+    def executescript(self, sql_script, /):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            record_sql(sql_script, time.perf_counter() - start)
+
+
+class TracedConnection(sqlite3.Connection):
+    """
+    Соединение, которое замеряет время выполнения запросов (без учёта выборки строк)
+    """
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script, /):
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            record_commit(time.perf_counter() - start)
+
+
+def instrument(function):
+    """
+    Обернуть обработчик: замерить время его работы и собрать запросы, сделанные во время вызова.
+    Обработчики, вызванные из другого обработчика, считаются частью внешнего
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if current_trace() is not None:
+            return function(*args, **kwargs)
+        trace = Trace(function.__name__)
+        __local.trace = trace
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            __local.trace = None
+            record_handler(trace, elapsed)
+    return wrapper
+
+
+def install(bot: telebot.TeleBot):
+    """
+    Обернуть все зарегистрированные обработчики бота и запросы к Telegram API.
+    Вызывать после регистрации обработчиков
+    """
+    handler_lists = [
+        bot.message_handlers, bot.edited_message_handlers, bot.channel_post_handlers,
+        bot.edited_channel_post_handlers, bot.callback_query_handlers, bot.inline_handlers,
+    ]
+    for handlers in handler_lists:
+        for handler in handlers:
+            if not hasattr(handler["function"], "__wrapped__"):
+                handler["function"] = instrument(handler["function"])
+    if not hasattr(bot.process_new_updates, "__wrapped__"):
+        process_new_updates = bot.process_new_updates
+        @wraps(process_new_updates)
+        def counted_updates(updates):
+            record_updates(updates)
+            return process_new_updates(updates)
+        bot.process_new_updates = counted_updates
+    make_request = apihelper._make_request
+    if hasattr(make_request, "__wrapped__"):
+        return
+    @wraps(make_request)
+    def timed_request(token, method_name, *args, **kwargs):
+        global __api_in_flight
+        with __lock:
+            __api_in_flight += 1
+        start = time.perf_counter()
+        try:
+            return make_request(token, method_name, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with __lock:
+                __api_in_flight -= 1
+            record_api(method_name, elapsed)
+    apihelper._make_request = timed_request
+
+
+def snapshot() -> dict:
+    """
+    Все собранные замеры (время в секундах)
+    """
+    with __lock:
+        return {
+            "since": __started,
+            "taken_at": time.time(),
+            "handlers": {name: {metric: h.summary() for metric, h in stats.items()} for name, stats in __handlers.items()},
+            "sql": __sql.summary(),
+            "api": {method: h.summary() for method, h in __api.items()},
+        }
+
+
+def export() -> dict:
+    """
+    Накопительные значения для экспорта метрик: поступившие обновления, гистограммы времени
+    обработчиков и записи в базу, количество запросов к Telegram API, которые ещё выполняются
+    """
+    with __lock:
+        return {
+            "updates": dict(__updates),
+            "handlers": {name: (stats["time"].cumulative(), stats["time"].count, stats["time"].total)
+                         for name, stats in __handlers.items()},
+            "sql_write": (__sql_write.cumulative(), __sql_write.count, __sql_write.total),
+            "api_in_flight": __api_in_flight,
+            "api_calls": {method: h.count for method, h in __api.items()},
+        }
+
+
+def dump(path: str) -> dict:
+    data = snapshot()
+    with open(path, "w", encoding="utf8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return data
+
+
+def reset():
+    global __sql, __sql_write, __started
+    with __lock:
+        __handlers.clear()
+        __api.clear()
+        __sql = RollingHistogram()
+        __sql_write = RollingHistogram(buckets=LATENCY_BUCKETS)
+        __started = time.time()
+
+
+def report(top: int = 10) -> str:
+    """
+    Краткая сводка для владельца: самые затратные обработчики и методы API
+    """
+    data = snapshot()
+    handlers = sorted(data["handlers"].items(), key=lambda item: -item[1]["time"]["total"])
+    lines = [f"<strong>Обработчики</strong> (за {(data['taken_at'] - data['since']) / 60:.0f} мин), мс: p50 / p95 / max, SQL, API"]
+    for name, stats in handlers[:top]:
+        t = stats["time"]
+        lines.append(f"<code>{name}</code> ×{t['count']}: {t['p50'] * 1000:.0f} / {t['p95'] * 1000:.0f} / {t['max'] * 1000:.0f}, "
+                     f"{stats['sql_queries']['mean']:.1f} запр. ({stats['sql_time']['mean'] * 1000:.1f} мс), "
+                     f"{stats['api_calls']['mean']:.1f} выз. ({stats['api_time']['mean'] * 1000:.0f} мс)")
+    if not handlers:
+        lines.append("Пока нет данных")
+    sql = data["sql"]
+    if sql["count"]:
+        lines.append(f"\n<strong>SQL:</strong> {sql['count']} запр., p50 {sql['p50'] * 1000:.2f} мс, "
+                     f"p95 {sql['p95'] * 1000:.2f} мс, max {sql['max'] * 1000:.1f} мс")
+    api = sorted(((m, s) for m, s in data["api"].items() if m != "getUpdates"), key=lambda item: -item[1]["total"])
+    if api:
+        lines.append("\n<strong>Telegram API</strong>, мс: p50 / p95 / max")
+        for method, stats in api[:top]:
+            lines.append(f"<code>{method}</code> ×{stats['count']}: "
+                         f"{stats['p50'] * 1000:.0f} / {stats['p95'] * 1000:.0f} / {stats['max'] * 1000:.0f}")
+    return "\n".join(lines)
@@ -2,11 +2,15 @@ import os
 from enums import BlockType
 import sqlite3
 from data import PREDEFINED_PATH
-from db import DATABASE
-from utils import UserError, update_in_table, provide_cursor, decline
+from db import connect
+from utils import UserError, update_in_table, provide_cursor, decline, factory_cursor, after_write
+import file_store
+import render_cache
 from telebot.formatting import escape_html
 
 class Problem:
+    __slots__ = ("__id", "__olymp_id", "__name")
+
     def __init__(
         self,
         id: int,
@@ -17,27 +21,34 @@ class Problem:
         self.__olymp_id = olymp_id
         self.__name = name
 
+    @classmethod
+    def from_row(cls, cursor: sqlite3.Cursor, row: tuple):
+        """Фабрика строк (`cursor.row_factory`) для `SELECT * FROM problems`"""
+        return cls(*row)
+
     @classmethod
     def from_id(cls, id: int):
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
+            cur.row_factory = cls.from_row
             cur.execute("SELECT * FROM problems WHERE id = ?", (id,))
-            fetch = cur.fetchone()
-        if not fetch:
+            problem = cur.fetchone()
+        if not problem:
             raise UserError("Задача не найдена")
-        return cls(*fetch)
+        return problem
     
     @classmethod
     def from_name(cls, name: str, olymp_id: int, no_error: bool = False):
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
+            cur.row_factory = cls.from_row
             cur.execute("SELECT * FROM problems WHERE name = ? AND olymp_id = ?", (name, olymp_id))
-            fetch = cur.fetchone()
-        if not fetch:
+            problem = cur.fetchone()
+        if not problem:
             if no_error:
                 return None
             raise UserError("Задача не найдена")
-        return cls(*fetch)
+        return problem
 
     @classmethod
     @provide_cursor
@@ -52,29 +63,26 @@ class Problem:
         """
         Добавить задачу в таблицу problems
         """
-        cursor.execute("SELECT * FROM problems WHERE olymp_id = ?", (olymp_id,))
-        fetch = cursor.fetchall()
-        for f in fetch:
-            pr = cls(*f)
-            if pr.name == name:
-                if no_error:
-                    return pr
-                raise UserError(f"Название <em>{escape_html(pr)}</em> уже занято задачей <code>{pr.id}</code>")
         values = (olymp_id, name)
-        cursor.execute("INSERT INTO problems(olymp_id, name) VALUES (?, ?)", values)
+        cursor.execute("INSERT INTO problems(olymp_id, name) VALUES (?, ?) "
+                       "ON CONFLICT (olymp_id, name) DO NOTHING RETURNING id", values)
+        fetch = cursor.fetchone()
+        if fetch is None:
+            pr = factory_cursor(cursor, cls.from_row).execute(
+                "SELECT * FROM problems WHERE olymp_id = ? AND name = ?", values).fetchone()
+            if no_error:
+                return pr
+            raise UserError(f"Название <em>{escape_html(pr.name)}</em> уже занято задачей <code>{pr.id}</code>")
         cursor.connection.commit()
-        created_id = cursor.lastrowid
-        return cls(created_id, *values)
+        return cls(fetch[0], *values)
 
 
     @provide_cursor
     def get_blocks(self, *, cursor: sqlite3.Cursor | None = None):
-        cursor.execute(
+        return factory_cursor(cursor, ProblemBlock.from_row).execute(
             "SELECT * FROM problem_blocks WHERE first_problem = ? OR second_problem = ? OR third_problem = ?",
             (self.id, self.id, self.id)
-        )
-        results = cursor.fetchall()
-        return [ProblemBlock.from_columns(*fetch) for fetch in results]
+        ).fetchall()
 
 
     @provide_cursor
@@ -84,6 +92,8 @@ class Problem:
             raise UserError(f"Задача {self} входит в {pb_amount} {decline(pb_amount, 'блок', ('', 'а', 'ов'))} задач. "
                             f"Чтобы удалить её, сначала удали или измени блоки задач")
         cursor.execute("DELETE FROM problems WHERE id = ?", (self.id,))
+        cursor.connection.commit()
+        render_cache.changed_all()
 
 
     def __str__(self):
@@ -106,10 +116,12 @@ class Problem:
             raise UserError(f"Название <em>{escape_html(problem.name)}</em> уже занято задачей <code>{problem.id}</code>")
         self.__set("name", value)
         self.__name = value
+        after_write(render_cache.changed_all)
 
     def __eq__(self, other): return isinstance(other, self.__class__) and self.id == other.id
 
 class ProblemBlock:
+    __slots__ = ("__id", "__olymp_id", "__problems", "__block_type", "__path")
     DEFAULT_PATH = os.path.join(PREDEFINED_PATH, "default_problem_block.pdf")
 
     def __init__(
@@ -138,15 +150,21 @@ class ProblemBlock:
         args = list(args)
         return ProblemBlock(*args[:2], *[args[4:]], *args[2:4])
 
+    @classmethod
+    def from_row(cls, cursor: sqlite3.Cursor, row: tuple):
+        """Фабрика строк (`cursor.row_factory`) для `SELECT * FROM problem_blocks`"""
+        return cls.from_columns(*row)
+
     @classmethod
     def from_id(cls, id: int):
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
+            cur.row_factory = cls.from_row
             cur.execute("SELECT * FROM problem_blocks WHERE id = ?", (id,))
-            fetch = cur.fetchone()
-        if not fetch:
+            problem_block = cur.fetchone()
+        if not problem_block:
             raise UserError("Блок задач не найден")
-        return cls.from_columns(*fetch)
+        return problem_block
     
     @classmethod
     def from_block_type(
@@ -155,15 +173,16 @@ class ProblemBlock:
         block_type: BlockType,
         no_error: bool = False,
     ):
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
+            cur.row_factory = cls.from_row
             cur.execute("SELECT * FROM problem_blocks WHERE olymp_id = ? AND block_type = ?", (olymp_id, block_type))
-            fetch = cur.fetchone()
-        if not fetch:
+            problem_block = cur.fetchone()
+        if not problem_block:
             if no_error:
                 return None
             raise UserError("Блок задач не найден")
-        return cls.from_columns(*fetch)
+        return problem_block
     
     @classmethod
     @provide_cursor
@@ -181,36 +200,41 @@ class ProblemBlock:
         """
         if len(problems) != 3:
             raise ValueError("В блоке должно быть три задачи")
-        if block_type is not None:
-            cursor.execute("SELECT id FROM problem_blocks WHERE olymp_id = ? AND block_type = ?", (olymp_id, block_type))
-            fetch = cursor.fetchone()
-            if fetch is not None:
-                block_id = fetch[0]
-                raise UserError(f"{block_type} уже есть: <code>{block_id}</code>")
         if not isinstance(problems[0], int):
             problems = [pr.id for pr in problems]
         values = [olymp_id, block_type, path] + problems
-        cursor.execute("INSERT INTO problem_blocks(olymp_id, block_type, path, first_problem, second_problem, third_problem)"
-                       "VALUES (?, ?, ?, ?, ?, ?)", tuple(values))
+        cursor.execute("INSERT INTO problem_blocks(olymp_id, block_type, path, first_problem, second_problem, third_problem) "
+                       "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (olymp_id, block_type) DO NOTHING RETURNING id", tuple(values))
+        fetch = cursor.fetchone()
+        if fetch is None: # Блоки без типа не конфликтуют: NULL в UNIQUE не совпадает с другим NULL
+            cursor.execute("SELECT id FROM problem_blocks WHERE olymp_id = ? AND block_type = ?", (olymp_id, block_type))
+            block_id = cursor.fetchone()[0]
+            raise UserError(f"{block_type} уже есть: <code>{block_id}</code>")
         cursor.connection.commit()
-        created_id = cursor.lastrowid
-        return cls(created_id, olymp_id, problems, block_type, path)
+        render_cache.changed_all()
+        return cls(fetch[0], olymp_id, problems, block_type, path)
 
 
     def delete_file(self, no_error: bool = False):
+        """
+        Убрать файл у блока. Сам файл удаляется в фоне, если на него больше не ссылаются другие блоки
+        """
         if not self.path:
             if no_error:
                 return
             raise UserError("Файла уже нет")
-        os.remove(self.path)
+        path = self.path
         self.path = None
+        file_store.release(path)
 
     def delete(self):
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
             cur.execute("DELETE FROM problem_blocks WHERE id = ?", (self.id,))
             conn.commit()
-        self.delete_file(no_error = True)
+        render_cache.changed_all()
+        if self.path:
+            file_store.release(self.path)
 
 
     def __str__(self):
@@ -234,6 +258,7 @@ class ProblemBlock:
             raise UserError(f"{value} уже есть в этой олимпиаде")
         self.__set("block_type", value)
         self.__block_type = value
+        after_write(render_cache.changed_all)
     @property
     def path(self): return self.__path
     @path.setter
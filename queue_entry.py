@@ -1,9 +1,13 @@
 import sqlite3
+from functools import partial
 from enums import QueueStatus
-from db import DATABASE
-from utils import update_in_table, UserError
+from db import connect
+from utils import update_in_table, after_write, UserError
+import metrics
 
 class QueueEntry:
+    __slots__ = ("__id", "__olymp_id", "__participant_id", "__problem_id", "__status", "__examiner_id")
+
     def __init__(
         self,
         id: int,
@@ -20,15 +24,21 @@ class QueueEntry:
         self.__status: QueueStatus = QueueStatus(status) if not isinstance(status, QueueStatus) else status
         self.__examiner_id: int | None = examiner_id
 
+    @classmethod
+    def from_row(cls, cursor: sqlite3.Cursor, row: tuple):
+        """Фабрика строк (`cursor.row_factory`) для `SELECT * FROM queue`"""
+        return cls(*row)
+
     @classmethod
     def from_id(cls, id: int):
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
+            cur.row_factory = cls.from_row
             cur.execute(f"SELECT * FROM queue WHERE id = ?", (id,))
-            fetch = cur.fetchone()
-            if fetch is None:
+            queue_entry = cur.fetchone()
+            if queue_entry is None:
                 raise UserError("Запись не найдена")
-            return cls(*fetch)
+            return queue_entry
 
     def look_for_examiner(self) -> int | None:
         """
@@ -39,7 +49,7 @@ class QueueEntry:
         """
         if self.status != QueueStatus.WAITING:
             raise ValueError("Нельзя искать принимающих для записей не в статусе ожидания")
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()            
             q = """
                 SELECT
@@ -71,12 +81,18 @@ class QueueEntry:
     @problem_id.setter
     def problem_id(self, value: int):
         self.__set("problem_id", value)
+        after_write(partial(
+            metrics.queue_entry_changed, self.__olymp_id, (self.__status, self.__problem_id), (self.__status, value)
+        ))
         self.__problem_id = value
     @property
     def status(self): return self.__status
     @status.setter
     def status(self, value: QueueStatus):
         self.__set("status", value)
+        after_write(partial(
+            metrics.queue_entry_changed, self.__olymp_id, (self.__status, self.__problem_id), (value, self.__problem_id)
+        ))
         self.__status = value
     @property
     def examiner_id(self): return self.__examiner_id
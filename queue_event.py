@@ -0,0 +1,140 @@
+from db import connect
+from utils import UserError
+from enums import QueueStatus
+from queue_entry import QueueEntry
+from problem import Problem
+from users import Participant, Examiner
+from queue_history import PROBLEM_NUMBER_COLUMN
+
+ACTIVE_STATUSES = ", ".join(map(str, QueueStatus.active(as_numbers=True)))
+
+
+class QueueEvent:
+    """
+    Всё, что нужно, чтобы сообщить об изменении записи в очереди: участник, принимающий, задача,
+    номер задачи у участника, оставшиеся попытки и счётчики олимпиады.
+    Загружается одним запросом (и ещё одним, если у записи есть принимающий), счётчики берутся из olymp_counters.
+
+    - `attempts_left` — сколько попыток осталось на задачу (как `Participant.attempts_left`)
+    - `solvable_left` — есть ли среди выданных участнику задач несданная, на которую остались попытки
+    - `unfinished_participants` — сколько участников олимпиады ещё не завершили участие
+    - `unhandled_queue_left` — есть ли в очереди активные записи участников, завершивших участие
+
+    Счётчики — снимок на момент загрузки: параллельно другие участники могут завершить участие,
+    поэтому перед решением о завершении олимпиады их нужно перечитать (`refresh_counters`)
+    - `examiner_in_queue` — есть ли у принимающего активная запись в очереди
+    """
+    __slots__ = (
+        "queue_entry", "participant", "examiner", "problem", "problem_number",
+        "attempts_left", "solvable_left", "unfinished_participants", "unhandled_queue_left", "examiner_in_queue",
+    )
+    _SELECT = f"""
+        SELECT
+            {Participant._select_columns()},
+            problems.id, problems.olymp_id, problems.name,
+            {PROBLEM_NUMBER_COLUMN},
+            (
+                SELECT COUNT(*) FROM queue AS q
+                WHERE q.participant_id = participants.id AND q.problem_id = queue.problem_id AND q.status = {QueueStatus.FAIL.value}
+            ),
+            EXISTS(
+                SELECT 1
+                FROM problem_blocks AS pb JOIN problems AS pr ON pr.id IN (pb.first_problem, pb.second_problem, pb.third_problem)
+                WHERE pb.olymp_id = queue.olymp_id AND pb.block_type / 3 = (participants.grade >= 10)
+                    AND pb.block_type % 3 < participants.last_block_number
+                    AND NOT EXISTS(
+                        SELECT 1 FROM queue AS q
+                        WHERE q.participant_id = participants.id AND q.problem_id = pr.id AND q.status = {QueueStatus.SUCCESS.value}
+                    )
+                    AND (
+                        SELECT COUNT(*) FROM queue AS q
+                        WHERE q.participant_id = participants.id AND q.problem_id = pr.id AND q.status = {QueueStatus.FAIL.value}
+                    ) < 3
+            ),
+            IFNULL(olymp_counters.unfinished_participants, 0),
+            IFNULL(olymp_counters.active_queue_finished, 0) > 0,
+            EXISTS(
+                SELECT 1 FROM queue AS q
+                WHERE q.examiner_id = queue.examiner_id AND q.status IN ({ACTIVE_STATUSES})
+            )
+        FROM
+            queue
+            JOIN participants ON participants.id = queue.participant_id
+            JOIN users ON users.user_id = participants.user_id
+            JOIN problems ON problems.id = queue.problem_id
+            LEFT JOIN olymp_counters ON olymp_counters.olymp_id = queue.olymp_id
+        WHERE queue.id = ?
+    """
+    _PARTICIPANT_COLUMNS = 1 + len(Participant._USER_COLUMNS) + len(Participant._MEMBER_COLUMNS)
+
+    def __init__(
+        self,
+        queue_entry: QueueEntry,
+        participant: Participant,
+        examiner: Examiner | None,
+        problem: Problem,
+        problem_number: int,
+        attempts_left: int,
+        solvable_left: bool,
+        unfinished_participants: int,
+        unhandled_queue_left: bool,
+        examiner_in_queue: bool,
+    ):
+        self.queue_entry = queue_entry
+        self.participant = participant
+        self.examiner = examiner
+        self.problem = problem
+        self.problem_number = problem_number
+        self.attempts_left = attempts_left
+        self.solvable_left = solvable_left
+        self.unfinished_participants = unfinished_participants
+        self.unhandled_queue_left = unhandled_queue_left
+        self.examiner_in_queue = examiner_in_queue
+
+    @classmethod
+    def load(cls, queue_entry: QueueEntry):
+        with connect() as conn:
+            cur = conn.cursor()
+            cur.execute(cls._SELECT, (queue_entry.id,))
+            row = cur.fetchone()
+        if row is None:
+            raise UserError("Запись не найдена")
+        split = cls._PARTICIPANT_COLUMNS
+        participant = Participant(*row[:split])
+        problem = Problem(*row[split:split + 3])
+        problem_number, fails, solvable_left, unfinished, unhandled, examiner_in_queue = row[split + 3:]
+        if problem_number is None or (problem_number - 1) // 3 + 1 > participant.last_block_number:
+            raise UserError(f"Задача {problem.id} не дана участнику {participant.id}")
+        examiner = Examiner.from_id(queue_entry.examiner_id) if queue_entry.examiner_id else None
+        return cls(
+            queue_entry, participant, examiner, problem, problem_number, 3 - fails,
+            bool(solvable_left), unfinished, bool(unhandled), bool(examiner_in_queue)
+        )
+
+    def should_get_new_problem(self) -> bool:
+        """
+        Как `Participant.should_get_new_problem` для задачи записи
+        """
+        last_block_number = self.participant.last_block_number
+        return last_block_number != 3 and last_block_number == (self.problem_number - 1) // 3 + 1
+
+    def refresh_counters(self):
+        """
+        Перечитать `unfinished_participants` и `unhandled_queue_left` из olymp_counters
+        """
+        with connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT unfinished_participants, active_queue_finished FROM olymp_counters WHERE olymp_id = ?",
+                (self.queue_entry.olymp_id,)
+            )
+            unfinished, unhandled = cur.fetchone() or (0, 0)
+        self.unfinished_participants = unfinished
+        self.unhandled_queue_left = unhandled > 0
+
+    def finish_participant(self):
+        """
+        Отметить, что участник завершил олимпиаду, и перечитать счётчики
+        """
+        self.participant.finished = True
+        self.refresh_counters()
@@ -0,0 +1,96 @@
+import sqlite3
+from enums import QueueStatus
+from users import User
+from telebot.formatting import escape_html
+
+PROBLEM_NUMBER_COLUMN = """(
+    SELECT
+        (pb.block_type % 3) * 3 + CASE queue.problem_id
+            WHEN pb.first_problem THEN 1 WHEN pb.second_problem THEN 2 ELSE 3
+        END
+    FROM problem_blocks AS pb
+    WHERE pb.olymp_id = queue.olymp_id AND pb.block_type / 3 = (participants.grade >= 10)
+        AND queue.problem_id IN (pb.first_problem, pb.second_problem, pb.third_problem)
+    LIMIT 1
+)"""
+"""Номер задачи записи `queue` у участника `participants` (как в `Participant.get_problem_number`) или NULL"""
+
+
+class QueueHistoryEntry:
+    """
+    Запись в очереди вместе с именами участника, принимающего и задачи — всё, что нужно, чтобы её показать.
+    Только для чтения: чтобы менять запись, используй `QueueEntry`
+    """
+    __slots__ = (
+        "id", "status",
+        "participant_id", "participant_name", "participant_surname", "participant_tg_handle", "grade",
+        "examiner_id", "examiner_name", "examiner_surname", "examiner_tg_handle",
+        "problem_id", "problem_name", "problem_number",
+    )
+    _SELECT = f"""
+        SELECT
+            queue.id, queue.status,
+            queue.participant_id, pu.name, pu.surname, pu.tg_handle, participants.grade,
+            queue.examiner_id, eu.name, eu.surname, eu.tg_handle,
+            queue.problem_id, problems.name, {PROBLEM_NUMBER_COLUMN}
+        FROM
+            queue
+            JOIN participants ON participants.id = queue.participant_id
+            JOIN users AS pu ON pu.user_id = participants.user_id
+            JOIN problems ON problems.id = queue.problem_id
+            LEFT JOIN examiners ON examiners.id = queue.examiner_id
+            LEFT JOIN users AS eu ON eu.user_id = examiners.user_id
+        WHERE queue.olymp_id = ?
+    """
+
+    def __init__(
+        self,
+        id: int,
+        status: QueueStatus | int,
+        participant_id: int,
+        participant_name: str,
+        participant_surname: str,
+        participant_tg_handle: str,
+        grade: int,
+        examiner_id: int | None,
+        examiner_name: str | None,
+        examiner_surname: str | None,
+        examiner_tg_handle: str | None,
+        problem_id: int,
+        problem_name: str,
+        problem_number: int | None,
+    ):
+        self.id = id
+        self.status = QueueStatus(status) if not isinstance(status, QueueStatus) else status
+        self.participant_id = participant_id
+        self.participant_name = participant_name
+        self.participant_surname = participant_surname
+        self.participant_tg_handle = participant_tg_handle
+        self.grade = grade
+        self.examiner_id = examiner_id
+        self.examiner_name = examiner_name
+        self.examiner_surname = examiner_surname
+        self.examiner_tg_handle = examiner_tg_handle
+        self.problem_id = problem_id
+        self.problem_name = problem_name
+        self.problem_number = problem_number
+
+    @classmethod
+    def from_row(cls, cursor: sqlite3.Cursor, row: tuple):
+        """Фабрика строк (`cursor.row_factory`) для `_SELECT`"""
+        return cls(*row)
+
+    def display(self) -> str:
+        response = (f"ЗАПИСЬ <code>{self.id}</code>\n"
+                    f"- <strong>Участник:</strong> {self.participant_name} {self.participant_surname} "
+                    f"({User.format_tg_handle(self.participant_tg_handle)}) ({self.grade} класс)\n")
+        if self.examiner_id:
+            response += (f"- <strong>Принимающий:</strong> {self.examiner_name} {self.examiner_surname} "
+                         f"({User.format_tg_handle(self.examiner_tg_handle)})\n")
+        else:
+            response += "- <strong>Принимающий</strong> не назначен\n"
+        response += f"- <strong>Задача:</strong> <code>{self.problem_id}</code> <em>{escape_html(self.problem_name)}</em>"
+        if self.problem_number:
+            response += f" (№{self.problem_number} у участника)"
+        response += f"\n- <strong>Статус:</strong> {self.status}\n"
+        return response
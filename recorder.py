@@ -0,0 +1,98 @@
+"""
+Запись работы бота для последующего воспроизведения (см. `benchmarks.replay`).
+
+В папку записи сохраняются:
+- `meta.json` — владелец бота и время начала записи;
+- `snapshot/` — копии баз данных на момент запуска;
+- `updates.jsonl` — все полученные обновления в исходном JSON, по одному на строку;
+- `files/` — файлы, которые бот скачал у Telegram (таблицы, условия задач);
+- `final/` — копии баз данных на момент остановки
+"""
+import os
+import json
+import time
+import shutil
+import threading
+from typing import BinaryIO
+from contextlib import closing
+from telebot import apihelper
+from db import DATABASE, CHURN_DATABASE, connect
+
+RECORDINGS_PATH = "recordings"
+
+__lock = threading.Lock()
+__directory: str | None = None
+__updates_file = None
+
+
+def recording() -> bool:
+    return __directory is not None
+
+
+def backup_databases(directory: str):
+    """
+    Скопировать основную базу и базу часто меняющихся данных (если она отдельная) в `directory`
+    """
+    os.makedirs(directory, exist_ok=True)
+    for database in dict.fromkeys([DATABASE, CHURN_DATABASE]):
+        if not os.path.exists(database):
+            continue
+        with closing(connect(database)) as source, closing(connect(os.path.join(directory, os.path.basename(database)))) as target:
+            source.backup(target)
+
+
+def start(owner_id: int, directory: str | None = None) -> str:
+    """
+    Сохранить снимок баз данных и начать записывать обновления.
+    Вызывать до начала опроса Telegram
+    """
+    global __directory, __updates_file
+    directory = directory or os.path.join(RECORDINGS_PATH, time.strftime("%Y-%m-%d_%H-%M-%S"))
+    os.makedirs(os.path.join(directory, "files"), exist_ok=True)
+    backup_databases(os.path.join(directory, "snapshot"))
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf8") as f:
+        json.dump({"owner_id": owner_id, "started_at": time.time()}, f)
+    __updates_file = open(os.path.join(directory, "updates.jsonl"), "a", encoding="utf8")
+    __directory = directory
+
+    get_updates = apihelper.get_updates
+    def recording_get_updates(*args, **kwargs):
+        updates = get_updates(*args, **kwargs)
+        if updates and __updates_file is not None:
+            with __lock:
+                for update in updates:
+                    __updates_file.write(json.dumps(update, ensure_ascii=False) + "\n")
+                __updates_file.flush()
+        return updates
+    recording_get_updates.__wrapped__ = get_updates
+    apihelper.get_updates = recording_get_updates
+    return directory
+
+
+def save_file(file_unique_id: str, file: BinaryIO):
+    """
+    Сохранить скачанный у Telegram файл, чтобы при воспроизведении он был доступен без сети.
+    `file` читается с текущей позиции, после копирования позиция возвращается обратно
+    """
+    if __directory is None:
+        return
+    position = file.tell()
+    with open(os.path.join(__directory, "files", file_unique_id), "wb") as f:
+        shutil.copyfileobj(file, f)
+    file.seek(position)
+
+
+def stop():
+    """
+    Закончить запись и сохранить итоговое состояние баз данных
+    """
+    global __directory, __updates_file
+    if __directory is None:
+        return
+    if hasattr(apihelper.get_updates, "__wrapped__"):
+        apihelper.get_updates = apihelper.get_updates.__wrapped__
+    with __lock:
+        __updates_file.close()
+        __updates_file = None
+    backup_databases(os.path.join(__directory, "final"))
+    __directory = None
@@ -0,0 +1,97 @@
+"""
+Кэш готовых карточек участников и принимающих (`display_data`, `display_problem_data`)
+и клавиатур выбора задачи.
+
+Каждому пользователю соответствует версия — значение общего счётчика при последнем изменении его данных.
+Сеттеры моделей сдвигают версию пользователя (`changed`), изменения задач, блоков задач и тэгов
+сдвигают версию всех пользователей сразу (`changed_all`). Готовый текст хранится вместе с версией,
+при которой он собран, и отдаётся, пока версия не изменилась.
+
+Объект модели запоминает версию при создании: если с тех пор данные менялись через другой объект,
+он мог устареть, и собранное по нему в кэш не попадает
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, TypeVar
+
+MAX_RENDERS = 2048
+
+T = TypeVar("T")
+
+__lock = threading.Lock()
+__clock = 0
+# Версия, с которой начинаются версии всех пользователей
+__shared_version = 0
+# ID пользователя -> версия
+__versions: dict[int, int] = {}
+# Ключ -> (версия, готовый текст), от давно использованных к недавно использованным
+__renders: OrderedDict[Hashable, tuple[int, object]] = OrderedDict()
+
+
+def stamp(user_id: int) -> int:
+    """
+    Текущая версия данных пользователя
+    """
+    return max(__versions.get(user_id, 0), __shared_version)
+
+
+def fresh(stamps: dict[int, int]) -> bool:
+    """
+    Не менялись ли данные пользователей с версий `stamps` (ID пользователя -> версия)
+    """
+    with __lock:
+        return all(stamp(user_id) == known for user_id, known in stamps.items())
+
+
+def changed(user_id: int, known: int | None = None) -> int:
+    """
+    Данные пользователя изменились.
+    :param known: версия, которую помнит изменивший данные объект
+    :return: версия, которую объекту нужно запомнить: новая, если объект не был устаревшим, иначе `known`
+    """
+    global __clock
+    with __lock:
+        up_to_date = known is None or known == stamp(user_id)
+        __clock += 1
+        __versions[user_id] = __clock
+        return __clock if up_to_date else known
+
+
+def changed_all():
+    """
+    Изменились данные, от которых зависят карточки всех пользователей: задачи, блоки задач, тэги
+    """
+    global __clock, __shared_version
+    with __lock:
+        __clock += 1
+        __shared_version = __clock
+        __versions.clear()
+        __renders.clear()
+
+
+def get(key: Hashable, user_id: int, known: int, render: Callable[[], T]) -> T:
+    """
+    Готовый текст по ключу `key` или, если его нет или он устарел, результат `render()`.
+    :param known: версия, которую помнит объект, по которому собирается текст
+    """
+    with __lock:
+        current = stamp(user_id)
+        cached = __renders.get(key)
+        if cached and cached[0] == current:
+            __renders.move_to_end(key)
+            return cached[1]
+    value = render()
+    if known != current:
+        return value
+    with __lock:
+        if stamp(user_id) == current:
+            __renders[key] = (current, value)
+            __renders.move_to_end(key)
+            while len(__renders) > MAX_RENDERS:
+                __renders.popitem(last=False)
+    return value
+
+
+def clear():
+    with __lock:
+        __renders.clear()
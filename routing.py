@@ -0,0 +1,160 @@
+import telebot
+from telebot.custom_filters import AdvancedCustomFilter
+from telebot.types import CallbackQuery
+from telebot.util import extract_command
+
+
+# Примерная стоимость проверки фильтров: дешёвые проверяются первыми,
+# а фильтры, обращающиеся к базе данных, — последними
+FILTER_COSTS = {
+    'content_types': 0,
+    'chat_types': 0,
+    'commands': 1,
+    'doc_commands': 1,
+    'callback_prefix': 1,
+    'regexp': 2,
+    'olymp_statuses': 3,
+    'func': 4,
+    'state': 5,
+    'roles': 6,
+    'discussing_examiner': 7,
+}
+DEFAULT_FILTER_COST = 4
+
+
+class CallbackPrefixFilter(AdvancedCustomFilter):
+    key = 'callback_prefix'
+    @staticmethod
+    def check(callback_query: CallbackQuery, prefix: str):
+        return (callback_query.data or '').startswith(prefix)
+
+
+def sort_filters(filters: dict) -> dict:
+    """
+    Упорядочить фильтры обработчика так, чтобы дешёвые проверялись раньше дорогих
+    """
+    return dict(sorted(filters.items(), key=lambda item: FILTER_COSTS.get(item[0], DEFAULT_FILTER_COST)))
+
+
+class RoutingTable:
+    """
+    Таблица маршрутизации для одного типа обновлений. Обработчики с ключевыми фильтрами
+    (команды, префиксы callback-данных) раскладываются по словарю, остальные
+    проверяются по порядку объявления, как и раньше
+    """
+    def __init__(self, handlers: list[dict], keys: tuple[str, ...]):
+        self.size = len(handlers)
+        self.__handlers = handlers
+        routes: dict[str, list[int]] = {}
+        fallback: list[int] = []
+        for i, handler in enumerate(handlers):
+            values = []
+            for key in keys:
+                value = handler['filters'].get(key)
+                if isinstance(value, str):
+                    value = [value]
+                values += value or []
+            if not values:
+                fallback.append(i)
+                continue
+            for value in values:
+                routes.setdefault(value, []).append(i)
+        self.__routes = routes
+        self.__fallback_indices = fallback
+        self.__fallback = [handlers[i] for i in fallback]
+        self.__key_lengths = sorted({len(key) for key in routes})
+        self.__cache: dict[tuple[str, ...], list[dict]] = {}
+
+    def __merge(self, keys: tuple[str, ...]) -> list[dict]:
+        if not keys:
+            return self.__fallback
+        cached = self.__cache.get(keys)
+        if cached is None:
+            indices = set(self.__fallback_indices)
+            for key in keys:
+                indices.update(self.__routes[key])
+            cached = [self.__handlers[i] for i in sorted(indices)]
+            self.__cache[keys] = cached
+        return cached
+
+    def by_key(self, key: str | None) -> list[dict]:
+        """
+        Обработчики, которые могут подойти для точного ключа (например, команды)
+        """
+        if key is None or key not in self.__routes:
+            return self.__fallback
+        return self.__merge((key,))
+
+    def by_prefix(self, data: str) -> list[dict]:
+        """
+        Обработчики, которые могут подойти для строки по одному из её префиксов
+        """
+        keys = []
+        for length in self.__key_lengths:
+            if length > len(data):
+                break
+            if data[:length] in self.__routes:
+                keys.append(data[:length])
+        return self.__merge(tuple(keys))
+
+
+class RoutedTeleBot(telebot.TeleBot):
+    """
+    `TeleBot`, который выбирает обработчики сообщений и callback-запросов по хэш-таблице
+    вместо последовательной проверки всех обработчиков. Порядок срабатывания обработчиков
+    не меняется: из таблицы берутся только те, которые в принципе могут подойти
+    """
+    ROUTING_KEYS = {
+        'message': ('commands', 'doc_commands'),
+        'callback_query': ('callback_prefix',),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.__tables: dict[str, RoutingTable] = {}
+        self.add_custom_filter(CallbackPrefixFilter())
+
+    @staticmethod
+    def __prepare(handler_dict: dict) -> dict:
+        handler_dict['declared_filters'] = handler_dict['filters']
+        handler_dict['filters'] = sort_filters(handler_dict['filters'])
+        return handler_dict
+
+    def add_message_handler(self, handler_dict):
+        super().add_message_handler(self.__prepare(handler_dict))
+
+    def add_callback_query_handler(self, handler_dict):
+        super().add_callback_query_handler(self.__prepare(handler_dict))
+
+    def __table(self, handlers: list[dict], update_type: str) -> RoutingTable:
+        table = self.__tables.get(update_type)
+        if table is None or table.size != len(handlers):
+            table = RoutingTable(handlers, self.ROUTING_KEYS[update_type])
+            self.__tables[update_type] = table
+        return table
+
+    def route(self, update, handlers: list[dict], update_type: str) -> list[dict]:
+        """
+        Список обработчиков, которые стоит проверить для обновления, в порядке объявления
+        """
+        if update_type not in self.ROUTING_KEYS:
+            return handlers
+        table = self.__table(handlers, update_type)
+        if update_type == 'message':
+            return table.by_key(extract_command(update.text or update.caption))
+        return table.by_prefix(update.data or '')
+
+    def _notify_command_handlers(self, handlers, new_messages, update_type):
+        if update_type not in self.ROUTING_KEYS:
+            return super()._notify_command_handlers(handlers, new_messages, update_type)
+        if (not handlers) and (not self.use_class_middlewares):
+            return
+        middlewares = self._get_middlewares(update_type) if self.use_class_middlewares else None
+        for message in new_messages:
+            self._exec_task(
+                self._run_middlewares_and_handler,
+                message,
+                handlers=self.route(message, handlers, update_type),
+                middlewares=middlewares,
+                update_type=update_type
+            )
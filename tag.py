@@ -1,9 +1,14 @@
 import sqlite3
-from db import DATABASE
-from utils import UserError, update_in_table, provide_cursor
+from functools import partial
+from db import connect
+from utils import UserError, update_in_table, provide_cursor, factory_cursor, after_write
+import tag_index
+import render_cache
 from telebot.formatting import escape_html
 
 class Tag:
+    __slots__ = ("__id", "__name", "__description")
+
     def __init__(
         self,
         id: int,
@@ -14,27 +19,34 @@ class Tag:
         self.__name = name
         self.__description = description
 
+    @classmethod
+    def from_row(cls, cursor: sqlite3.Cursor, row: tuple):
+        """Фабрика строк (`cursor.row_factory`) для `SELECT * FROM tags`"""
+        return cls(*row)
+
     @classmethod
     def from_id(cls, id: int):
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
+            cur.row_factory = cls.from_row
             cur.execute("SELECT * FROM tags WHERE id = ?", (id,))
-            fetch = cur.fetchone()
-        if not fetch:
+            tag = cur.fetchone()
+        if not tag:
             raise UserError("Тэг не найден")
-        return cls(*fetch)
+        return tag
     
     @classmethod
     def from_name(cls, name: str, no_error: bool = False):
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
+            cur.row_factory = cls.from_row
             cur.execute("SELECT * FROM tags WHERE name = ?", (name,))
-            fetch = cur.fetchone()
-        if not fetch:
+            tag = cur.fetchone()
+        if not tag:
             if no_error:
                 return None
             raise UserError("Тэг не найден")
-        return cls(*fetch)
+        return tag
 
     @classmethod
     @provide_cursor
@@ -49,30 +61,29 @@ class Tag:
         """
         Добавить тэг в таблицу tags
         """
-        cursor.execute("SELECT * FROM tags")
-        fetch = cursor.fetchall()
-        for f in fetch:
-            t = cls(*f)
-            if t.name == name:
-                if no_error:
-                    return t
-                raise UserError(f"Название <em>{escape_html(t.name)}</em> уже занято тэгом <code>{t.id}</code>")
         values = (name, description)
-        cursor.execute("INSERT INTO tags(name, description) VALUES (?, ?)", values)
+        cursor.execute("INSERT INTO tags(name, description) VALUES (?, ?) ON CONFLICT (name) DO NOTHING RETURNING id", values)
+        fetch = cursor.fetchone()
+        if fetch is None:
+            t = factory_cursor(cursor, cls.from_row).execute("SELECT * FROM tags WHERE name = ?", (name,)).fetchone()
+            if no_error:
+                return t
+            raise UserError(f"Название <em>{escape_html(t.name)}</em> уже занято тэгом <code>{t.id}</code>")
         cursor.connection.commit()
-        created_id = cursor.lastrowid
-        return cls(created_id, *values)
+        tag_index.tag_created(fetch[0], name, description)
+        return cls(fetch[0], *values)
     
     @classmethod
     @provide_cursor
     def get_all(cls, *, cursor: sqlite3.Cursor | None = None):
-        cursor.execute("SELECT * FROM tags")
-        results = cursor.fetchall()
-        return [cls(*fetch) for fetch in results]
+        return factory_cursor(cursor, cls.from_row).execute("SELECT * FROM tags").fetchall()
 
     @provide_cursor
     def delete(self, *, cursor: sqlite3.Cursor | None = None):
         cursor.execute("DELETE FROM tags WHERE id = ?", (self.id,))
+        cursor.connection.commit()
+        tag_index.tag_deleted(self.id)
+        render_cache.changed_all()
 
 
     def __str__(self):
@@ -93,11 +104,15 @@ class Tag:
             raise UserError(f"Название <em>{escape_html(tag.name)}</em> уже занято тэгом <code>{tag.id}</code>")
         self.__set("name", value)
         self.__name = value
+        after_write(partial(tag_index.tag_changed, self.__id, self.__name, self.__description))
+        after_write(render_cache.changed_all)
     @property
     def description(self): return self.__description
     @description.setter
     def description(self, value: str):
         self.__set("description", value)
         self.__description = value
+        after_write(partial(tag_index.tag_changed, self.__id, self.__name, self.__description))
+        after_write(render_cache.changed_all)
 
     def __eq__(self, other): return isinstance(other, self.__class__) and self.id == other.id
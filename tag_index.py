@@ -0,0 +1,146 @@
+"""
+Индекс тэгов в памяти: тэги по ID и коду, у каждого тэга свой бит, у каждого пользователя —
+битовая маска его тэгов. Фильтры по тэгам проверяются битовыми операциями, без запросов к базе.
+
+Индекс загружается из базы при первом обращении, дальше обновляется моделями при каждом изменении тэгов
+"""
+import threading
+from db import connect
+from utils import UserError
+
+__lock = threading.RLock()
+__loaded = False
+# ID тэга -> (код, описание)
+__tags: dict[int, tuple[str, str]] = {}
+# Код тэга -> ID тэга
+__ids: dict[str, int] = {}
+# ID тэга -> бит тэга
+__bits: dict[int, int] = {}
+# ID пользователя -> маска тэгов
+__masks: dict[int, int] = {}
+
+
+def __bit(tag_id: int) -> int:
+    if tag_id not in __bits:
+        __bits[tag_id] = 1 << len(__bits)
+    return __bits[tag_id]
+
+
+def __load():
+    global __loaded
+    if __loaded:
+        return
+    with __lock:
+        if __loaded:
+            return
+        with connect() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, name, description FROM tags ORDER BY id")
+            tags = cur.fetchall()
+            cur.execute("SELECT user_id, tag_id FROM user_tags")
+            user_tags = cur.fetchall()
+        for tag_id, name, description in tags:
+            __tags[tag_id] = (name, description)
+            __ids[name] = tag_id
+            __bit(tag_id)
+        for user_id, tag_id in user_tags:
+            __masks[user_id] = __masks.get(user_id, 0) | __bit(tag_id)
+        __loaded = True
+
+
+def reset():
+    """
+    Забыть индекс: при следующем обращении он загрузится из базы заново.
+    Нужно, если тэги менялись в базе в обход моделей
+    """
+    global __loaded
+    with __lock:
+        __tags.clear()
+        __ids.clear()
+        __bits.clear()
+        __masks.clear()
+        __loaded = False
+
+
+def get(tag_id: int) -> tuple[str, str]:
+    """
+    :return: `код`, `описание`
+    """
+    __load()
+    tag = __tags.get(tag_id)
+    if tag is None:
+        raise UserError("Тэг не найден")
+    return tag
+
+
+def tag_id(name: str) -> int:
+    __load()
+    tag_id = __ids.get(name)
+    if tag_id is None:
+        raise UserError("Тэг не найден")
+    return tag_id
+
+
+def mask(tag_ids: list[int]) -> int:
+    __load()
+    with __lock:
+        result = 0
+        for tag_id in tag_ids:
+            result |= __bit(tag_id)
+        return result
+
+
+def user_mask(user_id: int) -> int:
+    __load()
+    return __masks.get(user_id, 0)
+
+
+def matches(user_id: int, include_mask: int = 0, exclude_mask: int = 0) -> bool:
+    """
+    Есть ли у пользователя все тэги из `include_mask` и ни одного из `exclude_mask`
+    """
+    __load()
+    user_mask = __masks.get(user_id, 0)
+    return (user_mask & include_mask) == include_mask and not (user_mask & exclude_mask)
+
+
+def tag_created(tag_id: int, name: str, description: str):
+    tag_changed(tag_id, name, description)
+
+
+def tag_changed(tag_id: int, name: str, description: str):
+    with __lock:
+        if not __loaded:
+            return
+        old = __tags.get(tag_id)
+        if old is not None and __ids.get(old[0]) == tag_id:
+            del __ids[old[0]]
+        __tags[tag_id] = (name, description)
+        __ids[name] = tag_id
+        __bit(tag_id)
+
+
+def tag_deleted(tag_id: int):
+    with __lock:
+        if not __loaded:
+            return
+        old = __tags.pop(tag_id, None)
+        if old is not None and __ids.get(old[0]) == tag_id:
+            del __ids[old[0]]
+        bit = __bits.get(tag_id, 0)
+        for user_id, user_mask in __masks.items():
+            if user_mask & bit:
+                __masks[user_id] = user_mask & ~bit
+
+
+def user_tags_changed(user_id: int, tag_ids: list[int]):
+    with __lock:
+        if not __loaded:
+            return
+        __masks[user_id] = mask(tag_ids)
+
+
+def user_removed(user_id: int):
+    with __lock:
+        if __loaded:
+            __masks.pop(user_id, None)
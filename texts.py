@@ -0,0 +1,81 @@
+"""
+Тексты бота, которые не зависят от данных: справка по командам из `help/<роль>.json` и подсказки.
+
+Справка разбирается при запуске, готовые сообщения собираются один раз для каждого набора ролей.
+Если JSON-файлы справки меняются, они перечитываются при следующем обращении
+"""
+import os
+import json
+import threading
+from telebot.formatting import escape_html
+
+HELP_PATH = "help"
+HELP_ROLES = ("owner", "examiner", "participant")
+
+QUEUE_COMMAND = "<code>" + escape_html("/queue <номер задачи>") + "</code>"
+JOIN_QUEUE_HINT = "Чтобы записаться на сдачу задачи, используй команду " + QUEUE_COMMAND
+JOIN_QUEUE_AGAIN_HINT = "Чтобы записаться на сдачу задачи снова, используй команду " + QUEUE_COMMAND
+JOIN_QUEUE_SHORT_HINT = "Чтобы записаться в очередь, используй команду " + QUEUE_COMMAND
+LEAVE_QUEUE_HINT = "Чтобы покинуть очередь, используй команду /leave_queue"
+
+__lock = threading.Lock()
+# Роль -> время изменения файла справки, по которому собраны сообщения
+__mtimes: dict[str, int] = {}
+# Роль -> (заголовок, блоки команд, уже в HTML)
+__help: dict[str, tuple[str, list[str]]] = {}
+# Роли -> сообщения справки
+__messages: dict[tuple[str, ...], list[str]] = {}
+
+
+def __render_block(block: list[list[str]]) -> str:
+    response = ""
+    for command, description in block:
+        command = ("/" + command) if (" " not in command) else f"<code>/{escape_html(command)}</code>"
+        response += command + " — " + description + "\n"
+    return response + "\n"
+
+
+def __help_path(role: str) -> str:
+    return os.path.join(HELP_PATH, f"{role}.json")
+
+
+def __load():
+    __help.clear()
+    __messages.clear()
+    for role in HELP_ROLES:
+        path = __help_path(role)
+        __mtimes[role] = os.stat(path).st_mtime_ns
+        with open(path, encoding="utf8") as f:
+            data = json.load(f)
+        __help[role] = (f"<strong>{data['title']}</strong>\n\n", [__render_block(block) for block in data["commands"]])
+
+
+def __changed() -> bool:
+    return any(os.stat(__help_path(role)).st_mtime_ns != mtime for role, mtime in __mtimes.items())
+
+
+def help_messages(roles: tuple[str, ...]) -> list[str]:
+    """
+    Сообщения справки для пользователя с ролями `roles` (из `HELP_ROLES`, в том же порядке).
+    Если ролей несколько, справка по каждой начинается с отдельного сообщения с заголовком
+    """
+    with __lock:
+        if not __help or __changed():
+            __load()
+        if roles in __messages:
+            return __messages[roles]
+        messages = []
+        response = __render_block([["help", "Показать список команд"]])
+        for role in roles:
+            title, blocks = __help[role]
+            if len(roles) > 1:
+                messages.append(response)
+                response = title
+            response += "".join(blocks)
+        messages.append(response)
+        __messages[roles] = messages
+        return messages
+
+
+with __lock:
+    __load()
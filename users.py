@@ -1,15 +1,25 @@
 import sqlite3
-from db import DATABASE
-from utils import UserError, decline, provide_cursor, value_exists, update_in_table
+from functools import partial
+from db import connect
+from utils import UserError, decline, provide_cursor, value_exists, update_in_table, unit_of_work, after_write
 from tag import Tag
+import tag_index
+import member_counts
+import render_cache
 from enums import OlympStatus
 from queue_entry import QueueEntry, QueueStatus
 from problem import Problem, ProblemBlock, BlockType
 from data import OWNER_HANDLE
+import metrics
 from telebot.formatting import escape_html
 
+TAGS_COLUMN = "(SELECT group_concat(tag_id) FROM user_tags WHERE user_tags.user_id = users.user_id)"
+
 
 class User:
+    __slots__ = ("__user_id", "__tg_id", "__tg_handle", "__name", "__surname", "__tags", "__render_stamp")
+    _USER_COLUMNS = ("users.user_id", "users.tg_id", "users.tg_handle", "users.name", "users.surname", TAGS_COLUMN)
+
     def __init__(
         self,
         user_id: int,
@@ -17,14 +27,27 @@ class User:
         tg_handle: str,
         name: str,
         surname: str,
-        tags: list[int],
+        tags: list[int] | str | None,
     ):
+        if isinstance(tags, str):
+            tags = list(map(int, tags.split(",")))
+        if tags is None:
+            tags = []
         self.__user_id: int = user_id
         self.__tg_id: int | None = tg_id
         self.__tg_handle: str = self.conform_tg_handle(tg_handle)
         self.__name: str = name
         self.__surname: str = surname
         self.__tags: list[int] = tags
+        self.__render_stamp: int = render_cache.stamp(user_id)
+
+    @classmethod
+    def from_row(cls, cursor: sqlite3.Cursor, row: tuple):
+        """
+        Фабрика строк (`cursor.row_factory`): строка содержит столбцы `_USER_COLUMNS`,
+        у участников и принимающих — ещё `olymp_id` в начале и `_MEMBER_COLUMNS` в конце
+        """
+        return cls(*row)
 
     @classmethod
     @provide_cursor
@@ -43,24 +66,22 @@ class User:
         Добавить пользователя в таблицу users
         """
         tg_handle = cls.conform_tg_handle(tg_handle)
-        exists = value_exists("users", {"tg_handle": tg_handle})
-        if exists and not ok_if_exists:
-            raise UserError(f"Пользователь @{tg_handle} уже есть в базе")
-        if tg_id:
-            exists = exists or value_exists("users", {"tg_id": tg_id})
-            if exists and not ok_if_exists:
-                raise UserError(f"Пользователь с Telegram ID {tg_id} уже есть в базе")
-        if not exists:
-            cursor.execute(
-                "INSERT INTO users(tg_id, tg_handle, name, surname) VALUES (?, ?, ?, ?)", 
-                (tg_id, tg_handle, name, surname)
-            )
+        q = "INSERT INTO users(tg_id, tg_handle, name, surname) VALUES (?, ?, ?, ?) "
+        if ok_if_exists:
+            q += ("ON CONFLICT (tg_handle) DO UPDATE SET "
+                  "tg_id = excluded.tg_id, name = excluded.name, surname = excluded.surname ")
         else:
-            cursor.execute(
-                "UPDATE users SET tg_id = ?, name = ?, surname = ? WHERE tg_handle = ?",
-                (tg_id, name, surname, tg_handle)
-            )
-        user_id = cursor.lastrowid
+            q += "ON CONFLICT DO NOTHING "
+        try:
+            cursor.execute(q + "RETURNING user_id", (tg_id, tg_handle, name, surname))
+            fetch = cursor.fetchone()
+        except sqlite3.IntegrityError: # Telegram ID занят пользователем с другим хэндлом
+            fetch = None
+        if fetch is None:
+            if ok_if_exists or not value_exists("users", {"tg_handle": tg_handle}, cursor=cursor):
+                raise UserError(f"Пользователь с Telegram ID {tg_id} уже есть в базе")
+            raise UserError(f"Пользователь @{tg_handle} уже есть в базе")
+        user_id = fetch[0]
         if tags and len(tags) > 0:
             q = "INSERT INTO user_tags(user_id, tag_id) VALUES " + ", ".join(["(?, ?)"] * len(tags))
             t = []
@@ -68,7 +89,12 @@ class User:
                 t += [user_id, tag_id]
             cursor.execute(q, tuple(t))
         cursor.connection.commit()
-        return cls.from_tg_handle(tg_handle)
+        if ok_if_exists:
+            render_cache.changed(user_id)
+        user = cls.from_user_id(user_id)
+        if tags:
+            tag_index.user_tags_changed(user_id, user.tags)
+        return user
 
     @classmethod
     def from_db(
@@ -83,48 +109,49 @@ class User:
     ):
         if tg_handle:
             tg_handle = cls.conform_tg_handle(tg_handle)
-        if tg_id:
-            checked_column = "tg_id"
-            given_value = tg_id
-        elif user_id:
-            checked_column = "user_id"
-            given_value = user_id
-        elif tg_handle:
-            checked_column = "tg_handle"
-            given_value = tg_handle
-        else:
-            raise ValueError(error_no_id_provided)
-        with sqlite3.connect(DATABASE) as conn:
+        checked_column, given_value = cls._checked_column(user_id, tg_id, tg_handle, error_no_id_provided)
+        with connect() as conn:
             cur = conn.cursor()
-            if not value_exists("users", {checked_column: given_value}, cursor=cur):
-                if not error_user_not_found:
-                    return None
-                raise UserError(error_user_not_found)
             q = f"""
                 SELECT
-                    user_id,
-                    tg_id,
-                    tg_handle,
-                    name,
-                    surname
+                    {", ".join(cls._USER_COLUMNS)}
                 FROM
                     users
                 WHERE
                     {checked_column} = ?
                 """
             cur.execute(q, (given_value,))
-            fetched_base_values = list(cur.fetchone())
-        user = cls(*fetched_base_values, tags=[])
-        if ((tg_id and user.tg_id != tg_id)
-            or (user_id and user.user_id != user_id)
-            or (tg_handle and user.tg_handle != tg_handle)):
+            fetch = cur.fetchone()
+        if fetch is None:
+            if not error_user_not_found:
+                return None
+            raise UserError(error_user_not_found)
+        if not cls._ids_match(fetch[:3], user_id, tg_id, tg_handle):
             raise ValueError(error_ids_dont_match)
-        with sqlite3.connect(DATABASE) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT tag_id FROM user_tags WHERE user_id = ?", (user.__user_id,))
-            result = cur.fetchall()
-        user.__tags = [fetch[0] for fetch in result]
-        return user
+        return cls(*fetch)
+
+    @staticmethod
+    def _checked_column(user_id: int | None, tg_id: int | None, tg_handle: str | None, error_no_id_provided: str):
+        """
+        :return: `column`, `value` — по какому столбцу таблицы users искать пользователя
+        """
+        if tg_id:
+            return "tg_id", tg_id
+        if user_id:
+            return "user_id", user_id
+        if tg_handle:
+            return "tg_handle", tg_handle
+        raise ValueError(error_no_id_provided)
+
+    @staticmethod
+    def _ids_match(fetched_ids: tuple, user_id: int | None, tg_id: int | None, tg_handle: str | None) -> bool:
+        """
+        :param fetched_ids: (`user_id`, `tg_id`, `tg_handle`) найденного пользователя
+        """
+        fetched_user_id, fetched_tg_id, fetched_tg_handle = fetched_ids
+        return not ((tg_id and fetched_tg_id != tg_id)
+                    or (user_id and fetched_user_id != user_id)
+                    or (tg_handle and fetched_tg_handle != tg_handle))
 
     @classmethod
     def from_user_id(cls, user_id: int, no_error: bool = False):
@@ -155,7 +182,14 @@ class User:
 
     @provide_cursor
     def remove(self, *, cursor: sqlite3.Cursor | None = None):
+        """
+        Удалить пользователя. Транзакция курсора фиксируется, и только потом обновляются кэши
+        """
         cursor.execute("DELETE FROM users WHERE user_id = ?", (self.user_id,))
+        cursor.connection.commit()
+        tag_index.user_removed(self.user_id)
+        member_counts.invalidate()
+        render_cache.changed(self.user_id)
 
 
     def conflate_with(self, new_user: 'User'):
@@ -165,20 +199,26 @@ class User:
         new_surname = new_user.surname
         new_tg_handle = new_user.tg_handle
         new_tags = new_user.tags
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
             cur.execute("UPDATE participants SET user_id = ? WHERE user_id = ?", (self.user_id, new_user.user_id))
             cur.execute("UPDATE examiners SET user_id = ? WHERE user_id = ?", (self.user_id, new_user.user_id))
             new_user.remove(cursor=cur)
             conn.commit()
-        self.name = new_name
-        self.surname = new_surname
-        self.tg_handle = new_tg_handle
+        self._render_changed()
+        with unit_of_work():
+            self.name = new_name
+            self.surname = new_surname
+            self.tg_handle = new_tg_handle
         self.set_tags(new_tags)
     
 
     def display_tg_handle(self, hide_id: bool = False) -> str:
-        return (f"Без хэндла" if hide_id else f"ID: <code>{self.tg_handle}</code>") if self.tg_handle.isnumeric() else f"@{self.tg_handle}"
+        return User.format_tg_handle(self.tg_handle, hide_id)
+
+    @staticmethod
+    def format_tg_handle(tg_handle: str, hide_id: bool = False) -> str:
+        return (f"Без хэндла" if hide_id else f"ID: <code>{tg_handle}</code>") if tg_handle.isnumeric() else f"@{tg_handle}"
     
     def display_tags(self, verbose: bool = False, hide_name: bool = True) -> str:
         result = ""
@@ -189,11 +229,11 @@ class User:
             result = f"{amount} {decline(amount, 'тэг', ('', 'а', 'ов'))}:\n"
         tag_list = []
         for tag_id in self.tags:
-            tag = Tag.from_id(tag_id)
+            name, description = tag_index.get(tag_id)
             if not hide_name:
-                tag_list.append(f"<code>{escape_html(tag.name)}</code>: {tag}")
+                tag_list.append(f"<code>{escape_html(name)}</code>: {escape_html(description)}")
             else:
-                tag_list.append(str(tag))
+                tag_list.append(escape_html(description))
         return result + "\n".join(tag_list)
 
     def add_tag(self, tag: Tag | int):
@@ -201,22 +241,26 @@ class User:
             tag = tag.id
         if tag in self.tags:
             raise ValueError(f"У пользователя {self.user_id} уже есть тэг {tag}")
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
             cur.execute("INSERT INTO user_tags(user_id, tag_id) VALUES (?, ?)", (self.user_id, tag))
             conn.commit()
         self.__tags.append(tag)
+        tag_index.user_tags_changed(self.user_id, self.__tags)
+        self._render_changed()
 
     def remove_tag(self, tag: Tag | int):
         if isinstance(tag, Tag):
             tag = tag.id
         if tag not in self.tags:
             raise ValueError(f"У пользователя {self.user_id} уже нет тэга {tag}")
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
             cur.execute("DELETE FROM user_tags WHERE user_id = ? AND tag_id = ?", (self.user_id, tag))
             conn.commit()
         self.__tags.remove(tag)
+        tag_index.user_tags_changed(self.user_id, self.__tags)
+        self._render_changed()
 
     def set_tags(self, tags: list[Tag] | list[int] | None):
         if tags is None:
@@ -231,7 +275,7 @@ class User:
         for tag in tags:
             if tag not in self.tags:
                 add.append(tag)
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
             for tag in remove:
                 cur.execute("DELETE FROM user_tags WHERE user_id = ? AND tag_id = ?", (self.user_id, tag))
@@ -239,10 +283,37 @@ class User:
                 cur.execute("INSERT INTO user_tags(user_id, tag_id) VALUES (?, ?)", (self.user_id, tag))
             conn.commit()
         self.__tags = tags
+        tag_index.user_tags_changed(self.user_id, self.__tags)
+        self._render_changed()
 
 
     def __set(self, column: str, value):
         update_in_table("users", column, value, "user_id", self.__user_id)
+        self._render_changed()
+
+    def _render_changed(self):
+        """
+        Данные пользователя изменились: готовые карточки и клавиатуры в `render_cache` больше не годятся.
+        Внутри `unit_of_work` версия сдвигается после записи в базу, иначе другой поток успел бы
+        закэшировать карточку со старыми данными под новой версией
+        """
+        after_write(self.__bump_render_stamp)
+
+    def __bump_render_stamp(self):
+        self.__render_stamp = render_cache.changed(self.__user_id, self.__render_stamp)
+
+    @property
+    def render_stamp(self) -> int:
+        """
+        Версия данных пользователя в `render_cache`, при которой загружен объект
+        """
+        return self.__render_stamp
+
+    def cached_render(self, key: tuple, render):
+        """
+        `render()` через `render_cache` по ключу `key`
+        """
+        return render_cache.get(key, self.__user_id, self.__render_stamp, render)
 
     
     def __str__(self):
@@ -283,6 +354,12 @@ class User:
 
 
 class OlympMember(User):
+    __slots__ = ("__olymp_id",)
+    _TABLE: str
+    """Таблица участников или принимающих"""
+    _MEMBER_COLUMNS: tuple[str, ...]
+    """Столбцы из `_TABLE` в порядке аргументов `__init__` после `tags`"""
+
     def __init__(
         self,
         olymp_id: int,
@@ -291,20 +368,22 @@ class OlympMember(User):
         tg_handle: int,
         name: str,
         surname: str,
-        tags: list[int],
-        **additional_values
+        tags: list[int] | str | None,
     ):
         super().__init__(user_id, tg_id, tg_handle, name, surname, tags)
         self.__olymp_id: int = olymp_id
-        self.__id: int | None = None
-        self._additional_values = additional_values
+
+    @classmethod
+    def _select_columns(cls) -> str:
+        """
+        Столбцы для `SELECT` из `_TABLE`, соединённой с users, в порядке аргументов `__init__`
+        """
+        return ", ".join((f"{cls._TABLE}.olymp_id",) + cls._USER_COLUMNS + cls._MEMBER_COLUMNS)
 
     @classmethod
     def from_db(
         cls,
         olymp_id: int,
-        table: str,
-        additional_keys: list[str],
         *,
         user_id: int | None = None,
         tg_id: int | None = None,
@@ -313,39 +392,33 @@ class OlympMember(User):
         error_user_not_found: str | None = "Пользователь не найден в базе",
         error_ids_dont_match: str = "Данные идентификаторы не соответствуют"
     ):
-        user = User.from_db(user_id=user_id, tg_id=tg_id, tg_handle=tg_handle,
-                            error_no_id_provided=error_no_id_provided,
-                            error_user_not_found=error_user_not_found,
-                            error_ids_dont_match=error_ids_dont_match)
-        if not user:
-            return None
-        with sqlite3.connect(DATABASE) as conn:
+        if tg_handle:
+            tg_handle = cls.conform_tg_handle(tg_handle)
+        checked_column, given_value = cls._checked_column(user_id, tg_id, tg_handle, error_no_id_provided)
+        with connect() as conn:
             cur = conn.cursor()
-            if not value_exists(table, {"user_id": user.user_id, "olymp_id": olymp_id}, cursor = cur):
-                if not error_user_not_found:
-                    return None
-                raise UserError(error_user_not_found)
             q = f"""
                 SELECT
-                    {", ".join(additional_keys)}
+                    {cls._select_columns()}
                 FROM
-                    {table}
+                    users
+                    LEFT JOIN {cls._TABLE} ON {cls._TABLE}.user_id = users.user_id AND {cls._TABLE}.olymp_id = ?
                 WHERE
-                    user_id = ?
-                    AND olymp_id = ?
+                    users.{checked_column} = ?
                 """
-            cur.execute(q, (user.user_id, olymp_id))
-            additional_values = dict(zip(additional_keys, cur.fetchone()))
-        return cls(
-            olymp_id,
-            user.user_id,
-            user.tg_id,
-            user.tg_handle,
-            user.name,
-            user.surname,
-            user.tags,
-            **additional_values,
-        )
+            cur.execute(q, (olymp_id, given_value))
+            fetch = cur.fetchone()
+        if fetch is None:
+            if not error_user_not_found:
+                return None
+            raise UserError(error_user_not_found)
+        if not cls._ids_match(fetch[1:4], user_id, tg_id, tg_handle):
+            raise ValueError(error_ids_dont_match)
+        if fetch[0] is None: # Пользователь есть, но в этой олимпиаде не участвует
+            if not error_user_not_found:
+                return None
+            raise UserError(error_user_not_found)
+        return cls(*fetch)
 
     @classmethod
     def from_user_id(cls, user_id: int, olymp_id: int, no_error: bool = False):
@@ -369,20 +442,22 @@ class OlympMember(User):
     def from_id(
         cls, 
         id: int, 
-        table: str,
         *,
         error_user_not_found: str | None = "Пользователь не найден в базе",
     ):
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
-            cur.execute(f"SELECT user_id, olymp_id FROM {table} WHERE id = ?", (id,))
-            fetch = cur.fetchone()
-            if fetch is None:
-                if not error_user_not_found:
-                    return None
-                raise UserError(error_user_not_found)
-            user_id, olymp_id = fetch
-            return cls.from_user_id(user_id, olymp_id)
+            cur.row_factory = cls.from_row
+            cur.execute(
+                f"SELECT {cls._select_columns()} FROM {cls._TABLE} JOIN users ON users.user_id = {cls._TABLE}.user_id "
+                f"WHERE {cls._TABLE}.id = ?", (id,)
+            )
+            member = cur.fetchone()
+        if member is None:
+            if not error_user_not_found:
+                return None
+            raise UserError(error_user_not_found)
+        return member
 
     @classmethod
     def create_for_existing_user(
@@ -413,15 +488,13 @@ class OlympMember(User):
         self.display_data(verbose, olymp_status, technical_info, contact_note)
 
     def _queue_entry(self, id_column: str):
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
+            cur.row_factory = QueueEntry.from_row
             q = (f"SELECT * FROM queue WHERE {id_column} = ? "
                  f"AND status IN ({', '.join(map(str, QueueStatus.active(as_numbers=True)))})")
             cur.execute(q, (self.id,))
-            fetch = cur.fetchone()
-        if fetch is not None:
-            return QueueEntry(*fetch)
-        return None
+            return cur.fetchone()
 
     @property
     def olymp_id(self):
@@ -429,6 +502,10 @@ class OlympMember(User):
 
 
 class Participant(OlympMember):
+    __slots__ = ("__id", "__grade", "__last_block_number", "__finished")
+    _TABLE = "participants"
+    _MEMBER_COLUMNS = ("participants.grade", "participants.last_block_number", "participants.finished", "participants.id")
+
     def __init__(
         self,
         olymp_id: int,
@@ -437,16 +514,13 @@ class Participant(OlympMember):
         tg_handle: int,
         name: str,
         surname: str,
-        tags: list[int],
+        tags: list[int] | str | None,
         grade: int,
         last_block_number: int,
         finished: bool | int,
         id: int
     ):
-        super().__init__(
-            olymp_id, user_id, tg_id, tg_handle, name, surname, tags,
-            id=id, grade=grade, last_block_number=last_block_number, finished=finished
-        )
+        super().__init__(olymp_id, user_id, tg_id, tg_handle, name, surname, tags)
         self.__id: int = id
         self.__grade: int = grade
         self.__last_block_number: int = last_block_number
@@ -473,21 +547,21 @@ class Participant(OlympMember):
             user_id = user.user_id
         else:
             user_id = user
-        exists = value_exists("participants", {"user_id": user_id, "olymp_id": olymp_id})
-        if exists and not ok_if_exists:
-            raise UserError(f"Пользователь {user_id} уже участник олимпиады {olymp_id}")
-        if exists:
-            q = (f"UPDATE participants SET grade = ?, finished = ?"
-                 f"{', last_block_number = ?' if last_block_number else ''} "
-                 f"WHERE olymp_id = ? AND user_id = ?")
-            p = [grade, finished] + ([last_block_number] if last_block_number else []) + [olymp_id, user_id]
+        columns = ["user_id", "olymp_id", "grade", "finished"] + (["last_block_number"] if last_block_number else [])
+        p = [user_id, olymp_id, grade, finished] + ([last_block_number] if last_block_number else [])
+        q = f"INSERT INTO participants({', '.join(columns)}) VALUES ({', '.join(['?']*len(p))}) "
+        if ok_if_exists:
+            q += ("ON CONFLICT (olymp_id, user_id) DO UPDATE SET "
+                  + ", ".join(f"{column} = excluded.{column}" for column in columns[2:]))
         else:
-            p = [user_id, olymp_id, grade, finished] + ([last_block_number] if last_block_number else [])
-            q = (f"INSERT INTO participants(user_id, olymp_id, grade, finished"
-                f"{', last_block_number' if last_block_number else ''}) VALUES "
-                f"({', '.join(['?']*len(p))})")
-        cursor.execute(q, tuple(p))
+            q += "ON CONFLICT DO NOTHING"
+        cursor.execute(q + " RETURNING id", tuple(p))
+        if cursor.fetchone() is None:
+            raise UserError(f"Пользователь {user_id} уже участник олимпиады {olymp_id}")
         cursor.connection.commit()
+        member_counts.invalidate(olymp_id)
+        if ok_if_exists:
+            render_cache.changed(user_id)
         return Participant.from_user_id(user_id, olymp_id)
 
     @classmethod
@@ -528,34 +602,33 @@ class Participant(OlympMember):
         error_user_not_found: str | None = ("Участник не найден. Если ты участник, "
                                             "авторизуйся при помощи команды /start.")
     ):
-        participant = super().from_db(
+        return super().from_db(
             olymp_id,
-            "participants", 
-            ["id", "grade", "last_block_number", "finished"], 
             user_id = user_id, 
             tg_id = tg_id,
             tg_handle = tg_handle,
             error_no_id_provided = "Требуется идентификатор участника",
             error_user_not_found = error_user_not_found
         )
-        if not participant:
-            return None
-        participant.__id = participant._additional_values["id"]
-        participant.__grade = participant._additional_values["grade"]
-        participant.__last_block_number = participant._additional_values["last_block_number"]
-        participant.__finished = bool(participant._additional_values["finished"])
-        return participant
 
     @classmethod
     def from_id(cls, id: int, no_error: bool = False):
         if no_error:
-            return super().from_id(id, "participants", error_user_not_found=None)
-        return super().from_id(id, "participants", error_user_not_found="Участник не найден")
+            return super().from_id(id, error_user_not_found=None)
+        return super().from_id(id, error_user_not_found="Участник не найден")
 
 
     def display_data(
         self, verbose: bool = False, olymp_status: OlympStatus | None = None, 
         technical_info: bool = False, contact_note: bool = True
+    ):
+        return self.cached_render(
+            ("participants", self.id, "display_data", verbose, olymp_status, technical_info, contact_note),
+            lambda: self.__render_data(verbose, olymp_status, technical_info, contact_note)
+        )
+
+    def __render_data(
+        self, verbose: bool, olymp_status: OlympStatus | None, technical_info: bool, contact_note: bool
     ):
         response = f"{self.name} {self.surname}, {self.grade} класс"
         if technical_info:
@@ -630,10 +703,11 @@ class Participant(OlympMember):
         if isinstance(problem, int):
             problem = self.problem_from_number(problem)
 
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
             cur.execute("INSERT INTO queue(olymp_id, participant_id, problem_id) VALUES (?, ?, ?)", (self.olymp_id, self.id, problem.id))
             queue_entry = QueueEntry(cur.lastrowid, self.olymp_id, self.id, problem.id)
+        metrics.queue_entry_added(self.olymp_id, problem.id)
 
         examiner_id = queue_entry.look_for_examiner()
         if examiner_id:
@@ -654,7 +728,7 @@ class Participant(OlympMember):
         """
         if isinstance(problem, int):
             problem = self.problem_from_number(problem)
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
             cur.execute(
                 "SELECT 1 FROM queue WHERE participant_id = ? AND problem_id = ? AND status = ?", 
@@ -686,6 +760,7 @@ class Participant(OlympMember):
 
     def __set(self, column: str, value):
         update_in_table("participants", column, value, "id", self.__id)
+        self._render_changed()
     
     @property
     def id(self): return self.__id
@@ -716,6 +791,13 @@ class Participant(OlympMember):
 
 
 class Examiner(OlympMember):
+    __slots__ = ("__id", "__conference_link", "__problems", "__busyness_level", "__is_busy")
+    _TABLE = "examiners"
+    _MEMBER_COLUMNS = (
+        "examiners.conference_link", "examiners.busyness_level", "examiners.is_busy", "examiners.id",
+        "(SELECT group_concat(problem_id) FROM examiner_problems WHERE examiner_id = examiners.id)",
+    )
+
     def __init__(
         self,
         olymp_id: int,
@@ -724,16 +806,14 @@ class Examiner(OlympMember):
         tg_handle: int,
         name: str,
         surname: str,
-        tags: list[int],
+        tags: list[int] | str | None,
         conference_link: str,
         busyness_level: int,
         is_busy: bool | int,
         id: int,
         problems: list[int] | str | None = None
     ):
-        super().__init__(olymp_id, user_id, tg_id, tg_handle, name, surname, tags,
-                         id=id, conference_link=conference_link, problems=problems,
-                         busyness_level=busyness_level, is_busy=is_busy)
+        super().__init__(olymp_id, user_id, tg_id, tg_handle, name, surname, tags)
         if isinstance(problems, str):
             problems = list(map(int, problems.split(",")))
         if problems is None:
@@ -766,20 +846,25 @@ class Examiner(OlympMember):
             user_id = user.user_id
         else:
             user_id = user
-        exists = value_exists("examiners", {"user_id": user_id, "olymp_id": olymp_id})
+        cursor.execute(
+            "INSERT INTO examiners(user_id, olymp_id, conference_link, busyness_level, is_busy) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT DO NOTHING RETURNING id",
+            (user_id, olymp_id, conference_link, busyness_level, int(is_busy))
+        )
+        fetch = cursor.fetchone()
+        exists = fetch is None
         if exists and not ok_if_exists:
             raise UserError(f"Пользователь {user_id} уже проверяющий в олимпиаде {olymp_id}")
         if exists:
+            cursor.execute("SELECT id, is_busy FROM examiners WHERE olymp_id = ? AND user_id = ?", (olymp_id, user_id))
+            examiner_id, was_busy = cursor.fetchone()
+            was_busy = bool(was_busy)
             cursor.execute(
-                "UPDATE examiners SET conference_link = ?, busyness_level = ?, is_busy = ? WHERE olymp_id = ? AND user_id = ?",
-                (conference_link, busyness_level, int(is_busy), olymp_id, user_id)
+                "UPDATE examiners SET conference_link = ?, busyness_level = ?, is_busy = ? WHERE id = ?",
+                (conference_link, busyness_level, int(is_busy), examiner_id)
             )
         else:
-            cursor.execute(
-                "INSERT INTO examiners(user_id, olymp_id, conference_link, busyness_level, is_busy) VALUES (?, ?, ?, ?, ?)",
-                (user_id, olymp_id, conference_link, busyness_level, int(is_busy))
-            )
-        examiner_id = cursor.lastrowid
+            examiner_id = fetch[0]
         if problems and len(problems) > 0:
             q = "INSERT INTO examiner_problems(examiner_id, problem_id) VALUES " + ", ".join(["(?, ?)"] * len(problems))
             p = []
@@ -787,6 +872,12 @@ class Examiner(OlympMember):
                 p += [examiner_id, problem_id]
             cursor.execute(q, tuple(p))
         cursor.connection.commit()
+        if exists:
+            metrics.examiner_busy_changed(olymp_id, was_busy, is_busy)
+            render_cache.changed(user_id)
+        else:
+            metrics.examiner_added(olymp_id, is_busy)
+            member_counts.invalidate(olymp_id)
         return Examiner.from_user_id(user_id, olymp_id)
 
     @classmethod
@@ -828,37 +919,26 @@ class Examiner(OlympMember):
         error_user_not_found: str | None = ("Принимающий не найден. Если ты принимающий, "
                                             "авторизуйся при помощи команды /start.")
     ):
-        examiner = super().from_db(
+        return super().from_db(
             olymp_id,
-            "examiners", 
-            ["id", "conference_link", "busyness_level", "is_busy"], 
             user_id = user_id, 
             tg_id = tg_id,
             tg_handle = tg_handle,
             error_no_id_provided = "Требуется идентификатор принимающего",
             error_user_not_found = error_user_not_found
         )
-        if not examiner:
-            return None
-        examiner.__id = examiner._additional_values["id"]
-        examiner.__conference_link = examiner._additional_values["conference_link"]
-        examiner.__busyness_level = examiner._additional_values["busyness_level"]
-        examiner.__is_busy = bool(examiner._additional_values["is_busy"])
-        with sqlite3.connect(DATABASE) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT problem_id FROM examiner_problems WHERE examiner_id = ?", (examiner.__id,))
-            result = cur.fetchall()
-        examiner.__problems = [fetch[0] for fetch in result]
-        return examiner
 
     @classmethod
     def from_id(cls, id: int, no_error: bool = False):
         if no_error:
-            return super().from_id(id, "examiners", error_user_not_found=None)
-        return super().from_id(id, "examiners", error_user_not_found="Принимающий не найден")
+            return super().from_id(id, error_user_not_found=None)
+        return super().from_id(id, error_user_not_found="Принимающий не найден")
 
 
     def display_problem_data(self):
+        return self.cached_render(("examiners", self.id, "display_problem_data"), self.__render_problem_data)
+
+    def __render_problem_data(self):
         amount = len(self.problems)
         if amount == 0:
             return "Задач не выбрано"
@@ -871,6 +951,14 @@ class Examiner(OlympMember):
     def display_data(
         self, verbose: bool = False, olymp_status: OlympStatus | None = None, 
         technical_info: bool = False, contact_note: bool = True
+    ):
+        return self.cached_render(
+            ("examiners", self.id, "display_data", verbose, olymp_status, technical_info, contact_note),
+            lambda: self.__render_data(verbose, olymp_status, technical_info, contact_note)
+        )
+
+    def __render_data(
+        self, verbose: bool, olymp_status: OlympStatus | None, technical_info: bool, contact_note: bool
     ):
         response = f"{self.name} {self.surname}"
         if technical_info:
@@ -896,10 +984,11 @@ class Examiner(OlympMember):
             raise UserError(f"Принимающий {self.id} уже есть в очереди (запись {self.queue_entry.id})")
         if queue_entry.status != QueueStatus.WAITING:
             raise UserError(f"Нельзя записать принимающего в очередь на запись не со статусом ожидания")
-        queue_entry.examiner_id = self.id
-        queue_entry.status = QueueStatus.DISCUSSING
-        self.is_busy = True
-        self.busyness_level += 1
+        with unit_of_work():
+            queue_entry.examiner_id = self.id
+            queue_entry.status = QueueStatus.DISCUSSING
+            self.is_busy = True
+            self.busyness_level += 1
 
     def withdraw_from_queue_entry(self):
         if not self.queue_entry:
@@ -907,9 +996,10 @@ class Examiner(OlympMember):
         queue_entry = self.queue_entry
         if queue_entry.status != QueueStatus.DISCUSSING:
             raise UserError("Нельзя списать принимающего с уже завершённой записи")
-        queue_entry.status = QueueStatus.WAITING
-        queue_entry.examiner_id = None
-        self.busyness_level -= 1
+        with unit_of_work():
+            queue_entry.status = QueueStatus.WAITING
+            queue_entry.examiner_id = None
+            self.busyness_level -= 1
 
     def look_for_queue_entry(self):
         """
@@ -920,8 +1010,9 @@ class Examiner(OlympMember):
         """
         if self.queue_entry:
             raise ValueError(f"Принимающий {self.id} уже есть в очереди (запись {self.queue_entry.id})")
-        with sqlite3.connect(DATABASE) as conn:
-            cur = conn.cursor()            
+        with connect() as conn:
+            cur = conn.cursor()
+            cur.row_factory = QueueEntry.from_row
             q = f"""
                 SELECT
                     *
@@ -935,30 +1026,31 @@ class Examiner(OlympMember):
                 LIMIT 1
                 """
             cur.execute(q, (QueueStatus.WAITING,))
-            fetch = cur.fetchone()
-        return QueueEntry(*fetch) if fetch else None
+            return cur.fetchone()
     
     def add_problem(self, problem: Problem | int):
         if isinstance(problem, Problem):
             problem = problem.id
         if problem in self.problems:
             raise ValueError(f"Принимающий {self.id} уже принимает задачу {problem}")
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
             cur.execute("INSERT INTO examiner_problems(examiner_id, problem_id) VALUES (?, ?)", (self.id, problem))
             conn.commit()
         self.__problems.append(problem)
+        self._render_changed()
 
     def remove_problem(self, problem: Problem | int):
         if isinstance(problem, Problem):
             problem = problem.id
         if problem not in self.problems:
             raise ValueError(f"Принимающий {self.id} уже не принимает задачу {problem}")
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
             cur.execute("DELETE FROM examiner_problems WHERE examiner_id = ? AND problem_id = ?", (self.id, problem))
             conn.commit()
         self.__problems.remove(problem)
+        self._render_changed()
 
     def set_problems(self, problems: list[Problem] | list[int] | None):
         if problems is None:
@@ -973,7 +1065,7 @@ class Examiner(OlympMember):
         for problem in problems:
             if problem not in self.problems:
                 add.append(problem)
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cur = conn.cursor()
             for problem in remove:
                 cur.execute("DELETE FROM examiner_problems WHERE examiner_id = ? AND problem_id = ?", (self.id, problem))
@@ -981,6 +1073,7 @@ class Examiner(OlympMember):
                 cur.execute("INSERT INTO examiner_problems(examiner_id, problem_id) VALUES (?, ?)", (self.id, problem))
             conn.commit()
         self.__problems = problems
+        self._render_changed()
     
 
     @property
@@ -989,6 +1082,7 @@ class Examiner(OlympMember):
     
     def __set(self, column: str, value):
         update_in_table("examiners", column, value, "id", self.__id)
+        self._render_changed()
 
     @property
     def id(self): return self.__id
@@ -1011,4 +1105,5 @@ class Examiner(OlympMember):
     @is_busy.setter
     def is_busy(self, value: bool):
         self.__set('is_busy', value)
+        after_write(partial(metrics.examiner_busy_changed, self.olymp_id, self.__is_busy, value))
         self.__is_busy = value
@@ -1,13 +1,16 @@
 import sqlite3
 from telebot.types import Message, Document
-from telebot.util import generate_random_token
 from telebot import TeleBot
-from pathlib import Path
 import os
-from data import TOKEN
-import requests
+import threading
+from typing import BinaryIO
 from functools import wraps
-from db import DATABASE
+from contextlib import contextmanager
+from db import connect
+import recorder
+import downloads
+
+__unit_of_work = threading.local()
 
 class UserError(Exception):
     """Ошибки, вызванные неправильными действиями пользователей"""
@@ -64,29 +67,49 @@ def get_tags_args(message: Message, no_arg_error: str | None = None):
     return include, exclude
 
 
-def get_file(message: Message, bot: TeleBot, no_file_error: str, expected_type: str | None = None):
-    """
-    Получить файл от пользователя
-    """
+def __get_document(message: Message, no_file_error: str, expected_type: str | None) -> Document:
     if not message.document and not (message.reply_to_message and message.reply_to_message.document):
         raise UserError(no_file_error)
     document: Document = message.document or message.reply_to_message.document
     if expected_type and not document.file_name.endswith(expected_type):
         raise UserError(f"Файл должен иметь расширение `{expected_type}`")
+    if document.file_size and document.file_size > downloads.MAX_FILE_SIZE:
+        raise UserError(f"Файл слишком большой: можно не больше {downloads.MAX_FILE_SIZE // (1024 * 1024)} МБ")
+    return document
+
+
+@contextmanager
+def __download_errors():
+    try:
+        yield
+    except downloads.FileTooLargeError as e:
+        raise UserError(f"Файл слишком большой: можно не больше {e.max_size // (1024 * 1024)} МБ")
+
+
+def get_file(message: Message, bot: TeleBot, no_file_error: str, expected_type: str | None = None) -> BinaryIO:
+    """
+    Получить файл от пользователя.
+    :return: временный файл, открытый на чтение
+    """
+    document = __get_document(message, no_file_error, expected_type)
+    file_path = bot.get_file(document.file_id).file_path
+    with __download_errors():
+        file = downloads.to_temporary_file(file_path)
+    recorder.save_file(document.file_unique_id, file)
+    return file
+
+
+def get_stored_file(message: Message, bot: TeleBot, no_file_error: str, expected_type: str | None = None) -> str:
+    """
+    Получить файл от пользователя и сохранить его в хранилище `file_store`, не держа целиком в памяти.
+    :return: путь к файлу в хранилище
+    """
+    document = __get_document(message, no_file_error, expected_type)
     file_path = bot.get_file(document.file_id).file_path
-    return requests.get(f"https://api.telegram.org/file/bot{TOKEN}/{file_path}").content
-
-
-def save_downloaded_file(file: bytes):
-    dir = "downloaded_files"
-    Path(dir).mkdir(exist_ok=True)
-    dir_list = os.listdir(dir)
-    filename = generate_random_token()
-    while filename + ".pdf" in dir_list:
-        filename = generate_random_token()
-    path = os.path.join(dir, filename + ".pdf")
-    with open(path, "wb") as f:
-        f.write(file)
+    with __download_errors():
+        path = downloads.to_store(file_path, os.path.splitext(document.file_name)[1] or ".pdf")
+    with open(path, "rb") as file:
+        recorder.save_file(document.file_unique_id, file)
     return path
 
 
@@ -100,7 +123,7 @@ def provide_cursor(func):
     def wrapper(*args, **kwargs):
         if 'cursor' in kwargs:
             return func(*args, **kwargs)
-        with sqlite3.connect(DATABASE) as conn:
+        with connect() as conn:
             cursor = conn.cursor()
             result = func(*args, **kwargs, cursor=cursor)
             conn.commit()
@@ -119,8 +142,72 @@ def value_exists(table: str, column_values: dict[str], *, cursor: sqlite3.Cursor
     return bool(result[0])
 
 def update_in_table(table: str, column: str, value, id_column: str, id_value):
-    with sqlite3.connect(DATABASE) as conn:
+    """
+    Записать значение столбца одной строки. Внутри `unit_of_work` запись откладывается до конца блока
+    """
+    changes = getattr(__unit_of_work, "changes", None)
+    if changes is not None:
+        changes.setdefault((table, id_column, id_value), {})[column] = value
+        return
+    with connect() as conn:
         cur = conn.cursor()
         q = f"UPDATE {table} SET {column} = ? WHERE {id_column} = ?"
         cur.execute(q, (value, id_value))
         conn.commit()
+
+def after_write(callback):
+    """
+    Вызвать `callback()` после записи изменений в базу: внутри `unit_of_work` — после фиксации транзакции
+    в конце блока, иначе сразу
+    """
+    callbacks = getattr(__unit_of_work, "callbacks", None)
+    if callbacks is not None:
+        callbacks.append(callback)
+        return
+    callback()
+
+@contextmanager
+def unit_of_work():
+    """
+    Внутри блока сеттеры свойств моделей (всё, что идёт через `update_in_table`) не пишут в базу сразу,
+    а только запоминают изменённые столбцы. При выходе из блока каждая изменённая строка записывается
+    одним UPDATE, все строки — в одной транзакции, после чего вызываются отложенные через `after_write`
+    обработчики (метрики, версии карточек в `render_cache`).
+
+    Если в блоке возникло исключение, в базу ничего не записывается и обработчики не вызываются,
+    но поля объектов моделей, изменённые в блоке, остаются с новыми значениями: такие объекты нужно
+    загрузить заново.
+
+    Запросы на чтение внутри блока отложенных изменений не видят. Вложенный блок записывается вместе с внешним.
+    Изменения запоминаются для текущего потока
+    """
+    if getattr(__unit_of_work, "changes", None) is not None:
+        yield
+        return
+    changes: dict[tuple[str, str, object], dict[str, object]] = {}
+    callbacks: list = []
+    __unit_of_work.changes = changes
+    __unit_of_work.callbacks = callbacks
+    try:
+        yield
+    finally:
+        __unit_of_work.changes = None
+        __unit_of_work.callbacks = None
+    if changes:
+        with connect() as conn:
+            cur = conn.cursor()
+            for (table, id_column, id_value), columns in changes.items():
+                q = f"UPDATE {table} SET {', '.join(f'{column} = ?' for column in columns)} WHERE {id_column} = ?"
+                cur.execute(q, (*columns.values(), id_value))
+            conn.commit()
+    for callback in callbacks:
+        callback()
+
+def factory_cursor(cursor: sqlite3.Cursor, row_factory) -> sqlite3.Cursor:
+    """
+    Курсор того же соединения, строки которого сразу собираются в объекты через `row_factory`.
+    Исходный курсор (например, переданный в функцию через `provide_cursor`) не меняется
+    """
+    rows = cursor.connection.cursor()
+    rows.row_factory = row_factory
+    return rows